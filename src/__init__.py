@@ -1,10 +1,17 @@
 from .subtitle_part import SubtitlePart
+from .subtitle_track import SubtitleTrack
 from .subtitle_webvtt_parser import SubtitleWebVTTParser
 from .subtitle_segment_finder import SubtitleGenerator, SubtitleSegmentFinder
 from .subtitle_srt_parser import SubtitleSRTParser
+from .subtitle_parser import SubtitleParser
 from .time_utils import (
     convert_clock_time_to_timestamp_ms,
     convert_timestamp_ms_to_clock_time,
 )
 from .content_segment_exporter import ContentSegment, ContentSegmentPdfBuilder
+from .selected_frame import SelectedFrame
+from .frame_source import FrameSource, OpenCVFrameSource, FFmpegFrameSource
+from .slide_index import SlideIndex, compute_dhash, find_duplicate_frames
+from .segment_selection import select_segment_frames
+from .instrumentation import Instrumentation
 from .video_segment_finder import VideoSegmentFinder
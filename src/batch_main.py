@@ -0,0 +1,311 @@
+import sys
+import os
+import io
+import csv
+import glob
+import time
+import argparse
+import contextlib
+import cv2
+from concurrent.futures import ProcessPoolExecutor
+from .main import CommandLineArgRunner
+from .content_segment_exporter import ContentSegmentPdfBuilder
+
+VIDEO_FILE_EXTENSIONS = (".mp4", ".m4v", ".mkv", ".mov", ".avi", ".webm")
+SUBTITLE_FILE_EXTENSIONS = (".vtt", ".srt")
+
+
+class BatchJob:
+    """This class represents one lecture video to convert to a pdf
+
+    Attributes
+    ----------
+    video : str
+        The file path to the lecture video
+    subtitle : str
+        The file path to the video's subtitles, or None if the pdf has no subtitles
+    output : str
+        The file path to the generated pdf
+    """
+
+    def __init__(self, video, subtitle, output):
+        self.video = video
+        self.subtitle = subtitle
+        self.output = output
+
+    def is_up_to_date(self):
+        """Checks if the pdf exists and is newer than the video and the subtitles
+
+        Returns
+        -------
+        is_up_to_date : boolean
+            True if the pdf does not need to be generated again; else False
+        """
+        if not os.path.exists(self.output):
+            return False
+
+        input_filepaths = [self.video]
+        if self.subtitle is not None:
+            input_filepaths.append(self.subtitle)
+
+        output_modified_time = os.path.getmtime(self.output)
+
+        return all(
+            os.path.getmtime(input_filepath) <= output_modified_time
+            for input_filepath in input_filepaths
+        )
+
+    def get_args(self):
+        """Returns the command line arguments of CommandLineArgRunner for this job"""
+        if self.subtitle is None:
+            return [self.video, "-S", "-o", self.output]
+
+        return [self.video, "-s", self.subtitle, "-o", self.output]
+
+
+class BatchCommandLineArgRunner:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(
+            description="Generate readable pdfs from many lecture videos",
+            epilog="Any other argument is passed on to each lecture (see python -m src.main --help)",
+        )
+        self.parser.add_argument(
+            "input",
+            type=str,
+            help="A folder of lecture videos, a glob of lecture videos, or a .csv manifest file "
+            + "with a video, subtitle and output column",
+        )
+        self.parser.add_argument(
+            "-o",
+            "--output-dir",
+            type=str,
+            default=None,
+            help="Folder of the generated pdfs for a folder or a glob. If omitted, they are saved next to the videos",
+        )
+        self.parser.add_argument(
+            "-n",
+            "--num-jobs",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of lecture videos to process at the same time",
+        )
+        self.parser.add_argument(
+            "-j",
+            "--num-workers",
+            type=int,
+            default=None,
+            help="Number of processes that scan each lecture video in parallel. It can only be set with -n 1",
+        )
+        self.parser.add_argument(
+            "-f",
+            "--force",
+            action="store_true",
+            help="If flag is set, it will generate the pdfs that are already up to date",
+        )
+
+    def run(self, args):
+        """Generates the pdfs of all lecture videos and prints a summary of each job
+
+        Returns
+        -------
+        results : dict[]
+            The job, its status ("done", "skipped" or "failed"), its run time in seconds, and its error message
+        """
+        start_time = time.perf_counter()
+        opts, lecture_args = self.parser.parse_known_args(args)
+        num_jobs = max(1, opts.num_jobs)
+
+        # Each lecture video is already scanned by its own process when many videos are processed at the same time
+        if opts.num_workers is not None and num_jobs > 1:
+            print("Set -n / --num-jobs to 1 to scan each lecture video in parallel")
+            raise AssertionError()
+
+        if opts.num_workers is not None:
+            lecture_args = ["-j", str(opts.num_workers)] + lecture_args
+
+        # The CPUs are split between the jobs, so that the jobs do not run more threads than there are CPUs
+        num_threads_per_job = max(1, (os.cpu_count() or 1) // num_jobs)
+
+        jobs = self.get_jobs(opts.input, opts.output_dir)
+        print("Number of lecture videos:", len(jobs))
+
+        results = []
+        jobs_to_run = []
+        for job in jobs:
+            if not opts.force and job.is_up_to_date():
+                results.append(
+                    {"job": job, "status": "skipped", "run_time": 0, "error": None}
+                )
+            else:
+                jobs_to_run.append(job)
+                os.makedirs(os.path.dirname(job.output) or ".", exist_ok=True)
+
+        # The font is parsed once here instead of by each worker, which only loads its saved metrics
+        if len(jobs_to_run) > 0:
+            ContentSegmentPdfBuilder.cache_fonts()
+
+        with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+            futures = [
+                executor.submit(
+                    BatchCommandLineArgRunner.__run_job__,
+                    job.get_args()
+                    + ["--num-threads", str(num_threads_per_job)]
+                    + lecture_args,
+                    num_threads_per_job,
+                )
+                for job in jobs_to_run
+            ]
+
+            for i, (job, future) in enumerate(zip(jobs_to_run, futures)):
+                error, run_time = future.result()
+                status = "done" if error is None else "failed"
+                results.append(
+                    {"job": job, "status": status, "run_time": run_time, "error": error}
+                )
+                print(f"Finished {i + 1} / {len(jobs_to_run)}: {job.video}")
+
+        results.sort(key=lambda result: jobs.index(result["job"]))
+        self.__print_summary__(results, time.perf_counter() - start_time)
+
+        return results
+
+    def get_jobs(self, input_path, output_dir=None):
+        """Finds the lecture videos to convert
+
+        Parameters
+        ----------
+        input_path : str
+            A folder of lecture videos, a glob of lecture videos, or a .csv manifest file
+        output_dir : str
+            The folder of the generated pdfs for a folder or a glob. If None, they are saved next to the videos
+
+        Returns
+        -------
+        jobs : BatchJob[]
+            The lecture videos to convert, in sorted order
+        """
+        if os.path.isfile(input_path) and input_path.endswith(".csv"):
+            return self.__get_jobs_from_manifest__(input_path)
+
+        if os.path.isdir(input_path):
+            video_filepaths = [
+                os.path.join(input_path, filename)
+                for filename in os.listdir(input_path)
+            ]
+        else:
+            video_filepaths = glob.glob(input_path)
+
+        video_filepaths = sorted(
+            filepath
+            for filepath in video_filepaths
+            if filepath.lower().endswith(VIDEO_FILE_EXTENSIONS)
+        )
+
+        jobs = []
+        for video_filepath in video_filepaths:
+            base_filepath = os.path.splitext(video_filepath)[0]
+
+            # The subtitles are the files next to the video with the same name
+            subtitle_filepath = None
+            for extension in SUBTITLE_FILE_EXTENSIONS:
+                if os.path.isfile(base_filepath + extension):
+                    subtitle_filepath = base_filepath + extension
+                    break
+
+            output_filepath = base_filepath + ".pdf"
+            if output_dir is not None:
+                output_filepath = os.path.join(
+                    output_dir, os.path.basename(output_filepath)
+                )
+
+            jobs.append(BatchJob(video_filepath, subtitle_filepath, output_filepath))
+
+        return jobs
+
+    def __get_jobs_from_manifest__(self, manifest_filepath):
+        # The relative file paths in the manifest are relative to the folder of the manifest
+        manifest_dir = os.path.dirname(manifest_filepath)
+        jobs = []
+
+        with open(manifest_filepath, mode="r", newline="") as f:
+            for row in csv.DictReader(f):
+                subtitle = (row.get("subtitle") or "").strip()
+                jobs.append(
+                    BatchJob(
+                        os.path.join(manifest_dir, row["video"].strip()),
+                        (
+                            os.path.join(manifest_dir, subtitle)
+                            if len(subtitle) > 0
+                            else None
+                        ),
+                        os.path.join(manifest_dir, row["output"].strip()),
+                    )
+                )
+
+        return jobs
+
+    @staticmethod
+    def __run_job__(args, num_threads):
+        """Runs one lecture video in a worker process
+
+        Parameters
+        ----------
+        args : str[]
+            The command line arguments of CommandLineArgRunner
+        num_threads : int
+            The max. number of threads that OpenCV uses in the worker process
+
+        Returns
+        -------
+        result : (str, float)
+            The error message, or None if it succeeded, and the run time in seconds
+        """
+        start_time = time.perf_counter()
+        error = None
+        cv2.setNumThreads(num_threads)
+
+        try:
+            # The progress of each lecture is hidden so that the progress of different lectures do not mix
+            with contextlib.redirect_stdout(io.StringIO()):
+                CommandLineArgRunner().run(args)
+        except BaseException as e:
+            error = repr(e)
+
+        return error, time.perf_counter() - start_time
+
+    def __print_result__(self, result):
+        job = result["job"]
+        print(
+            "{:<8} {:>8.1f}s  {} -> {}".format(
+                result["status"], result["run_time"], job.video, job.output
+            )
+        )
+
+        if result["error"] is not None:
+            print("         " + result["error"])
+
+    def __print_summary__(self, results, run_time):
+        num_jobs_by_status = {"done": 0, "skipped": 0, "failed": 0}
+        for result in results:
+            num_jobs_by_status[result["status"]] += 1
+
+        print("--------------------------")
+        for result in results:
+            self.__print_result__(result)
+
+        print(
+            "Done: {}, skipped: {}, failed: {}, total run time: {:.1f}s".format(
+                num_jobs_by_status["done"],
+                num_jobs_by_status["skipped"],
+                num_jobs_by_status["failed"],
+                run_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    runner = BatchCommandLineArgRunner()
+    results = runner.run(sys.argv[1:])
+
+    if any(result["status"] == "failed" for result in results):
+        sys.exit(1)
@@ -0,0 +1,528 @@
+import sys
+import os
+import glob
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from .subtitle_segment_finder import SubtitleSegmentFinder
+from .subtitle_parser import SubtitleParser
+from .video_segment_finder import VideoSegmentFinder
+from .content_segment_exporter import ContentSegment, ContentSegmentPdfBuilder
+from .instrumentation import get_peak_rss_mb
+
+SUBTITLE_WORDS = (
+    "the slide shows a graph of the results and we can see that it grows "
+    + "quickly when the input is large so we need a better algorithm"
+).split(" ")
+
+
+def create_slide_video(
+    filepath, duration_s=600, slide_duration_s=30, fps=10, frame_size=(640, 360)
+):
+    """Creates a video of slides, where a new slide is shown every slide_duration_s seconds
+    and a new line of text is added to the slide three times while it is shown
+
+    Parameters
+    ----------
+    filepath : str
+        The file path to the video, which is saved as a motion jpeg .avi file
+    duration_s : float
+        The duration of the video in seconds
+    slide_duration_s : float
+        The time that each slide is shown for in seconds
+    fps : int
+        The number of frames per second of the video
+    frame_size : (int, int)
+        The width and height of the frames
+    """
+    width, height = frame_size
+    video_writer = cv2.VideoWriter(
+        filepath, cv2.VideoWriter_fourcc(*"MJPG"), fps, frame_size
+    )
+
+    try:
+        for frame_num in range(int(duration_s * fps)):
+            timestamp_s = frame_num / fps
+            slide_num = int(timestamp_s // slide_duration_s)
+            num_lines = 1 + int(4 * (timestamp_s % slide_duration_s) / slide_duration_s)
+
+            # Each slide has a title bar of a different color, and each line of text is highlighted
+            frame = np.full((height, width, 3), 255, np.uint8)
+            cv2.rectangle(
+                frame,
+                (0, 0),
+                (width, 70),
+                (slide_num * 67 % 256, 160, 255 - slide_num * 67 % 256),
+                -1,
+            )
+            cv2.putText(
+                frame,
+                "Slide {}".format(slide_num + 1),
+                (20, 50),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                1.2,
+                (0, 0, 0),
+                2,
+            )
+            for line_num in range(num_lines):
+                cv2.rectangle(
+                    frame,
+                    (30, 80 + 50 * line_num),
+                    (width - 30, 120 + 50 * line_num),
+                    (230, 180, 120),
+                    -1,
+                )
+                cv2.putText(
+                    frame,
+                    "- Point {}.{}".format(slide_num + 1, line_num + 1),
+                    (40, 110 + 50 * line_num),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    1,
+                    (0, 0, 0),
+                    2,
+                )
+
+            video_writer.write(frame)
+    finally:
+        video_writer.release()
+
+
+def create_subtitle_file(filepath, duration_s=600, cue_duration_s=2.5, seed=0):
+    """Creates a .srt file with random sentences, where a sentence can span many cues
+
+    Parameters
+    ----------
+    filepath : str
+        The file path to the subtitles
+    duration_s : float
+        The duration of the subtitles in seconds
+    cue_duration_s : float
+        The duration of each cue in seconds
+    seed : int
+        The seed of the random sentences
+    """
+    rng = random.Random(seed)
+
+    with open(filepath, mode="w") as f:
+        for i in range(int(duration_s / cue_duration_s)):
+            words = [rng.choice(SUBTITLE_WORDS) for _ in range(rng.randint(4, 10))]
+            text = " ".join(words)
+            if rng.random() < 0.4:
+                text += rng.choice([".", ".", "?", "!"])
+
+            f.write(
+                "{}\n{} --> {}\n{}\n\n".format(
+                    i + 1,
+                    format_srt_time(i * cue_duration_s * 1000),
+                    format_srt_time((i + 1) * cue_duration_s * 1000),
+                    text,
+                )
+            )
+
+
+def format_srt_time(timestamp_ms):
+    """Formats a timestamp in milliseconds as a .srt time, like "00:05:38,250" """
+    timestamp_ms = int(round(timestamp_ms))
+
+    return "{:02d}:{:02d}:{:02d},{:03d}".format(
+        timestamp_ms // 3600000,
+        timestamp_ms // 60000 % 60,
+        timestamp_ms // 1000 % 60,
+        timestamp_ms % 1000,
+    )
+
+
+def benchmark_video_segment_finder(video_file, **finder_kwargs):
+    """Measures how many frames per second VideoSegmentFinder selects the frames of a video at
+
+    Returns
+    -------
+    result : dict
+        The "num_frames" in the video, the "num_selected_frames", and the "frames_per_second"
+        along with the run times (refer to measure())
+    """
+
+    def find_frames():
+        return VideoSegmentFinder(**finder_kwargs).get_segment_frames_with_stats(
+            video_file, save_debug_frames=False
+        )
+
+    (selected_frames, frame_num_to_stats), result = measure(find_frames)
+
+    # The last selected frame is numbered as the frame after the last frame of the video
+    num_frames = max(selected_frames.keys(), default=0)
+    if len(frame_num_to_stats) > 0:
+        num_frames = max(num_frames, max(frame_num_to_stats.keys()) + 1)
+
+    result["num_frames"] = num_frames
+    result["num_selected_frames"] = len(selected_frames)
+    result["frames_per_second"] = num_frames / result["wall_time"]
+
+    return result
+
+
+def benchmark_subtitle_segment_finder(subtitle_file, segment_duration_s=30):
+    """Measures how many segments per second SubtitleSegmentFinder finds the subtitles of
+    for video segments that are segment_duration_s seconds long
+
+    Returns
+    -------
+    result : dict
+        The "num_parts" of the subtitles, the "parse_time" in seconds, the "num_segments",
+        and the "segments_per_second" along with the run times (refer to measure())
+    """
+    parse_start_time = time.perf_counter()
+    parts = SubtitleParser(subtitle_file).get_subtitle_parts()
+    parse_time = time.perf_counter() - parse_start_time
+
+    end_time = parts[-1].end_time if len(parts) > 0 else 0
+    segment_end_times = list(
+        np.arange(segment_duration_s * 1000, end_time, segment_duration_s * 1000)
+    ) + [end_time]
+
+    segments, result = measure(
+        lambda: SubtitleSegmentFinder(parts).get_subtitle_segments(segment_end_times)
+    )
+
+    result["num_parts"] = len(parts)
+    result["parse_time"] = parse_time
+    result["num_segments"] = len(segments)
+    result["segments_per_second"] = len(segments) / result["wall_time"]
+
+    return result
+
+
+def benchmark_pdf_builder(num_pages=100, frame_size=(1280, 720), **builder_kwargs):
+    """Measures how many pages per second ContentSegmentPdfBuilder generates a pdf of slides at
+
+    Returns
+    -------
+    result : dict
+        The "num_pages", the "pdf_size" in bytes, and the "pages_per_second" along with the run times
+        (refer to measure())
+    """
+    width, height = frame_size
+    images = []
+    for page_num in range(num_pages):
+        image = np.full((height, width, 3), 255, np.uint8)
+        cv2.putText(
+            image,
+            "Slide {}".format(page_num + 1),
+            (40, 100),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            2,
+            (0, 0, 0),
+            3,
+        )
+        cv2.rectangle(
+            image,
+            (40, 160),
+            (40 + (page_num * 37) % (width - 80), height - 40),
+            (page_num * 67 % 256, 128, 255 - page_num * 67 % 256),
+            -1,
+        )
+        images.append(image)
+
+    text = " ".join(SUBTITLE_WORDS)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_filepath = os.path.join(temp_dir, "output.pdf")
+        pages = (ContentSegment(image, text) for image in images)
+
+        _, result = measure(
+            lambda: ContentSegmentPdfBuilder(**builder_kwargs).generate_pdf(
+                pages, output_filepath
+            )
+        )
+        result["pdf_size"] = os.path.getsize(output_filepath)
+
+    result["num_pages"] = num_pages
+    result["pages_per_second"] = num_pages / result["wall_time"]
+
+    return result
+
+
+def measure(function):
+    """Runs a function and measures its run time
+
+    Returns
+    -------
+    value : any
+        The value returned by the function
+    result : dict
+        The "wall_time" and the "cpu_time" of this process in seconds
+    """
+    start_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+
+    value = function()
+
+    return value, {
+        "wall_time": max(time.perf_counter() - start_time, 1e-9),
+        "cpu_time": time.process_time() - start_cpu_time,
+    }
+
+
+BENCHMARKS = {
+    "video_segment_finder": benchmark_video_segment_finder,
+    "subtitle_segment_finder": benchmark_subtitle_segment_finder,
+    "pdf_builder": benchmark_pdf_builder,
+}
+
+
+class BenchmarkCommandLineArgRunner:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(
+            description="Measure the throughput of generating pdfs from lecture videos"
+        )
+        self.parser.add_argument(
+            "-v",
+            "--video",
+            type=str,
+            action="append",
+            default=None,
+            help="File path or glob of the videos to benchmark. If omitted, it will use tests/videos/*.mp4",
+        )
+        self.parser.add_argument(
+            "-d",
+            "--synthetic-duration",
+            type=float,
+            default=600,
+            help="Duration in seconds of the generated slide video. If 0, it is not generated",
+        )
+        self.parser.add_argument(
+            "-t",
+            "--subtitle-duration",
+            type=float,
+            default=3 * 3600,
+            help="Duration in seconds of the generated subtitles. If 0, they are not generated",
+        )
+        self.parser.add_argument(
+            "-p",
+            "--num-pages",
+            type=int,
+            default=100,
+            help="Number of pages of the generated pdf",
+        )
+        self.parser.add_argument(
+            "-n",
+            "--repeat",
+            type=int,
+            default=1,
+            help="Number of times each benchmark is run, where the fastest run is kept",
+        )
+        self.parser.add_argument(
+            "-o",
+            "--output",
+            type=str,
+            default=None,
+            help="Output file of the results as json. If omitted, it will print the results",
+        )
+        self.parser.add_argument(
+            "-c",
+            "--compare",
+            type=str,
+            default=None,
+            help="File path to the results of a previous run to compare the throughput with",
+        )
+
+    def run(self, args):
+        """Runs the benchmarks and prints or saves their results
+
+        Returns
+        -------
+        report : dict
+            The environment that the benchmarks ran in, and the results of each benchmark
+        """
+        opts = self.parser.parse_args(args)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            benchmarks = self.get_benchmarks(
+                opts.video or ["tests/videos/*.mp4"],
+                opts.synthetic_duration,
+                opts.subtitle_duration,
+                opts.num_pages,
+                temp_dir,
+            )
+
+            results = []
+            for i, benchmark in enumerate(benchmarks):
+                result = self.__run_benchmark_repeatedly__(benchmark, opts.repeat)
+                results.append(result)
+                print(
+                    f"Finished {i + 1} / {len(benchmarks)}: {benchmark['name']}",
+                    file=sys.stderr,
+                )
+
+        report = {"environment": self.__get_environment__(), "results": results}
+
+        if opts.output is None:
+            print(json.dumps(report, indent=2))
+        else:
+            with open(opts.output, mode="w") as f:
+                json.dump(report, f, indent=2)
+
+        if opts.compare is not None:
+            with open(opts.compare, mode="r") as f:
+                self.__print_comparison__(json.load(f), report)
+
+        return report
+
+    def get_benchmarks(
+        self,
+        video_patterns,
+        synthetic_duration,
+        subtitle_duration,
+        num_pages,
+        temp_dir,
+    ):
+        """Finds the benchmarks to run, and generates the synthetic video and subtitles in temp_dir
+
+        Returns
+        -------
+        benchmarks : dict[]
+            The "name" of each benchmark, the "benchmark" function in BENCHMARKS and its "kwargs"
+        """
+        video_filepaths = sorted(
+            filepath for pattern in video_patterns for filepath in glob.glob(pattern)
+        )
+        subtitle_filepaths = []
+
+        if synthetic_duration > 0:
+            video_filepath = os.path.join(temp_dir, "synthetic_slides.avi")
+            create_slide_video(video_filepath, duration_s=synthetic_duration)
+            video_filepaths.append(video_filepath)
+
+        if subtitle_duration > 0:
+            subtitle_filepath = os.path.join(temp_dir, "synthetic_subtitles.srt")
+            create_subtitle_file(subtitle_filepath, duration_s=subtitle_duration)
+            subtitle_filepaths.append(subtitle_filepath)
+
+        benchmarks = []
+
+        for video_filepath in video_filepaths:
+            for config_name, finder_kwargs in [
+                ("default", {}),
+                ("analysis_width", {"analysis_width": 320}),
+                ("sample_rate", {"sample_rate": 1}),
+            ]:
+                benchmarks.append(
+                    {
+                        "name": "video_segment_finder/{}/{}".format(
+                            os.path.basename(video_filepath), config_name
+                        ),
+                        "benchmark": "video_segment_finder",
+                        "kwargs": dict(video_file=video_filepath, **finder_kwargs),
+                    }
+                )
+
+        for subtitle_filepath in subtitle_filepaths:
+            benchmarks.append(
+                {
+                    "name": "subtitle_segment_finder/{}".format(
+                        os.path.basename(subtitle_filepath)
+                    ),
+                    "benchmark": "subtitle_segment_finder",
+                    "kwargs": {"subtitle_file": subtitle_filepath},
+                }
+            )
+
+        if num_pages > 0:
+            benchmarks.append(
+                {
+                    "name": "pdf_builder/{}_pages".format(num_pages),
+                    "benchmark": "pdf_builder",
+                    "kwargs": {"num_pages": num_pages},
+                }
+            )
+
+        return benchmarks
+
+    def __run_benchmark_repeatedly__(self, benchmark, num_repeats):
+        """Runs a benchmark num_repeats times, each in a new process, and returns the fastest run"""
+        best_result = None
+
+        for _ in range(max(1, num_repeats)):
+            # A new process is spawned for each run so that the peak memory of a run does not include
+            # the memory of the runs before it
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                result = executor.submit(
+                    BenchmarkCommandLineArgRunner.__run_benchmark__,
+                    benchmark["benchmark"],
+                    benchmark["kwargs"],
+                ).result()
+
+            if best_result is None or result["wall_time"] < best_result["wall_time"]:
+                best_result = result
+
+        return {"name": benchmark["name"], **best_result}
+
+    @staticmethod
+    def __run_benchmark__(benchmark_name, kwargs):
+        """Runs one benchmark in a worker process, and adds the peak memory of the process to its result"""
+        result = BENCHMARKS[benchmark_name](**kwargs)
+        result["peak_rss_mb"] = get_peak_rss_mb()
+
+        return result
+
+    def __get_environment__(self):
+        git_commit = None
+        try:
+            git_commit = (
+                subprocess.run(
+                    ["git", "rev-parse", "HEAD"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    check=True,
+                )
+                .stdout.decode("utf-8")
+                .strip()
+            )
+        except (OSError, subprocess.CalledProcessError):
+            pass
+
+        return {
+            "git_commit": git_commit,
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "num_cpus": os.cpu_count(),
+        }
+
+    def __print_comparison__(self, baseline_report, report):
+        baseline_results = {
+            result["name"]: result for result in baseline_report["results"]
+        }
+
+        print("--------------------------", file=sys.stderr)
+        for result in report["results"]:
+            baseline_result = baseline_results.get(result["name"])
+            if baseline_result is None:
+                continue
+
+            speedup = baseline_result["wall_time"] / result["wall_time"]
+            print(
+                "{:>6.2f}x  {:>8.2f}s -> {:>8.2f}s  {}".format(
+                    speedup,
+                    baseline_result["wall_time"],
+                    result["wall_time"],
+                    result["name"],
+                ),
+                file=sys.stderr,
+            )
+
+
+if __name__ == "__main__":
+    runner = BenchmarkCommandLineArgRunner()
+    runner.run(sys.argv[1:])
@@ -1,11 +1,32 @@
+import io
 import os
+import collections
 import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from fpdf import FPDF
-import tempfile
+from fpdf.image_parsing import get_img_info
 
 from .subtitle_webvtt_parser import SubtitleWebVTTParser
 from .subtitle_segment_finder import SubtitleSegmentFinder
 from .video_segment_finder import VideoSegmentFinder
+from .slide_index import SlideIndex
+from .instrumentation import Instrumentation
+
+# The width of the images on a page in millimeters
+IMAGE_WIDTH_MM = 195
+
+# The font of the text on a page. fpdf saves the metrics of the font next to it the first time that it is parsed
+FONT_FILEPATH = "fonts/DejaVuSansCondensed.ttf"
+
+IMAGE_FORMATS = ("jpeg", "png", "auto")
+
+# The max. number of pages that are kept in memory while their images are being encoded,
+# since the images that are not encoded yet are kept at their full resolution
+MAX_NUM_PENDING_PAGES = 8
+
+# The min. fraction of pixels with the same color as the pixel to their left for an image to be flat-color
+FLAT_COLOR_RATIO = 0.5
 
 
 class ContentSegment:
@@ -26,39 +47,231 @@ class ContentSegment:
 
 
 class ContentSegmentPdfBuilder:
-    """This class creates a PDF from a lecture segment"""
+    """This class creates a PDF from a lecture segment
+
+    Attributes
+    ----------
+    num_threads : int
+        The number of threads that encode the images of the pages. If None, it is the number of CPUs
+    dpi : float
+        If set, images that are wider than this many dots per inch on the page are scaled down to it.
+        If None, the images are kept at their full resolution
+    grayscale : boolean
+        If True, the images are converted to grayscale
+    image_format : str
+        The format of the images, which is "jpeg", "png", or "auto" to pick png for flat-color images and jpeg
+        otherwise. fpdf decodes the images and stores their pixels zipped in the pdf, so the format only picks
+        if the pixels are lossy. Flat-color slides are often smaller as pngs since they have no compression artifacts
+    deduplicate_images : boolean
+        If True, the pages that show a slide that was shown before share the image of the earlier page,
+        so the image is only encoded and stored once in the pdf
+    merge_duplicate_pages : boolean
+        If True, the pages that show a slide that was shown before are removed, and their text is added to
+        the first page of the slide. The pages are only added to the pdf after all pages are read
+    instrumentation : Instrumentation
+        It measures the time spent on encoding the images and writing the pdf. If None, nothing is measured
+    """
+
+    def __init__(
+        self,
+        num_threads=None,
+        dpi=None,
+        grayscale=False,
+        image_format="jpeg",
+        deduplicate_images=False,
+        merge_duplicate_pages=False,
+        instrumentation=None,
+    ):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(
+                "Illegal argument! Expected image format to be one of {}, instead {}".format(
+                    IMAGE_FORMATS, image_format
+                )
+            )
+
+        self.num_threads = num_threads
+        self.dpi = dpi
+        self.grayscale = grayscale
+        self.image_format = image_format
+        self.deduplicate_images = deduplicate_images
+        self.merge_duplicate_pages = merge_duplicate_pages
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+
+    @staticmethod
+    def cache_fonts():
+        """Parses the font of the pages if it was not parsed before, so that fpdf saves its metrics next to it
+        and each pdf only loads the saved metrics
+        """
+        FPDF().add_font("DejaVu", "", FONT_FILEPATH, uni=True)
 
     def generate_pdf(self, pages, output_filepath):
         """Generates and saves a PDF from an ordered list of lecture segments
+        The images of the next pages are encoded in a thread pool while the pages before them are added to the pdf
 
         Parameters
         ----------
-        pages : ContentSegment[]
+        pages : iterable of ContentSegment
             An ordered list of lecture segments
         output_filepath: str
             The filepath for the output pdf
+
+        Returns
+        -------
+        num_pages : int
+            The number of pages in the pdf
         """
-        with tempfile.TemporaryDirectory() as temp_dir_path:
-            pdf = FPDF()
-            pdf.add_font("DejaVu", "", "fonts/DejaVuSansCondensed.ttf", uni=True)
+        num_threads = self.num_threads or os.cpu_count() or 1
+
+        # Only a few pages per thread are kept in memory while their images are being encoded
+        max_num_pending_pages = min(2 * num_threads, MAX_NUM_PENDING_PAGES)
+        pending_pages = collections.deque()
+        num_pages = 0
+
+        slide_index = None
+        if self.deduplicate_images or self.merge_duplicate_pages:
+            slide_index = SlideIndex()
+
+        # The encoded image and the texts of each slide in the slide index
+        slide_encoded_images = []
+        slide_texts = []
+
+        pdf = FPDF()
+        pdf.add_font("DejaVu", "", FONT_FILEPATH, uni=True)
+
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            for page in pages:
+                if slide_index is None:
+                    encoded_image = executor.submit(self.__encode_image__, page.image)
+                else:
+                    slide_id, is_new_slide = slide_index.find_or_add(page.image)
+
+                    if is_new_slide:
+                        slide_encoded_images.append(
+                            executor.submit(self.__encode_image__, page.image)
+                        )
+                        slide_texts.append([])
 
-            for i in range(0, len(pages)):
-                # Temporarily save the frames
-                temp_filepath = os.path.join(temp_dir_path, f"{i}_frame.jpeg")
-                cv2.imwrite(temp_filepath, pages[i].image)
+                        # The merged pages are only added at the end, so the encoding of the earlier slides
+                        # is waited for here to keep only a few images that are not encoded yet in memory
+                        if (
+                            self.merge_duplicate_pages
+                            and len(slide_encoded_images) > max_num_pending_pages
+                        ):
+                            slide_encoded_images[-1 - max_num_pending_pages].result()
 
-                pdf.add_page()
+                    encoded_image = slide_encoded_images[slide_id]
 
-                # Add the image
-                pdf.image(temp_filepath, w=195)
+                    if self.merge_duplicate_pages:
+                        slide_texts[slide_id].append(page.text)
+                        continue
 
-                # Add the captions if exist
-                if pages[i].text is not None:
-                    pdf.set_font("DejaVu", "", 12)
-                    pdf.multi_cell(0, 10, pages[i].text)
+                pending_pages.append((page.text, encoded_image))
 
+                if len(pending_pages) >= max_num_pending_pages:
+                    self.__add_page__(pdf, *pending_pages.popleft())
+                    num_pages += 1
+
+            if self.merge_duplicate_pages:
+                for texts, encoded_image in zip(slide_texts, slide_encoded_images):
+                    pending_pages.append((self.__merge_texts__(texts), encoded_image))
+
+            while len(pending_pages) > 0:
+                self.__add_page__(pdf, *pending_pages.popleft())
+                num_pages += 1
+
+        with self.instrumentation.measure("pdf_write", count=0):
             pdf.output(output_filepath, "F")
 
+        return num_pages
+
+    def __add_page__(self, pdf, text, encoded_image):
+        image_buffer, image_info = encoded_image.result()
+
+        with self.instrumentation.measure("pdf_write"):
+            self.__add_image_info__(pdf, image_buffer, image_info)
+            pdf.add_page()
+
+            # Add the image
+            pdf.image(image_buffer, w=IMAGE_WIDTH_MM)
+
+            # Add the captions if exist
+            if text is not None:
+                pdf.set_font("DejaVu", "", 12)
+                pdf.multi_cell(0, 10, text)
+
+    def __add_image_info__(self, pdf, image_buffer, image_info):
+        """Adds an image that was parsed in a worker thread to the images of the pdf the same way that
+        FPDF.image() does, so that FPDF.image() does not parse it again. A duplicate image is already in the
+        images of the pdf, so its page refers to the same image
+
+        fpdf has no public API for parsed images, so this depends on how FPDF.image() keeps its images,
+        which is checked by the tests of this class
+        """
+        if image_buffer not in pdf.images:
+            image_info["i"] = len(pdf.images) + 1
+            pdf.images[image_buffer] = image_info
+
+    def __merge_texts__(self, texts):
+        texts = [text for text in texts if text is not None]
+
+        if len(texts) == 0:
+            return None
+
+        return "\n".join(texts)
+
+    def __encode_image__(self, image):
+        """Encodes the image in memory, so that it can be added to the pdf without saving it to a file,
+        and parses it into the format of the images in the pdf. It is run in a worker thread
+        """
+        with self.instrumentation.measure("image_encoding"):
+            image = self.__resize_image__(image)
+
+            if self.grayscale and image.ndim == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+            image_format = self.image_format
+            if image_format == "auto":
+                image_format = "png" if self.__is_flat_color__(image) else "jpeg"
+
+            return self.__encode_image_as__(image, image_format)
+
+    def __is_flat_color__(self, image):
+        """Returns True if most pixels of the image have the same color as the pixel to their left,
+        like the pixels of a slide. The pixels of a flat-color image zip well without jpeg artifacts
+        """
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        num_same_pixels = np.count_nonzero(image[:, 1:] == image[:, :-1])
+
+        return num_same_pixels >= FLAT_COLOR_RATIO * image[:, 1:].size
+
+    def __encode_image_as__(self, image, image_format):
+        is_encoded, buffer = cv2.imencode("." + image_format, image)
+
+        if not is_encoded:
+            raise Exception("Failed to encode the image of a page")
+
+        image_buffer = io.BytesIO(buffer.tobytes())
+        image_info = get_img_info(image_buffer)
+
+        return image_buffer, image_info
+
+    def __resize_image__(self, image):
+        """Scales down the image to the dpi of its width on the page"""
+        if self.dpi is None:
+            return image
+
+        width = max(1, int(round(self.dpi * IMAGE_WIDTH_MM / 25.4)))
+        height, cur_width = image.shape[:2]
+
+        if width >= cur_width:
+            return image
+
+        height = max(1, int(round(height * width / cur_width)))
+
+        return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
 
 if __name__ == "__main__":
     # Get the selected frames
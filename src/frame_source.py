@@ -0,0 +1,551 @@
+import re
+import json
+import queue
+import functools
+import threading
+import subprocess
+import collections
+from fractions import Fraction
+import cv2
+import numpy as np
+
+# The time base of the frames, logged by the showinfo filter like "config in time_base: 1/15360, ..."
+SHOWINFO_TIME_BASE_REGEX = re.compile(r"time_base:\s*(\d+)/(\d+)")
+
+# The presentation time of a frame, logged by the showinfo filter like "n:   0 pts:  512 pts_time:0.0333333 ..."
+SHOWINFO_FRAME_REGEX = re.compile(r"\bn:\s*\d+\s+pts:\s*(-?\d+|NOPTS)")
+
+
+@functools.lru_cache(maxsize=None)
+def get_passthrough_option():
+    """Returns the ffmpeg option that passes the frames through with their timestamps, which is -fps_mode
+    since ffmpeg 5.1, where -vsync is deprecated, and -vsync in older versions of ffmpeg
+    """
+    process = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-h", "full"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    if b"-fps_mode" in process.stdout:
+        return "-fps_mode"
+
+    return "-vsync"
+
+
+class FrameSource:
+    """This class is the interface of a source of the frames of a video
+    The frames can be scaled down to a width and converted to grayscale by the source,
+    and only a few frames per second can be read
+
+    Each frame is read into one of a few preallocated buffers, so a frame is only valid until
+    num_buffers - 1 more frames are read; it needs to be copied to be kept for longer
+
+    Attributes
+    ----------
+    video_file : str
+        The file path to the video
+    width : int
+        If set, the frames are scaled down to this width. If None, the frames are kept at their full size
+    grayscale : boolean
+        If True, the frames are converted to grayscale
+    sample_rate : float
+        If set, only this many frames per second are read. If None, every frame is read
+    num_buffers : int
+        The number of buffers that the frames are read into
+    num_frames : int
+        The number of frames in the video that were read or skipped so far
+    """
+
+    # The max. difference in milliseconds between the timestamps of the frames and the timestamps from OpenCV
+    max_timestamp_error = 0
+
+    def __init__(
+        self, video_file, width=None, grayscale=False, sample_rate=None, num_buffers=2
+    ):
+        self.video_file = video_file
+        self.width = width
+        self.grayscale = grayscale
+        self.sample_rate = sample_rate
+        self.num_buffers = num_buffers
+        self.num_frames = 0
+
+    def get_fps(self):
+        """Returns the number of frames per second of the video"""
+        raise NotImplementedError()
+
+    def get_frame_size(self):
+        """Returns the (width, height) of the frames of the video before they are scaled down"""
+        raise NotImplementedError()
+
+    def iter_frames(self):
+        """Reads the frames of the video
+
+        Yields
+        ------
+        frame : (int, float, np.array(x, y, 3) or np.array(x, y))
+            The frame number, the timestamp of the frame in milliseconds, and the frame
+        """
+        raise NotImplementedError()
+
+    def release(self):
+        """Stops reading the video"""
+        pass
+
+    def get_output_size(self):
+        """Returns the (width, height) of the frames that are read"""
+        frame_width, frame_height = self.get_frame_size()
+
+        if self.width is None or self.width >= frame_width:
+            return frame_width, frame_height
+
+        return self.width, max(1, int(round(frame_height * self.width / frame_width)))
+
+    def create_buffers(self):
+        """Returns the preallocated buffers that the frames are read into"""
+        width, height = self.get_output_size()
+        shape = (height, width) if self.grayscale else (height, width, 3)
+
+        return [np.empty(shape, np.uint8) for _ in range(self.num_buffers)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class OpenCVFrameSource(FrameSource):
+    """This class reads the frames of a video with OpenCV (refer to FrameSource)
+    The frames in between two sampled frames are grabbed without being decoded into images
+    """
+
+    def __init__(
+        self, video_file, width=None, grayscale=False, sample_rate=None, num_buffers=2
+    ):
+        super().__init__(video_file, width, grayscale, sample_rate, num_buffers)
+        self.video_reader = cv2.VideoCapture(video_file)
+
+    def get_fps(self):
+        return self.video_reader.get(cv2.CAP_PROP_FPS)
+
+    def get_frame_size(self):
+        return (
+            int(self.video_reader.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.video_reader.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+
+    def iter_frames(self):
+        fps = self.get_fps()
+        step = 1
+        if self.sample_rate is not None and fps > 0:
+            step = max(1, int(round(fps / self.sample_rate)))
+
+        frame_width, frame_height = self.get_frame_size()
+        output_size = self.get_output_size()
+        is_scaled = output_size != (frame_width, frame_height)
+        buffers = self.create_buffers()
+
+        # The frames that are converted or scaled down are decoded and converted into buffers that are reused,
+        # and only the output is written into the buffers that are yielded
+        decoded_buffer = None
+        if self.grayscale or is_scaled:
+            decoded_buffer = np.empty((frame_height, frame_width, 3), np.uint8)
+
+        gray_buffer = None
+        if self.grayscale and is_scaled:
+            gray_buffer = np.empty((frame_height, frame_width), np.uint8)
+
+        frame_num = 0
+        num_frames_read = 0
+
+        while True:
+            buffer = buffers[num_frames_read % len(buffers)]
+
+            if self.grayscale or is_scaled:
+                is_read, frame = self.video_reader.read(decoded_buffer)
+            else:
+                is_read, frame = self.video_reader.read(buffer)
+
+            if not is_read:
+                break
+
+            timestamp = self.video_reader.get(cv2.CAP_PROP_POS_MSEC)
+
+            if self.grayscale:
+                frame = cv2.cvtColor(
+                    frame,
+                    cv2.COLOR_BGR2GRAY,
+                    dst=gray_buffer if is_scaled else buffer,
+                )
+
+            if is_scaled:
+                frame = cv2.resize(
+                    frame, output_size, dst=buffer, interpolation=cv2.INTER_AREA
+                )
+
+            yield frame_num, timestamp, frame
+            num_frames_read += 1
+
+            # Skip over the frames in between two samples
+            frame_num += 1
+            for _ in range(step - 1):
+                if not self.video_reader.grab():
+                    break
+                frame_num += 1
+
+            self.num_frames = frame_num
+
+    def release(self):
+        self.video_reader.release()
+
+
+class FFmpegFrameSource(FrameSource):
+    """This class reads the frames of a video from an ffmpeg process (refer to FrameSource)
+    ffmpeg decodes the video with many threads, and drops the frames in between two samples, scales down
+    the frames and converts them to grayscale before they are piped out as raw images
+
+    The frames are sampled every few decoded frames the same way as OpenCVFrameSource, so the frame numbers
+    are the same as the ones from OpenCV. The timestamps are the presentation times of the frames that ffmpeg
+    logs with the showinfo filter, so they are right for videos with a variable frame rate
+
+    Attributes
+    ----------
+    num_threads : int
+        The number of threads that ffmpeg decodes the video with. If 0, ffmpeg picks it
+    """
+
+    # The timestamps are parsed from the logs of ffmpeg, where they can be rounded
+    max_timestamp_error = 1
+
+    # The number of lines that ffmpeg logs last that are shown when it fails
+    num_error_lines = 20
+
+    def __init__(
+        self,
+        video_file,
+        width=None,
+        grayscale=False,
+        sample_rate=None,
+        num_buffers=2,
+        num_threads=0,
+    ):
+        super().__init__(video_file, width, grayscale, sample_rate, num_buffers)
+        self.num_threads = num_threads
+        self.process = None
+        self.stderr_reader = None
+        self.video_info = self.__probe_video__()
+
+    def get_fps(self):
+        return self.video_info["fps"]
+
+    def get_frame_size(self):
+        return self.video_info["width"], self.video_info["height"]
+
+    def get_step(self):
+        """Returns the number of decoded frames in between two sampled frames"""
+        fps = self.get_fps()
+        if self.sample_rate is None or fps <= 0:
+            return 1
+
+        return max(1, int(round(fps / self.sample_rate)))
+
+    def iter_frames(self):
+        step = self.get_step()
+
+        self.process = subprocess.Popen(
+            self.__get_command__(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self.stderr_reader = FFmpegLogReader(
+            self.process.stderr,
+            self.video_info["time_base"],
+            self.video_info["start_time"],
+            self.num_error_lines,
+        )
+        self.stderr_reader.start()
+        buffers = self.create_buffers()
+
+        output_num = 0
+        while self.__read_into__(buffers[output_num % len(buffers)]):
+            frame_num = output_num * step
+            timestamp = self.stderr_reader.get_timestamp()
+
+            if timestamp is None:
+                self.release()
+                raise Exception(
+                    "Unable to find the timestamp of frame {} of {}".format(
+                        frame_num, self.video_file
+                    )
+                )
+
+            self.num_frames = frame_num + 1
+            yield frame_num, timestamp, buffers[output_num % len(buffers)]
+            output_num += 1
+
+        return_code = self.process.wait()
+        self.stderr_reader.join()
+        error_lines = self.stderr_reader.get_last_lines()
+        self.release()
+
+        if return_code != 0:
+            raise Exception(
+                "ffmpeg failed to read {} with exit code {}:\n{}".format(
+                    self.video_file, return_code, "\n".join(error_lines)
+                )
+            )
+
+        # The frames after the last sampled frame are only known from the metadata of the video
+        if self.video_info["num_frames"] is not None:
+            self.num_frames = max(self.num_frames, self.video_info["num_frames"])
+
+    def release(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.kill()
+            self.process.wait()
+
+            if self.stderr_reader is not None:
+                self.stderr_reader.join()
+                self.stderr_reader = None
+
+            self.process.stderr.close()
+            self.process = None
+
+    def __get_command__(self):
+        """Returns the ffmpeg command that pipes out the sampled frames as raw images
+        It logs the presentation time of each frame that is piped out with the showinfo filter
+        """
+        width, height = self.get_output_size()
+        step = self.get_step()
+
+        filters = []
+        if step > 1:
+            filters.append("select=not(mod(n\\,{}))".format(step))
+        filters.append("scale={}:{}:flags=area".format(width, height))
+        filters.append("showinfo")
+
+        return [
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-v",
+            "info",
+            "-nostdin",
+            "-threads",
+            str(self.num_threads),
+            "-copyts",
+            "-i",
+            self.video_file,
+            "-an",
+            "-sn",
+            get_passthrough_option(),
+            "passthrough",
+            "-vf",
+            ",".join(filters),
+            "-pix_fmt",
+            "gray" if self.grayscale else "bgr24",
+            "-f",
+            "rawvideo",
+            "-",
+        ]
+
+    def __read_into__(self, buffer):
+        """Reads the next raw frame from ffmpeg into the buffer, and returns False if there are no more frames"""
+        view = memoryview(buffer.reshape(-1))
+        num_bytes_read = 0
+
+        while num_bytes_read < len(view):
+            num_bytes = self.process.stdout.readinto(view[num_bytes_read:])
+            if not num_bytes:
+                return False
+            num_bytes_read += num_bytes
+
+        return True
+
+    def __probe_video__(self):
+        command = [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,time_base,start_time",
+            "-of",
+            "json",
+            self.video_file,
+        ]
+        process = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        if process.returncode != 0:
+            raise Exception(
+                "ffprobe failed to read {} with exit code {}:\n{}".format(
+                    self.video_file,
+                    process.returncode,
+                    process.stderr.decode("utf-8", "replace").strip(),
+                )
+            )
+
+        stream = json.loads(process.stdout)["streams"][0]
+
+        fps = 0
+        for key in ("avg_frame_rate", "r_frame_rate"):
+            if stream.get(key, "0/0") not in ("0/0", ""):
+                fps = float(Fraction(stream[key]))
+                break
+
+        num_frames = stream.get("nb_frames")
+        start_time = stream.get("start_time")
+
+        return {
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "fps": fps,
+            "num_frames": int(num_frames) if num_frames else None,
+            "time_base": Fraction(stream.get("time_base", "1/1000")),
+            "start_time": float(start_time) if start_time else 0,
+        }
+
+
+class FFmpegLogReader(threading.Thread):
+    """This class reads the logs of an ffmpeg process in a thread so that ffmpeg is never blocked on them,
+    and parses the timestamps of the frames that the showinfo filter logs
+
+    Attributes
+    ----------
+    stream : file
+        The stderr of the ffmpeg process
+    time_base : Fraction
+        The number of seconds per unit of the presentation times. It is updated from the time base that the
+        showinfo filter logs
+    start_time : float
+        The presentation time of the first frame of the video in seconds, which is the timestamp 0
+    """
+
+    def __init__(self, stream, time_base, start_time, num_last_lines=20):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.time_base = time_base
+        self.start_time = start_time
+        self.timestamps = queue.Queue()
+        self.last_lines = collections.deque(maxlen=num_last_lines)
+
+    def run(self):
+        try:
+            for line in self.stream:
+                line = line.decode("utf-8", "replace").rstrip()
+                timestamp = self.parse_line(line)
+
+                if timestamp is not None:
+                    self.timestamps.put(timestamp)
+                elif "Parsed_showinfo" not in line:
+                    self.last_lines.append(line)
+
+        except ValueError:
+            # Edge case: the stream is closed when the process is released
+            pass
+
+        finally:
+            self.timestamps.put(None)
+
+    def parse_line(self, line):
+        """Parses a line of the logs, and returns the timestamp in milliseconds if it is the line of a frame
+        from the showinfo filter. Otherwise it returns None
+
+        Parameters
+        ----------
+        line : str
+            The line of the logs, like "[Parsed_showinfo_1 @ 0x1] n:   0 pts:  512 pts_time:0.0333333 ..."
+
+        Returns
+        -------
+        timestamp : float
+            The timestamp of the frame in milliseconds, or None
+        """
+        if "Parsed_showinfo" not in line:
+            return None
+
+        match = SHOWINFO_TIME_BASE_REGEX.search(line)
+        if match is not None:
+            self.time_base = Fraction(int(match.group(1)), int(match.group(2)))
+            return None
+
+        match = SHOWINFO_FRAME_REGEX.search(line)
+        if match is None or match.group(1) == "NOPTS":
+            return None
+
+        seconds = float(int(match.group(1)) * self.time_base) - self.start_time
+
+        return seconds * 1000
+
+    def get_timestamp(self):
+        """Returns the timestamp of the next frame that was piped out, or None if ffmpeg stopped logging"""
+        return self.timestamps.get()
+
+    def get_last_lines(self):
+        """Returns the last lines of the logs that are not from the showinfo filter"""
+        return list(self.last_lines)
+
+
+def find_keyframe_timestamps(video_file):
+    """Returns the sorted timestamps of the keyframes of a video in milliseconds, which are found by ffprobe
+    from the flags of the packets of the video without decoding them
+
+    Parameters
+    ----------
+    video_file : str
+        The file path to the video
+
+    Returns
+    -------
+    keyframe_timestamps : float[]
+        The timestamps of the keyframes, where the first frame of the video is at 0 like in OpenCV
+    """
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=start_time:packet=pts_time,flags",
+        "-of",
+        "json",
+        video_file,
+    ]
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if process.returncode != 0:
+        raise Exception(
+            "ffprobe failed to read {} with exit code {}:\n{}".format(
+                video_file,
+                process.returncode,
+                process.stderr.decode("utf-8", "replace").strip(),
+            )
+        )
+
+    return parse_keyframe_timestamps(json.loads(process.stdout))
+
+
+def parse_keyframe_timestamps(probe):
+    """Returns the sorted timestamps of the keyframes in milliseconds from the packets in the json output
+    of ffprobe (refer to find_keyframe_timestamps())
+    """
+    start_time = probe["streams"][0].get("start_time")
+    start_time = float(start_time) if start_time not in (None, "N/A") else 0
+
+    return sorted(
+        (float(packet["pts_time"]) - start_time) * 1000
+        for packet in probe.get("packets", [])
+        if "K" in packet.get("flags", "")
+        and packet.get("pts_time") not in (None, "N/A")
+    )
+
+
+FRAME_SOURCES = {
+    "opencv": OpenCVFrameSource,
+    "ffmpeg": FFmpegFrameSource,
+}
@@ -0,0 +1,215 @@
+import sys
+import json
+import time
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STAGES = (
+    "decode",
+    "diff",
+    "selection",
+    "subtitle_parsing",
+    "segmentation",
+    "image_encoding",
+    "pdf_write",
+)
+
+
+def get_peak_rss_mb():
+    """Returns the peak resident set size of this process in megabytes, or None if it is unknown"""
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # It is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak_rss / (1024 * 1024)
+
+    return peak_rss / 1024
+
+
+class Instrumentation:
+    """This class measures the stages of generating a pdf from a lecture video (refer to STAGES),
+    like decoding the frames, comparing them, or encoding the images of the pdf
+
+    Each stage keeps its total wall time and CPU time, the number of items that it processed (like frames
+    or pages), and the peak memory of the process at the end of its measurements. The CPU time of a measurement
+    is the CPU time of the thread that ran it, so that stages running in different threads are told apart
+
+    Attributes
+    ----------
+    enabled : boolean
+        If False, nothing is measured, so that the stages can always be measured without slowing them down
+    stages : { a -> b }
+        A map of the name a of each stage to its measurements b (refer to get_report())
+    hooks : callable[]
+        The functions that are called with the name of the stage and a measurement (refer to add_hook())
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.hooks = []
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.start_cpu_time = time.process_time()
+
+    def add_hook(self, hook):
+        """Adds a function that is called each time that a stage is measured
+
+        Parameters
+        ----------
+        hook : callable
+            The function, which is called with the name of the stage and a map with the "wall_time" and
+            "cpu_time" in seconds, the "count" of items processed, and the "peak_rss_mb" of the measurement
+        """
+        self.hooks.append(hook)
+
+    def measure(self, stage, count=1):
+        """Measures the code in a with statement as one call of a stage
+
+        The with statement gets a map with the "count" of items processed, which can be changed
+        when the number of items is only known at the end of the call, like:
+
+            with instrumentation.measure("decode", count=0) as measurement:
+                measurement["count"] = num_frames_read
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage
+        count : int
+            The number of items processed by the call
+        """
+        if not self.enabled:
+            return contextlib.nullcontext({"count": count})
+
+        return self.__measure__(stage, count)
+
+    def add(self, stage, wall_time, cpu_time, count=1):
+        """Adds a measurement to a stage
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage
+        wall_time : float
+            The wall time of the measurement in seconds
+        cpu_time : float
+            The CPU time of the measurement in seconds
+        count : int
+            The number of items processed
+        """
+        if not self.enabled:
+            return
+
+        measurement = {
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "count": count,
+            "peak_rss_mb": get_peak_rss_mb(),
+        }
+        self.__add_stage__(stage, measurement, 1)
+
+        for hook in self.hooks:
+            hook(stage, measurement)
+
+    def merge(self, stages):
+        """Adds the stages measured by another instrumentation, like one in another process
+
+        Parameters
+        ----------
+        stages : { a -> b }
+            The stages of the other instrumentation (refer to Instrumentation.stages)
+        """
+        if not self.enabled:
+            return
+
+        for stage, stage_stats in stages.items():
+            self.__add_stage__(stage, stage_stats, stage_stats["calls"])
+
+            for hook in self.hooks:
+                hook(stage, stage_stats)
+
+    def get_report(self):
+        """Returns the measurements of all stages
+
+        Returns
+        -------
+        report : dict
+            The total "wall_time" and "cpu_time" of the process in seconds since the instrumentation was created,
+            the "peak_rss_mb" of the process, and the "stages", which is a map of the name of each stage to
+            its total "wall_time" and "cpu_time" in seconds, its "count" of items processed,
+            its number of "calls", and the "peak_rss_mb" at the end of its calls
+        """
+        with self.lock:
+            stage_names = [stage for stage in STAGES if stage in self.stages]
+            stage_names += sorted(set(self.stages.keys()) - set(STAGES))
+
+            return {
+                "wall_time": time.perf_counter() - self.start_time,
+                "cpu_time": time.process_time() - self.start_cpu_time,
+                "peak_rss_mb": get_peak_rss_mb(),
+                "stages": {stage: dict(self.stages[stage]) for stage in stage_names},
+            }
+
+    def save_report(self, output_filepath):
+        """Saves the measurements of all stages (refer to get_report()) as a json file"""
+        with open(output_filepath, mode="w") as f:
+            json.dump(self.get_report(), f, indent=2)
+
+    @contextlib.contextmanager
+    def __measure__(self, stage, count):
+        measurement = {"count": count}
+        start_time = time.perf_counter()
+        start_cpu_time = time.thread_time()
+
+        try:
+            yield measurement
+        finally:
+            self.add(
+                stage,
+                time.perf_counter() - start_time,
+                time.thread_time() - start_cpu_time,
+                measurement["count"],
+            )
+
+    def __add_stage__(self, stage, measurement, num_calls):
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = {
+                    "wall_time": 0,
+                    "cpu_time": 0,
+                    "count": 0,
+                    "calls": 0,
+                    "peak_rss_mb": None,
+                }
+
+            stage_stats = self.stages[stage]
+            stage_stats["wall_time"] += measurement["wall_time"]
+            stage_stats["cpu_time"] += measurement["cpu_time"]
+            stage_stats["count"] += measurement["count"]
+            stage_stats["calls"] += num_calls
+
+            if measurement["peak_rss_mb"] is not None:
+                stage_stats["peak_rss_mb"] = max(
+                    stage_stats["peak_rss_mb"] or 0, measurement["peak_rss_mb"]
+                )
+
+    def __getstate__(self):
+        # The hooks and the lock stay in this process when the instrumentation is sent to another process
+        state = self.__dict__.copy()
+        state["hooks"] = []
+        del state["lock"]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -1,10 +1,35 @@
 import sys
 import argparse
-from .subtitle_segment_finder import SubtitleGenerator, SubtitleSegmentFinder
-from .subtitle_webvtt_parser import SubtitleWebVTTParser
-from .subtitle_srt_parser import SubtitleSRTParser
+import collections
+import shutil
+import tempfile
+from .subtitle_segment_finder import (
+    SubtitleGenerator,
+    SubtitleSegmentFinder,
+    SENTENCE_TERMINATORS,
+    ALL_SENTENCE_TERMINATORS,
+)
+from .subtitle_parser import SubtitleParser
 from .video_segment_finder import VideoSegmentFinder
-from .content_segment_exporter import ContentSegment, ContentSegmentPdfBuilder
+from .frame_source import FRAME_SOURCES
+from .instrumentation import Instrumentation
+from .content_segment_exporter import (
+    IMAGE_FORMATS,
+    ContentSegment,
+    ContentSegmentPdfBuilder,
+)
+
+
+def parse_region(text):
+    """Parses a rectangle (x, y, width, height) of a frame from the format "x,y,width,height" """
+    try:
+        x, y, width, height = [int(part) for part in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Expected a region in the format x,y,width,height, instead {}".format(text)
+        )
+
+    return x, y, width, height
 
 
 class CommandLineArgRunner:
@@ -18,7 +43,7 @@ class CommandLineArgRunner:
             "--subtitle",
             type=str,
             default=None,
-            help="File path to video subtitle. If omitted, it will generate subtitles",
+            help="File path to video subtitle (.srt or .vtt). If omitted, it will generate subtitles",
         )
         self.parser.add_argument(
             "-S",
@@ -26,6 +51,11 @@ class CommandLineArgRunner:
             action="store_true",
             help="If flag is set, it will ignore setting subtitles to lecture slides",
         )
+        self.parser.add_argument(
+            "--all-sentence-ends",
+            action="store_true",
+            help="If flag is set, it will also split the subtitles at question marks, exclamation marks and the sentence ends of other scripts",
+        )
         self.parser.add_argument(
             "-o",
             "--output",
@@ -33,6 +63,128 @@ class CommandLineArgRunner:
             default="output.pdf",
             help="Output file to generated pdf",
         )
+        self.parser.add_argument(
+            "-r",
+            "--sample-rate",
+            type=float,
+            default=None,
+            help="Number of frames per second to compare. If omitted, it will compare every frame",
+        )
+        self.parser.add_argument(
+            "-w",
+            "--analysis-width",
+            type=int,
+            default=None,
+            help="Width of the grayscale thumbnails used to compare frames. If omitted, it will compare full color frames",
+        )
+        self.parser.add_argument(
+            "-c",
+            "--min-change-ratio",
+            type=float,
+            default=None,
+            help="Min. fraction of pixels that need to change between two frames for them to be distinct",
+        )
+        self.parser.add_argument(
+            "-j",
+            "--num-workers",
+            type=int,
+            default=None,
+            help="Number of processes that scan the video in parallel. If omitted, it will scan the video in one process",
+        )
+        self.parser.add_argument(
+            "--num-threads",
+            type=int,
+            default=None,
+            help="Number of threads that encode the images of the pdf. If omitted, it will use one thread per CPU",
+        )
+        self.parser.add_argument(
+            "--spill-frames",
+            action="store_true",
+            help="If flag is set, it will keep the selected frames in a temporary folder instead of in memory",
+        )
+        self.parser.add_argument(
+            "--cache-dir",
+            type=str,
+            default=None,
+            help="Folder to save the changes between frames in, so that the same video is only scanned once",
+        )
+        self.parser.add_argument(
+            "--stability-window",
+            type=float,
+            default=None,
+            help="Time in milliseconds before a change that needs to have no changes. If omitted, it is 5 frames",
+        )
+        self.parser.add_argument(
+            "--min-segment-duration",
+            type=float,
+            default=2000,
+            help="Min. time in milliseconds between two frames in the pdf",
+        )
+        self.parser.add_argument(
+            "--dpi",
+            type=float,
+            default=None,
+            help="Resolution of the images in the pdf in dots per inch. If omitted, it will keep the full resolution",
+        )
+        self.parser.add_argument(
+            "--grayscale",
+            action="store_true",
+            help="If flag is set, it will convert the images in the pdf to grayscale",
+        )
+        self.parser.add_argument(
+            "--image-format",
+            type=str,
+            choices=IMAGE_FORMATS,
+            default="jpeg",
+            help="Format of the images in the pdf. If auto, it will pick png for flat-color slides and jpeg otherwise",
+        )
+        self.parser.add_argument(
+            "--dedupe-slides",
+            action="store_true",
+            help="If flag is set, it will store the image of a slide that is shown many times only once",
+        )
+        self.parser.add_argument(
+            "--merge-duplicate-slides",
+            action="store_true",
+            help="If flag is set, it will merge the pages of a slide that is shown many times into its first page",
+        )
+        self.parser.add_argument(
+            "--include-region",
+            type=parse_region,
+            action="append",
+            default=None,
+            help="Region x,y,width,height of the frames to compare, like the slides. It can be set many times",
+        )
+        self.parser.add_argument(
+            "--exclude-region",
+            type=parse_region,
+            action="append",
+            default=None,
+            help="Region x,y,width,height of the frames to ignore, like a webcam. It can be set many times",
+        )
+        self.parser.add_argument(
+            "--auto-exclude-regions",
+            action="store_true",
+            help="If flag is set, it will ignore the regions of the frames that change most of the time",
+        )
+        self.parser.add_argument(
+            "--frame-source",
+            type=str,
+            choices=list(FRAME_SOURCES.keys()),
+            default=None,
+            help="Decoder that reads the frames to compare. If omitted, it will compare the frames read by OpenCV",
+        )
+        self.parser.add_argument(
+            "--keyframe-prescan",
+            action="store_true",
+            help="Compare the keyframes of the video first, and only compare every frame in between keyframes that differ",
+        )
+        self.parser.add_argument(
+            "--report",
+            type=str,
+            default=None,
+            help="Output file of the time, CPU time, number of items and peak memory of each stage as json",
+        )
 
     def run(self, args):
         opts = self.parser.parse_args(args)
@@ -41,81 +193,152 @@ class CommandLineArgRunner:
         subtitle_filepath = opts.subtitle
         output_filepath = opts.output
         is_skip_subtitles = opts.skip_subtitles
+        sample_rate = opts.sample_rate
+        analysis_width = opts.analysis_width
+        min_change_ratio = opts.min_change_ratio
+        num_workers = opts.num_workers
 
         if is_skip_subtitles and subtitle_filepath is not None:
             print("Omit the -S / --skip-subtitles flag to add subtitles to pdf")
             raise AssertionError()
 
-        video_segment_finder = VideoSegmentFinder()
-
-        if is_skip_subtitles:
-            self.__generate_pdf_without_subtitles__(
-                video_segment_finder, video_filepath, output_filepath
-            )
-        else:
-            if subtitle_filepath is None:
-                subtitle_parser = SubtitleGenerator(video_filepath)
-            elif subtitle_filepath.endswith(".srt"):
-                subtitle_parser = SubtitleSRTParser(subtitle_filepath)
-            else:
-                subtitle_parser = SubtitleWebVTTParser(subtitle_filepath)
+        spill_dir = None
+        if opts.spill_frames:
+            spill_dir = tempfile.mkdtemp()
 
-            self.__generate_pdf_with_subtitles__(
-                video_segment_finder, video_filepath, subtitle_parser, output_filepath
-            )
+        self.instrumentation = Instrumentation(enabled=opts.report is not None)
+        self.sentence_terminators = (
+            ALL_SENTENCE_TERMINATORS if opts.all_sentence_ends else SENTENCE_TERMINATORS
+        )
 
-    def __generate_pdf_with_subtitles__(
-        self, video_segment_finder, video_filepath, subtitle_parser, output_filepath
-    ):
-        # Get the selected frames
-        print("Getting selected frames")
-        selected_frames_data = video_segment_finder.get_best_segment_frames(
-            video_filepath
+        video_segment_finder = VideoSegmentFinder(
+            sample_rate=sample_rate,
+            analysis_width=analysis_width,
+            min_change_ratio=min_change_ratio,
+            spill_dir=spill_dir,
+            num_workers=num_workers,
+            cache_dir=opts.cache_dir,
+            stability_window_ms=opts.stability_window,
+            min_segment_duration_ms=opts.min_segment_duration,
+            include_regions=opts.include_region,
+            exclude_regions=opts.exclude_region,
+            auto_exclude_regions=opts.auto_exclude_regions,
+            frame_source=opts.frame_source,
+            keyframe_prescan=opts.keyframe_prescan,
+            instrumentation=self.instrumentation,
+        )
+        printer = ContentSegmentPdfBuilder(
+            num_threads=opts.num_threads,
+            dpi=opts.dpi,
+            grayscale=opts.grayscale,
+            image_format=opts.image_format,
+            deduplicate_images=opts.dedupe_slides,
+            merge_duplicate_pages=opts.merge_duplicate_slides,
+            instrumentation=self.instrumentation,
         )
-        frame_nums = sorted(selected_frames_data.keys())
-        selected_frames = [selected_frames_data[i]["frame"] for i in frame_nums]
 
-        print("Number of frames:", len(selected_frames))
+        try:
+            if is_skip_subtitles:
+                self.__generate_pdf_without_subtitles__(
+                    video_segment_finder, video_filepath, printer, output_filepath
+                )
+            else:
+                if subtitle_filepath is None:
+                    subtitle_parser = SubtitleGenerator(video_filepath)
+                else:
+                    subtitle_parser = SubtitleParser(subtitle_filepath)
 
-        # Get the subtitles for each frame
-        print("Getting subtitles for each frame")
-        segment_finder = SubtitleSegmentFinder(subtitle_parser.get_subtitle_parts())
-        subtitle_breaks = [selected_frames_data[i]["timestamp"] for i in frame_nums]
-        segments = segment_finder.get_subtitle_segments(subtitle_breaks)
+                self.__generate_pdf_with_subtitles__(
+                    video_segment_finder,
+                    video_filepath,
+                    subtitle_parser,
+                    printer,
+                    output_filepath,
+                )
+        finally:
+            if spill_dir is not None:
+                shutil.rmtree(spill_dir, ignore_errors=True)
 
-        # Merge the frame and subtitles for each frame to create a pdf
-        print("Merging frames and subtitles")
-        video_subtitle_pages = []
+        if opts.report is not None:
+            self.instrumentation.save_report(opts.report)
 
-        for i in range(0, len(selected_frames)):
-            frame = selected_frames[i]
-            subtitle_page = segments[i]
-            video_subtitle_pages.append(ContentSegment(frame, subtitle_page))
+    def __generate_pdf_with_subtitles__(
+        self,
+        video_segment_finder,
+        video_filepath,
+        subtitle_parser,
+        printer,
+        output_filepath,
+    ):
+        # The frames are selected and their subtitles are found while the pdf is being generated
+        print("Getting selected frames and their subtitles")
+        # The subtitle parts are parsed while the subtitles are found, so only the parts around the next frames
+        # are kept in memory
+        parts = self.__iter_subtitle_parts__(subtitle_parser)
+        segment_finder = SubtitleSegmentFinder(
+            parts,
+            self.instrumentation,
+            sentence_terminators=self.sentence_terminators,
+        )
+        selected_frames = video_segment_finder.iter_best_segment_frames(video_filepath)
 
         print("Generating PDF file")
-        printer = ContentSegmentPdfBuilder()
-        printer.generate_pdf(video_subtitle_pages, output_filepath)
+        video_subtitle_pages = self.__iter_pages_with_subtitles__(
+            selected_frames, segment_finder
+        )
+        num_pages = printer.generate_pdf(video_subtitle_pages, output_filepath)
+
+        print("Number of frames:", num_pages)
 
     def __generate_pdf_without_subtitles__(
-        self, video_segment_finder, video_filepath, output_filepath
+        self, video_segment_finder, video_filepath, printer, output_filepath
     ):
-        # Get the selected frames
+        # The frames are selected while the pdf is being generated
         print("Getting selected frames")
-        selected_frames_data = video_segment_finder.get_best_segment_frames(
-            video_filepath
+        selected_frames = video_segment_finder.iter_best_segment_frames(video_filepath)
+
+        print("Generating PDF file")
+        video_subtitle_pages = (
+            self.__create_page__(selected_frame, None)
+            for selected_frame in selected_frames
         )
-        frame_nums = sorted(selected_frames_data.keys())
-        selected_frames = [selected_frames_data[i]["frame"] for i in frame_nums]
+        num_pages = printer.generate_pdf(video_subtitle_pages, output_filepath)
 
-        print("Number of frames:", len(selected_frames))
+        print("Number of frames:", num_pages)
 
-        # Generating PDF file
-        print("Generating PDF file")
-        video_subtitle_pages = [
-            ContentSegment(frame, None) for frame in selected_frames
-        ]
-        printer = ContentSegmentPdfBuilder()
-        printer.generate_pdf(video_subtitle_pages, output_filepath)
+    def __iter_subtitle_parts__(self, subtitle_parser):
+        parts = subtitle_parser.iter_subtitle_parts()
+
+        while True:
+            with self.instrumentation.measure(
+                "subtitle_parsing", count=0
+            ) as measurement:
+                part = next(parts, None)
+                measurement["count"] = int(part is not None)
+
+            if part is None:
+                return
+
+            yield part
+
+    def __iter_pages_with_subtitles__(self, selected_frames, segment_finder):
+        # The subtitle of a frame is only known once the next frame is selected,
+        # so the frames are kept until their subtitles are found
+        pending_frames = collections.deque()
+
+        def iter_subtitle_breaks():
+            for selected_frame in selected_frames:
+                pending_frames.append(selected_frame)
+                yield selected_frame.timestamp
+
+        for segment in segment_finder.iter_subtitle_segments(iter_subtitle_breaks()):
+            yield self.__create_page__(pending_frames.popleft(), segment)
+
+    def __create_page__(self, selected_frame, text):
+        page = ContentSegment(selected_frame.frame, text)
+        selected_frame.release()
+
+        return page
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def select_segment_frames(
+    timestamps,
+    num_pixels_changed,
+    min_change,
+    frame_nums=None,
+    num_stable_frames=5,
+    min_segment_duration=2000,
+):
+    """Selects the frames of the best possible video segments from the changes between the frames of a video
+    (refer to VideoSegmentFinder.get_best_segment_frames())
+
+    A frame i that changed is a candidate if none of the num_stable_frames frames before it changed,
+    and the frame before it (the frame that was shown until the change) is picked for the candidate.
+    The frame after the last frame of the video is always a candidate.
+    A candidate that is less than min_segment_duration after the last kept candidate is a glitch, and both
+    are removed, except for the earliest one. The first kept candidate is a blank screen and is removed too.
+
+    Parameters
+    ----------
+    timestamps : np.array(n)
+        The timestamp of each analyzed frame in milliseconds
+    num_pixels_changed : np.array(n)
+        The number of pixel changes from the frame before each analyzed frame to the analyzed frame
+    min_change : int
+        The min. number of pixel changes for a frame to be distinct from the frame before it
+    frame_nums : np.array(n)
+        The frame number of each analyzed frame. The frames that were not analyzed have no changes.
+        If None, every frame of the video was analyzed
+    num_stable_frames : int
+        The number of frames before a change that need to have no changes
+    min_segment_duration : float
+        The min. time between two selected frames in milliseconds
+
+    Returns
+    -------
+    selected_indices : np.array(int)
+        The index i of the analyzed frame right after each selected frame, so the selected frame is at timestamps[i - 1].
+        An index of n is the frame after the last frame of the video, whose selected frame is at timestamps[n - 1]
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    num_pixels_changed = np.asarray(num_pixels_changed)
+
+    if frame_nums is None:
+        frame_nums = np.arange(len(timestamps))
+    frame_nums = np.asarray(frame_nums, dtype=np.int64)
+
+    # A changed frame is a candidate if the last changed frame is more than num_stable_frames frames before it
+    changed_indices = np.flatnonzero(num_pixels_changed > min_change)
+    changed_frame_nums = frame_nums[changed_indices]
+    num_frames_since_last_change = np.diff(
+        changed_frame_nums, prepend=-(num_stable_frames + 1)
+    )
+    candidate_indices = changed_indices[
+        num_frames_since_last_change > num_stable_frames
+    ]
+    candidate_indices = np.append(candidate_indices, len(timestamps))
+
+    # The timestamp of a candidate is the timestamp of the frame before it
+    candidate_timestamps = np.concatenate(([0], timestamps))[candidate_indices]
+
+    # A candidate is removed if the candidate before it was kept and is too close to it, so in a run of
+    # candidates that are too close to each other, every second candidate is kept
+    is_too_close = np.diff(candidate_timestamps, prepend=-np.inf) < min_segment_duration
+    positions = np.arange(len(candidate_indices))
+    run_starts = np.maximum.accumulate(np.where(is_too_close, 0, positions))
+    is_kept = (positions - run_starts) % 2 == 0
+
+    # Edge case: skip the first kept candidate since it is just a blank screen
+    return candidate_indices[is_kept][1:]
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import numpy as np
+
+
+class SelectedFrame:
+    """A class that represents a frame selected by the VideoSegmentFinder
+    The frame can either be kept in memory or spilled to a file on disk, in which case it is loaded when it is accessed
+
+    It can also be accessed like the frame data dictionary, for instance selected_frame["timestamp"]
+
+    Attributes
+    ----------
+    frame_num : int
+        The frame number of the frame right after the selected frame
+    timestamp : float
+        The timestamp of the selected frame in milliseconds
+    num_pixels_changed : int
+        The number of pixel changes from the selected frame to the next frame
+    next_frame : np.array(x, y, 3)
+        The frame right after the selected frame. It is None unless debug frames are saved
+    mask : np.array(x, y)
+        The difference between the selected frame and the next frame. It is None unless debug frames are saved
+    """
+
+    __slots__ = (
+        "frame_num",
+        "timestamp",
+        "num_pixels_changed",
+        "next_frame",
+        "mask",
+        "_frame",
+        "_frame_filepath",
+    )
+
+    def __init__(
+        self,
+        frame_num,
+        timestamp,
+        frame,
+        num_pixels_changed,
+        next_frame=None,
+        mask=None,
+        spill_dir=None,
+    ):
+        self.frame_num = frame_num
+        self.timestamp = timestamp
+        self.num_pixels_changed = num_pixels_changed
+        self.next_frame = next_frame
+        self.mask = mask
+        self._frame = None
+        self._frame_filepath = None
+
+        if spill_dir is None:
+            self._frame = frame
+        else:
+            file_descriptor, self._frame_filepath = tempfile.mkstemp(
+                prefix=f"frame_{frame_num}_", suffix=".npy", dir=spill_dir
+            )
+            with os.fdopen(file_descriptor, "wb") as f:
+                np.save(f, frame)
+
+    @property
+    def frame(self):
+        """The selected frame"""
+        if self._frame_filepath is not None:
+            return np.load(self._frame_filepath)
+
+        return self._frame
+
+    def release(self):
+        """Deletes the selected frame from memory and from the disk"""
+        if self._frame_filepath is not None and os.path.exists(self._frame_filepath):
+            os.remove(self._frame_filepath)
+
+        self._frame = None
+        self._frame_filepath = None
+
+    def __getitem__(self, key):
+        if key not in (
+            "frame",
+            "timestamp",
+            "num_pixels_changed",
+            "next_frame",
+            "mask",
+        ):
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __str__(self):
+        return "{}-{}".format(self.frame_num, self.timestamp)
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,211 @@
+import cv2
+import numpy as np
+
+# The number of bits in each row and in each column of the hashes of the slides
+HASH_SIZE = 16
+
+
+def compute_dhash(image, hash_size=HASH_SIZE):
+    """Computes the difference hash of an image, which is the same for images that look the same
+    The image is shrunk to a grayscale image of (hash_size + 1) x hash_size, and each bit is set
+    if a pixel is brighter than the pixel to its left
+
+    Parameters
+    ----------
+    image : np.array(x, y, 3) or np.array(x, y)
+        The image
+    hash_size : int
+        The number of bits in each row and in each column of the hash
+
+    Returns
+    -------
+    dhash : int
+        The hash, with hash_size * hash_size bits
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    small_image = cv2.resize(
+        image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA
+    )
+    bits = small_image[:, 1:] > small_image[:, :-1]
+
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class SlideIndex:
+    """This class finds the images of slides that were already seen before
+    Images with similar perceptual hashes are compared as grayscale thumbnails so that two slides
+    with the same layout but different content are not mistaken for each other.
+    A match of the thumbnails is then confirmed on the grayscale images at full resolution, so that
+    a slide is not mistaken for the same slide with a small annotation added to it.
+    The full resolution images are kept as pngs so that they take little memory
+
+    The hashes are split into max_hash_distance + 1 chunks, and a slide is only compared if one of the chunks
+    of its hash is the same as the one of the image. Two hashes with at most max_hash_distance different bits
+    have at least one chunk with no different bits, so no slide is missed without comparing every slide
+
+    Attributes
+    ----------
+    max_hash_distance : int
+        The max. number of different bits in the hashes of two images of the same slide
+    threshold : int
+        Is the min. difference between the color of two thumbnails on one pixel location for it to be distinct
+    max_change_ratio : float
+        The max. fraction of pixels in the thumbnails of two images of the same slide that can be distinct
+    thumbnail_width : int
+        The width of the thumbnails that images are compared with
+    max_num_pixels_changed : int
+        The max. number of pixels in the full resolution images of two images of the same slide that
+        can be distinct. It should be much smaller than the min_change of the VideoSegmentFinder that
+        found the images, since two images with fewer changes than min_change can still show different slides
+    slides : (int, np.array, np.array)[]
+        The hash, the thumbnail and the png of each slide, where the index is the id of the slide
+    hash_buckets : { a -> int[] }[]
+        For each chunk of the hashes, a map of the value a of the chunk to the ids of the slides with it
+    """
+
+    def __init__(
+        self,
+        max_hash_distance=10,
+        threshold=20,
+        max_change_ratio=0.005,
+        thumbnail_width=160,
+        max_num_pixels_changed=100,
+    ):
+        self.max_hash_distance = max_hash_distance
+        self.threshold = threshold
+        self.max_change_ratio = max_change_ratio
+        self.thumbnail_width = thumbnail_width
+        self.max_num_pixels_changed = max_num_pixels_changed
+        self.slides = []
+        self.hash_buckets = [{} for _ in range(max_hash_distance + 1)]
+
+    def find_or_add(self, image):
+        """Finds the slide of an image, or adds the image as a new slide if it was not seen before
+
+        Parameters
+        ----------
+        image : np.array(x, y, 3)
+            The image
+
+        Returns
+        -------
+        slide_id : int
+            The id of the slide, which is the number of slides that were seen before the slide
+        is_new : boolean
+            True if the image is a new slide; else False
+        """
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        dhash = compute_dhash(image)
+        thumbnail = self.__get_thumbnail__(image)
+
+        hash_chunks = self.__get_hash_chunks__(dhash)
+
+        # The slides are compared in the order that they were added, so that the first matching slide is found
+        slide_ids = set()
+        for hash_bucket, hash_chunk in zip(self.hash_buckets, hash_chunks):
+            slide_ids.update(hash_bucket.get(hash_chunk, []))
+
+        for slide_id in sorted(slide_ids):
+            slide_dhash, slide_thumbnail, slide_png = self.slides[slide_id]
+
+            if bin(dhash ^ slide_dhash).count("1") > self.max_hash_distance:
+                continue
+
+            if not self.__is_same_thumbnail__(thumbnail, slide_thumbnail):
+                continue
+
+            if self.__is_same_image__(image, slide_png):
+                return slide_id, False
+
+        is_encoded, png = cv2.imencode(".png", image)
+        if not is_encoded:
+            raise Exception("Unable to encode the image of the slide")
+
+        slide_id = len(self.slides)
+        self.slides.append((dhash, thumbnail, png))
+
+        for hash_bucket, hash_chunk in zip(self.hash_buckets, hash_chunks):
+            hash_bucket.setdefault(hash_chunk, []).append(slide_id)
+
+        return slide_id, True
+
+    def __get_hash_chunks__(self, dhash):
+        """Splits the bits of a hash into len(hash_buckets) chunks of about the same size"""
+        num_bits = HASH_SIZE * HASH_SIZE
+        num_chunks = len(self.hash_buckets)
+        chunk_offsets = [i * num_bits // num_chunks for i in range(num_chunks + 1)]
+
+        return [
+            (dhash >> start) & ((1 << (end - start)) - 1)
+            for start, end in zip(chunk_offsets[:-1], chunk_offsets[1:])
+        ]
+
+    def __get_thumbnail__(self, image):
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        height, width = image.shape[:2]
+        thumbnail_height = max(1, int(round(height * self.thumbnail_width / width)))
+
+        return cv2.resize(
+            image,
+            (self.thumbnail_width, thumbnail_height),
+            interpolation=cv2.INTER_AREA,
+        )
+
+    def __is_same_thumbnail__(self, thumbnail, other_thumbnail):
+        if thumbnail.shape != other_thumbnail.shape:
+            return False
+
+        diff = cv2.absdiff(thumbnail, other_thumbnail)
+        num_pixels_changed = np.sum(diff > self.threshold)
+
+        return num_pixels_changed <= self.max_change_ratio * diff.size
+
+    def __is_same_image__(self, image, other_png):
+        other_image = cv2.imdecode(other_png, cv2.IMREAD_GRAYSCALE)
+
+        if image.shape != other_image.shape:
+            return False
+
+        diff = cv2.absdiff(image, other_image)
+        num_pixels_changed = np.sum(diff > self.threshold)
+
+        return num_pixels_changed <= self.max_num_pixels_changed
+
+
+def find_duplicate_frames(selected_frames, slide_index=None):
+    """Finds the selected frames that show a slide that was shown by an earlier selected frame
+
+    Parameters
+    ----------
+    selected_frames : { a -> b }
+        A map of frame number a to the frame data b (refer to VideoSegmentFinder.get_best_segment_frames())
+    slide_index : SlideIndex
+        The index that the frames are found in. If None, a new index is used
+
+    Returns
+    -------
+    duplicate_frames : { a -> c }
+        A map of the frame number a of each duplicate frame to the frame number c of the first frame
+        that showed the same slide
+    """
+    if slide_index is None:
+        slide_index = SlideIndex()
+
+    slide_id_to_frame_num = {}
+    duplicate_frames = {}
+
+    for frame_num in sorted(selected_frames.keys()):
+        slide_id, is_new = slide_index.find_or_add(selected_frames[frame_num]["frame"])
+
+        if is_new:
+            slide_id_to_frame_num[slide_id] = frame_num
+        else:
+            duplicate_frames[frame_num] = slide_id_to_frame_num[slide_id]
+
+    return duplicate_frames
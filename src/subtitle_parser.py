@@ -0,0 +1,227 @@
+import re
+import itertools
+import numpy as np
+from .subtitle_part import SubtitlePart
+from .subtitle_track import SubtitleTrack
+
+SUBTITLE_FORMATS = ("srt", "vtt")
+
+# A timestamp like 01:02:03,456 or 01:02:03.456, where the hours are optional
+TIMESTAMP_PATTERN = r"(?:(\d+):)?(\d+):(\d+)[,.](\d{1,3})"
+
+# The line with the start and end timestamps of a cue
+TIMING_LINE_PATTERN = r"[ \t]*{0}[ \t]*-->[ \t]*{0}".format(TIMESTAMP_PATTERN)
+TIMING_LINE_REGEX = re.compile(TIMING_LINE_PATTERN)
+
+# A cue is a timing line followed by its lines of text, which end at an empty line or at the next timing line
+CUE_REGEX = re.compile(
+    r"^{}[^\n]*(?:\n|\Z)((?:(?![^\n]*-->)[^\n]+(?:\n|\Z))*)".format(
+        TIMING_LINE_PATTERN
+    ),
+    re.MULTILINE,
+)
+
+# The tags in the text of a WebVTT cue, like <b> or <00:00:01.000>
+CUE_TAG_REGEX = re.compile("<.*?>")
+
+
+class SubtitleParser:
+    """Parses the subtitles and its parts from a .srt or a .vtt file in one pass
+
+    The format of the file is found from its content, so the file can have any extension.
+    The parts are the same as the ones from SubtitleSRTParser and SubtitleWebVTTParser
+
+    Attributes
+    ----------
+    input_file : str
+        The file path to the subtitles
+    subtitle_format : str
+        The format of the subtitles, which is "srt" or "vtt" (refer to SUBTITLE_FORMATS).
+        If None, it is found from the content of the file
+    """
+
+    def __init__(self, input_file, subtitle_format=None):
+        self.input_file = input_file
+        self.subtitle_format = subtitle_format
+
+    def get_subtitle_parts(self):
+        """Parses and gets the subtitle parts from the subtitle's file
+           It also expands the subtitles in cases where there are gaps between subtitles
+
+        Returns
+        -------
+        parts : SubtitleTrack
+            The ordered subtitle parts
+        """
+        with open(self.input_file, mode="r", encoding="utf-8-sig") as f:
+            content = f.read()
+
+        subtitle_format = self.subtitle_format
+        if subtitle_format is None:
+            subtitle_format = self.get_format(content)
+
+        cues = CUE_REGEX.findall(content)
+
+        texts = [self.__filter_text__(cue[8], subtitle_format) for cue in cues]
+        is_kept = np.array([len(text) > 0 for text in texts], dtype=bool)
+        texts = [text for text in texts if len(text) > 0]
+
+        start_times, end_times = self.__convert_timestamps__(cues, subtitle_format)
+
+        # Extend certain subtitle times to fill in gaps
+        parts = SubtitleTrack(start_times[is_kept], end_times[is_kept], texts)
+        parts.fill_gaps()
+
+        return parts
+
+    def iter_subtitle_parts(self):
+        """Parses and yields the subtitle parts from the subtitle's file while it is being read line by line
+        (refer to get_subtitle_parts())
+
+        Each part is yielded once the next part is read, so that its end time can be extended to fill in
+        the gap until the next part
+
+        Yields
+        ------
+        part : SubtitlePart
+            The subtitle parts in order
+        """
+        with open(self.input_file, mode="r", encoding="utf-8-sig") as f:
+            lines = (line.rstrip("\n") for line in f)
+
+            subtitle_format = self.subtitle_format
+            if subtitle_format is None:
+                # The format is found from the first line that is not empty
+                first_lines = []
+                for line in lines:
+                    first_lines.append(line)
+                    if len(line.strip()) > 0:
+                        break
+
+                header = "\n".join(first_lines).lstrip()
+                subtitle_format = "vtt" if header.startswith("WEBVTT") else "srt"
+                lines = itertools.chain(first_lines, lines)
+
+            prev_part = None
+            num_cues = 0
+
+            for part in self.__iter_cues__(lines, subtitle_format):
+                num_cues += 1
+
+                if len(part.text) == 0:
+                    continue
+
+                # Extend the subtitle time to fill in the gap
+                if prev_part is not None:
+                    prev_part.end_time = part.start_time
+                    yield prev_part
+
+                prev_part = part
+
+            if prev_part is not None:
+                yield prev_part
+
+            if (
+                num_cues == 0
+                and self.subtitle_format is None
+                and subtitle_format == "srt"
+            ):
+                raise ValueError(
+                    "{} is not a .srt or a .vtt subtitle file".format(self.input_file)
+                )
+
+    def get_format(self, content):
+        """Returns the format of subtitles from their content, which is "vtt" if it has a WebVTT header,
+        or "srt" if it has cues without the header
+
+        Parameters
+        ----------
+        content : str
+            The content of the subtitle's file
+
+        Returns
+        -------
+        subtitle_format : str
+            The format of the subtitles (refer to SUBTITLE_FORMATS)
+        """
+        if content.lstrip().startswith("WEBVTT"):
+            return "vtt"
+
+        if CUE_REGEX.search(content) is not None:
+            return "srt"
+
+        raise ValueError(
+            "{} is not a .srt or a .vtt subtitle file".format(self.input_file)
+        )
+
+    def __convert_timestamps__(self, cues, subtitle_format):
+        """Converts the start and end timestamps of all cues to milliseconds at once (refer to __convert_timestamp__())"""
+        if len(cues) == 0:
+            return np.zeros(0), np.zeros(0)
+
+        # Each field is prefixed with a 0 so that the missing hours are parsed as 0
+        fields = " 0".join(itertools.chain.from_iterable(cue[:8] for cue in cues))
+        fields = np.fromstring("0" + fields, dtype=np.int64, sep=" ").reshape(-1, 8)
+
+        start_times = self.__convert_timestamp__(*fields[:, :4].T, subtitle_format)
+        end_times = self.__convert_timestamp__(*fields[:, 4:].T, subtitle_format)
+
+        return start_times, end_times
+
+    def __convert_timestamp__(
+        self, hours, minutes, seconds, milliseconds, subtitle_format
+    ):
+        """Converts a timestamp to milliseconds, where the fields are ints or arrays of ints
+        The times are computed the same way as the srt and webvtt libraries, so that they are equal to their times
+        """
+        if subtitle_format == "srt":
+            microseconds = (hours * 3600 + minutes * 60 + seconds) * 1000000
+            microseconds += milliseconds * 1000
+            return microseconds / 1000000 * 1000
+
+        return (
+            hours * 3600000
+            + minutes * 60000
+            + (seconds * 1000 + milliseconds) / 1000 * 1000
+        )
+
+    def __iter_cues__(self, lines, subtitle_format):
+        """Yields the cues in the lines of a subtitle's file as subtitle parts, without filling in the gaps"""
+        fields = None
+        text_lines = []
+
+        for line in lines:
+            match = TIMING_LINE_REGEX.match(line)
+
+            if match is not None:
+                if fields is not None:
+                    yield self.__create_part__(fields, text_lines, subtitle_format)
+
+                fields = [int(field) if field else 0 for field in match.groups()]
+                text_lines = []
+
+            elif fields is not None and len(line) > 0 and "-->" not in line:
+                text_lines.append(line)
+
+            elif fields is not None:
+                yield self.__create_part__(fields, text_lines, subtitle_format)
+                fields = None
+
+        if fields is not None:
+            yield self.__create_part__(fields, text_lines, subtitle_format)
+
+    def __create_part__(self, fields, text_lines, subtitle_format):
+        return SubtitlePart(
+            self.__convert_timestamp__(*fields[:4], subtitle_format),
+            self.__convert_timestamp__(*fields[4:], subtitle_format),
+            self.__filter_text__("\n".join(text_lines), subtitle_format),
+        )
+
+    def __filter_text__(self, segment_text, subtitle_format):
+        """Takes in the text of a subtitle segment and cleans it"""
+        segment_text = segment_text.rstrip("\n")
+
+        if subtitle_format == "vtt":
+            segment_text = CUE_TAG_REGEX.sub("", segment_text)
+
+        return segment_text.replace("\n", " ").strip()
@@ -11,6 +11,8 @@ class SubtitlePart:
         The text corresponding to the subtitle's part
     """
 
+    __slots__ = ("start_time", "end_time", "text")
+
     def __init__(self, start_time, end_time, text):
         self.start_time = start_time
         self.end_time = end_time
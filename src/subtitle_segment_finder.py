@@ -1,5 +1,18 @@
+import re
+import numpy as np
+from .subtitle_track import SubtitleTrack
 from .subtitle_webvtt_parser import SubtitleWebVTTParser
 from .subtitle_srt_parser import SubtitleSRTParser
+from .instrumentation import Instrumentation
+
+# The characters that end a sentence
+SENTENCE_TERMINATORS = "."
+
+# The characters that end a sentence, including question marks, exclamation marks and the full stops,
+# question marks and exclamation marks of other scripts
+ALL_SENTENCE_TERMINATORS = (
+    ".?!\u2026\u3002\uff0e\uff1f\uff01\uff61\u061f\u06d4\u0964\u0965\u1362"
+)
 
 
 class SubtitleGenerator:
@@ -11,10 +24,42 @@ class SubtitleGenerator:
 
 
 class SubtitleSegmentFinder:
-    """This class finds the best subtitle segments from the end times of video segments"""
-
-    def __init__(self, parts):
-        self.parts = parts
+    """This class finds the best subtitle segments from the end times of video segments
+
+    Attributes
+    ----------
+    parts : SubtitleTrack
+        The ordered subtitle parts, where a segment is a slice of the text of the track
+        (a list of SubtitlePart can also be given, which is turned into a track).
+        If the parts are read from an iterator, it only has the parts that are still needed to find the segments
+    instrumentation : Instrumentation
+        It measures the time spent on finding the segments. If None, nothing is measured
+    sentence_terminators : str
+        The characters that end a sentence, which the segments are split at (like SENTENCE_TERMINATORS
+        or ALL_SENTENCE_TERMINATORS)
+    terminator_offsets : np.array(int64)
+        The offsets of the sentence terminators (like '.', '?' and '!') in the text of the track, in increasing order
+    part_iterator : iterator of SubtitlePart
+        If set, the parts that are not read yet, which are read while the segments are found.
+        The parts need to have no gaps between them, like the ones from SubtitleParser.iter_subtitle_parts().
+        If None, all parts were read
+    """
+
+    def __init__(
+        self, parts, instrumentation=None, sentence_terminators=SENTENCE_TERMINATORS
+    ):
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.sentence_terminators = sentence_terminators
+        self.sentence_terminators_regex = re.compile(
+            "[{}]".format(re.escape(sentence_terminators))
+        )
+        self.part_iterator = None
+
+        if not hasattr(parts, "__len__"):
+            self.part_iterator = iter(parts)
+            parts = []
+
+        self.__set_parts__(parts)
 
     def get_subtitle_segments(self, video_segment_end_times):
         """Returns the subtitles of video segments given the end times of each video segment
@@ -36,52 +81,160 @@ class SubtitleSegmentFinder:
         segments : str[]
             A list of subtitle segments
         """
-        part_positions = []
+        return list(self.iter_subtitle_segments(video_segment_end_times))
 
-        for i in range(len(video_segment_end_times)):
-            time_break = video_segment_end_times[i]
+    def iter_subtitle_segments(self, video_segment_end_times):
+        """Yields the subtitles of video segments while the end times of each video segment are being found
+        (refer to get_subtitle_segments())
 
-            prev_time_break = 0
-            if i > 0:
-                prev_time_break = video_segment_end_times[i - 1]
+        The subtitle of a video segment depends on the end time of the next video segment,
+        so it is yielded once the next end time is known
 
-            next_time_break = float('inf')
-            if i < len(video_segment_end_times) - 1:
-                next_time_break =  video_segment_end_times[i + 1]
+        Parameters
+        ----------
+        video_segment_end_times : iterable of int
+            The timestamps representing the end times of each video segment, in increasing order
 
-            pos = self.__get_part_position_of_time_break__(time_break, prev_time_break, next_time_break)
-            part_positions.append(pos)
+        Yields
+        ------
+        segment : str
+            The subtitle segment of each video segment
+        """
+        end_times = iter(video_segment_end_times)
 
-        start_pos = (0, 0)
-        segments = []
-        for end_pos in part_positions:
-            segment = None
+        prev_time_break = 0
+        time_break = next(end_times, None)
+        start_offset = 0
 
-            if start_pos[0] > end_pos[0]:
-                segment = ""
+        while time_break is not None:
+            next_time_break = next(end_times, None)
 
-            elif start_pos[0] == end_pos[0] and start_pos[1] > end_pos[1]:
-                segment = ""
+            max_time_break = (
+                float("inf") if next_time_break is None else next_time_break
+            )
 
-            elif start_pos[0] == end_pos[0] and start_pos[1] <= end_pos[1]:
-                segment = self.parts[start_pos[0]].text[start_pos[1] : end_pos[1] + 1]
+            # The parts are read outside of the measurement, since the time spent on parsing them is measured
+            # by the reader of the parts
+            if self.part_iterator is not None:
+                start_offset = self.__update_parts__(
+                    start_offset, time_break, prev_time_break, max_time_break
+                )
 
-            elif start_pos[0] < end_pos[0]:
-                segment = " ".join(
-                    [self.parts[start_pos[0]].text[start_pos[1] :].strip()]
-                    + [self.parts[i].text for i in range(start_pos[0] + 1, end_pos[0])]
-                    + [self.parts[end_pos[0]].text[0 : end_pos[1] + 1].strip()]
+            with self.instrumentation.measure("segmentation"):
+                end_offset = self.__get_offset_of_time_break__(
+                    time_break, prev_time_break, max_time_break, start_offset
                 )
+                segment = self.parts.text[start_offset : end_offset + 1].strip()
 
-            segment = segment.strip()
+            yield segment
 
-            start_pos = (end_pos[0], end_pos[1] + 1)
+            start_offset = end_offset + 1
+            prev_time_break = time_break
+            time_break = next_time_break
 
-            segments.append(segment)
+    def __set_parts__(self, parts):
+        if not isinstance(parts, SubtitleTrack):
+            parts = SubtitleTrack.from_parts(parts)
 
-        return segments
+        self.parts = parts
+        self.terminator_offsets = self.__find_terminators__(0)
+
+    def __drop_parts__(self, num_parts):
+        """Drops the first num_parts parts, and the sentence terminators in their text"""
+        text_offset = int(self.parts.text_offsets[num_parts])
+        num_dropped_terminators = int(
+            np.searchsorted(self.terminator_offsets, text_offset, side="left")
+        )
+
+        self.parts.drop(num_parts)
+        self.terminator_offsets = (
+            self.terminator_offsets[num_dropped_terminators:] - text_offset
+        )
+
+    def __append_parts__(self, parts):
+        """Appends a list of SubtitlePart, and only finds the sentence terminators in their text"""
+        text_length = len(self.parts.text)
+
+        self.parts.extend(parts)
+        self.terminator_offsets = np.append(
+            self.terminator_offsets, self.__find_terminators__(text_length)
+        )
+
+    def __find_terminators__(self, start_offset):
+        """Returns the offsets of the sentence terminators in the text of the parts from start_offset on"""
+        return np.array(
+            [
+                match.start()
+                for match in self.sentence_terminators_regex.finditer(
+                    self.parts.text, start_offset
+                )
+            ],
+            dtype=np.int64,
+        )
+
+    def __update_parts__(
+        self, start_offset, time_break, min_time_break, max_time_break
+    ):
+        """Drops the parts before the next segment and before the part of the previous time break,
+        and reads the parts from the iterator until the first part after the next time break
+
+        Parameters
+        ----------
+        start_offset : int
+            The offset of the start of the next segment in the text of the parts
+        time_break : float
+            The end time of the next segment
+        min_time_break : float
+            The previous time break
+        max_time_break : float
+            The next time break after time_break
 
-    def __get_part_position_of_time_break__(self, time_break, min_time_break, max_time_break):
+        Returns
+        -------
+        start_offset : int
+            The offset of the start of the next segment in the text of the new parts
+        """
+        min_part_idx = self.__find_part__(min_time_break)
+        if min_part_idx is not None:
+            start_part_idx = np.searchsorted(
+                self.parts.text_offsets, start_offset, side="right"
+            )
+            num_dropped_parts = min(min_part_idx, int(start_part_idx) - 1)
+
+            start_offset -= int(self.parts.text_offsets[num_dropped_parts])
+            self.__drop_parts__(num_dropped_parts)
+
+        new_parts = []
+        last_start_time = None
+        if len(self.parts) > 0:
+            last_start_time = self.parts.start_times[-1]
+
+        while last_start_time is None or last_start_time <= max_time_break:
+            part = next(self.part_iterator, None)
+
+            if part is None:
+                self.part_iterator = None
+                break
+
+            new_parts.append(part)
+            last_start_time = part.start_time
+
+        self.__append_parts__(new_parts)
+
+        # If the next time break is not in a part, the nearest sentence terminator can be in any of the next parts
+        if (
+            self.part_iterator is not None
+            and self.__find_part__(max_time_break) is None
+            and self.__find_part__(time_break) is not None
+        ):
+            self.__append_parts__(list(self.part_iterator))
+            self.part_iterator = None
+
+        return start_offset
+
+    def __get_offset_of_time_break__(
+        self, time_break, min_time_break, max_time_break, start_offset=0
+    ):
         min_part_idx = self.__find_part__(min_time_break)
         max_part_idx = self.__find_part__(max_time_break)
         part_index = self.__find_part__(time_break)
@@ -93,79 +246,71 @@ class SubtitleSegmentFinder:
             max_part_idx = len(self.parts)
 
         # If the page_break_time > last fragment's time, then that page needs to capture the entire thing
-        if time_break >= self.parts[-1].end_time:
-            return len(self.parts) - 1, len(self.parts[-1].text) - 1
+        if time_break >= self.parts.end_times[-1]:
+            return len(self.parts.text) - 1
 
         if part_index is None:
-            return 0, -1
+            return -1
 
-        part = self.parts[part_index]
+        start_time = self.parts.start_times[part_index]
+        end_time = self.parts.end_times[part_index]
+        part_offset = int(self.parts.text_offsets[part_index])
+        part_length = int(self.parts.text_offsets[part_index + 1]) - part_offset - 1
 
         # Get the char index in the fragment equal to the time_break
-        ratio = (time_break - part.start_time) / (part.end_time - part.start_time)
-        part_char_index = int(ratio * len(part.text))
-
-        # Find the nearest position of a '.' left or right of 'part_index' and 'part_char_index'
-        left_part_index = part_index
-        left_part_char_index = part_char_index
-        right_part_index = part_index
-        right_part_char_index = part_char_index
-
-        while left_part_index >= min_part_idx and right_part_index < max_part_idx:
-            if self.parts[left_part_index].text[left_part_char_index] == ".":
-                return left_part_index, left_part_char_index
-
-            if self.parts[right_part_index].text[right_part_char_index] == ".":
-                return right_part_index, right_part_char_index
-
-            left_part_char_index -= 1
-            right_part_char_index += 1
-
-            if left_part_char_index < 0:
-                left_part_index -= 1
-                left_part_char_index = len(self.parts[left_part_index].text) - 1
-
-            if right_part_char_index >= len(self.parts[right_part_index].text):
-                right_part_index += 1
-                right_part_char_index = 0
-
-        while left_part_index >= min_part_idx:
-            if self.parts[left_part_index].text[left_part_char_index] == ".":
-                return left_part_index, left_part_char_index
-
-            left_part_char_index -= 1
-
-            if left_part_char_index < 0:
-                left_part_index -= 1
-                left_part_char_index = len(self.parts[left_part_index].text) - 1
-
-        while right_part_index < max_part_idx:
-            if self.parts[right_part_index].text[right_part_char_index] == ".":
-                return right_part_index, right_part_char_index
-
-            right_part_char_index += 1
-
-            if right_part_char_index >= len(self.parts[right_part_index].text):
-                right_part_index += 1
-                right_part_char_index = 0
+        ratio = (time_break - start_time) / (end_time - start_time)
+        offset = part_offset + int(ratio * part_length)
+
+        # Find the nearest sentence terminator left or right of the offset (preferring the left one),
+        # without going past the parts of the previous and the next time breaks.
+        # The terminator that ended the previous segment cannot end this segment too, so that no segment is empty
+        min_offset = max(int(self.parts.text_offsets[min_part_idx]), start_offset)
+        max_offset = self.parts.text_offsets[max_part_idx]
+
+        left_offset = None
+        i = int(np.searchsorted(self.terminator_offsets, offset, side="right")) - 1
+        if i >= 0 and self.terminator_offsets[i] >= min_offset:
+            left_offset = int(self.terminator_offsets[i])
+
+        right_offset = None
+        i = int(
+            np.searchsorted(
+                self.terminator_offsets, max(offset, start_offset), side="left"
+            )
+        )
+        if i < len(self.terminator_offsets) and self.terminator_offsets[i] < max_offset:
+            right_offset = int(self.terminator_offsets[i])
+
+        if left_offset is not None and (
+            right_offset is None
+            or self.__get_distance__(left_offset, offset)
+            <= self.__get_distance__(offset, right_offset)
+        ):
+            return left_offset
+
+        if right_offset is not None:
+            return right_offset
+
+        # Fallback: return the offset of the time break
+        return offset
+
+    def __get_distance__(self, start_offset, end_offset):
+        """Returns the number of characters from start_offset to end_offset in the text of the parts,
+        without the spaces that the parts were joined with in the text of the track
+        """
+        start_part_index, end_part_index = np.searchsorted(
+            self.parts.text_offsets, [start_offset, end_offset], side="right"
+        )
 
-        # Fallback: return the found part index and part char
-        return part_index, part_char_index
+        return end_offset - start_offset - int(end_part_index - start_part_index)
 
     def __find_part__(self, timestamp_ms):
-        left = 0
-        right = len(self.parts) - 1
-
-        while left <= right:
-            mid = (left + right) // 2
-            cur_part = self.parts[mid]
-
-            if cur_part.start_time <= timestamp_ms < cur_part.end_time:
-                return mid
-            elif timestamp_ms < cur_part.start_time:
-                right = mid - 1
-            else:
-                left = mid + 1
+        part_index = (
+            int(np.searchsorted(self.parts.start_times, timestamp_ms, side="right")) - 1
+        )
+
+        if part_index >= 0 and timestamp_ms < self.parts.end_times[part_index]:
+            return part_index
 
         return None
 
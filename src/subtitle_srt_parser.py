@@ -1,5 +1,5 @@
 import srt
-from .subtitle_part import SubtitlePart
+from .subtitle_track import SubtitleTrack
 
 class SubtitleSRTParser:
     """Parses the subtitles and its parts from a .srt file
@@ -19,10 +19,12 @@ class SubtitleSRTParser:
 
         Returns
         -------
-        parts : SubtitlePart[]
-            An ordered list of subtitle parts
+        parts : SubtitleTrack
+            The ordered subtitle parts
         """
-        parts = []
+        start_times = []
+        end_times = []
+        texts = []
         with open(self.input_file, mode='r') as f:
             for sub in srt.parse(f):
                 start_time = self.__convert_timedelta_to_ms__(sub.start)
@@ -32,15 +34,13 @@ class SubtitleSRTParser:
                 if len(clean_text) == 0:
                     continue
 
-                parts.append(SubtitlePart(start_time, end_time, clean_text))
+                start_times.append(start_time)
+                end_times.append(end_time)
+                texts.append(clean_text)
 
         # Extend certain subtitle times to fill in gaps
-        for i in range(len(parts) - 1):
-            cur = parts[i]
-            next = parts[i + 1]
-
-            if cur.end_time != next.start_time:
-                cur.end_time = next.start_time
+        parts = SubtitleTrack(start_times, end_times, texts)
+        parts.fill_gaps()
 
         return parts
 
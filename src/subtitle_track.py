@@ -0,0 +1,110 @@
+import numpy as np
+from .subtitle_part import SubtitlePart
+
+
+class SubtitleTrack:
+    """A class that represents the parts of the entire video's subtitle in columns,
+    so that long subtitles take little memory and can be searched quickly
+
+    The text of all parts is kept in one string where the parts are joined with spaces,
+    and the text of a part is the slice of it from its offset to the offset of the next part (without the space)
+
+    It can be used like a list of SubtitlePart, but each part is created when it is read,
+    so changing a part does not change the track
+
+    Attributes
+    ----------
+    start_times : np.array(n, float64)
+        The starting time of each part in milliseconds
+    end_times : np.array(n, float64)
+        The end time of each part in milliseconds
+    text : str
+        The text of all parts joined with spaces
+    text_offsets : np.array(n + 1, int64)
+        The offset of the text of each part in text, followed by the length of text plus one
+    """
+
+    def __init__(self, start_times, end_times, texts):
+        """Creates the track from the times and texts of its parts
+
+        Parameters
+        ----------
+        start_times : float[]
+            The starting time of each part in milliseconds
+        end_times : float[]
+            The end time of each part in milliseconds
+        texts : str[]
+            The text of each part
+        """
+        self.start_times = np.array(start_times, dtype=np.float64)
+        self.end_times = np.array(end_times, dtype=np.float64)
+        self.text = " ".join(texts)
+
+        self.text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) + 1 for text in texts], out=self.text_offsets[1:])
+
+    @staticmethod
+    def from_parts(parts):
+        """Returns the track of a list of SubtitlePart"""
+        return SubtitleTrack(
+            [part.start_time for part in parts],
+            [part.end_time for part in parts],
+            [part.text for part in parts],
+        )
+
+    def fill_gaps(self):
+        """Extends the end time of each part to the start time of the next part,
+        so that there are no gaps between the parts
+        """
+        self.end_times[:-1] = self.start_times[1:]
+
+    def drop(self, num_parts):
+        """Removes the first num_parts parts of the track, without rebuilding the parts after them"""
+        text_offset = int(self.text_offsets[num_parts])
+
+        self.start_times = self.start_times[num_parts:]
+        self.end_times = self.end_times[num_parts:]
+        self.text = self.text[text_offset:]
+        self.text_offsets = self.text_offsets[num_parts:] - text_offset
+
+    def extend(self, parts):
+        """Appends a list of SubtitlePart to the end of the track, without rebuilding the parts before them"""
+        if len(parts) == 0:
+            return
+
+        texts = [part.text for part in parts]
+        separator = " " if len(self) > 0 else ""
+
+        new_text_offsets = np.cumsum([len(text) + 1 for text in texts])
+        new_text_offsets += self.text_offsets[-1]
+
+        self.start_times = np.append(
+            self.start_times, [part.start_time for part in parts]
+        )
+        self.end_times = np.append(self.end_times, [part.end_time for part in parts])
+        self.text = self.text + separator + " ".join(texts)
+        self.text_offsets = np.append(self.text_offsets, new_text_offsets)
+
+    def get_text(self, index):
+        """Returns the text of a part"""
+        return self.text[self.text_offsets[index] : self.text_offsets[index + 1] - 1]
+
+    def __len__(self):
+        return len(self.start_times)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+
+        if index < 0 or index >= len(self):
+            raise IndexError("Subtitle part index out of range")
+
+        return SubtitlePart(
+            float(self.start_times[index]),
+            float(self.end_times[index]),
+            self.get_text(index),
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
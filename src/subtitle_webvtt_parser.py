@@ -1,5 +1,5 @@
 import webvtt
-from .subtitle_part import SubtitlePart
+from .subtitle_track import SubtitleTrack
 from .time_utils import convert_clock_time_to_timestamp_ms
 
 class SubtitleWebVTTParser:
@@ -20,10 +20,12 @@ class SubtitleWebVTTParser:
 
         Returns
         -------
-        parts : SubtitlePart[]
-            An ordered list of subtitle parts
+        parts : SubtitleTrack
+            The ordered subtitle parts
         """
-        parts = []
+        start_times = []
+        end_times = []
+        texts = []
         for caption in webvtt.read(self.input_file):
             start_time = convert_clock_time_to_timestamp_ms(caption.start)
             end_time = convert_clock_time_to_timestamp_ms(caption.end)
@@ -32,15 +34,13 @@ class SubtitleWebVTTParser:
             if len(clean_text) == 0:
                 continue
 
-            parts.append(SubtitlePart(start_time, end_time, clean_text))
+            start_times.append(start_time)
+            end_times.append(end_time)
+            texts.append(clean_text)
 
         # Extend certain subtitle times to fill in gaps
-        for i in range(len(parts) - 1):
-            cur = parts[i]
-            next = parts[i + 1]
-
-            if cur.end_time != next.start_time:
-                cur.end_time = next.start_time
+        parts = SubtitleTrack(start_times, end_times, texts)
+        parts.fill_gaps()
 
         return parts
 
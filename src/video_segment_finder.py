@@ -1,12 +1,31 @@
+import copy
+import shutil
 import numpy as np
 import cv2
+from concurrent.futures import ProcessPoolExecutor
+
+from .selected_frame import SelectedFrame
+from .segment_selection import select_segment_frames
+from .video_stats_cache import VideoStatsCache
+from .frame_source import FRAME_SOURCES, find_keyframe_timestamps
+from .instrumentation import Instrumentation
 
 
 class PastFrameChangesTracker:
-    """ A class that keeps track of changes from previous frames """
+    """A class that keeps track of changes from previous frames
+    The changes are kept in a fixed-size ring buffer along with the number of frames in it that had changes
 
-    def __init__(self):
-        self.prev_frame_changes = [False, False, False, False, False]
+    Attributes
+    ----------
+    window_size : int
+        The number of previous frames that are kept track of. It needs to be at least 1
+    """
+
+    def __init__(self, window_size=5):
+        self.window_size = window_size
+        self.prev_frame_changes = [False] * window_size
+        self.oldest_index = 0
+        self.num_changed_frames = 0
 
     def are_previous_frames_stable(self):
         """Checks if all previous frames had no changes
@@ -16,26 +35,93 @@ class PastFrameChangesTracker:
         is_stable : boolean
             True if all past frames had no changes; else False
         """
-        return sum([1 if x else 0 for x in self.prev_frame_changes]) == 0
+        return self.num_changed_frames == 0
 
     def add_frame_change(self, has_changed):
         """Adds a change to the tracker
-        If there are more than 5 items in the tracker, it will evict the oldest frame change
+        If there are more than window_size items in the tracker, it will evict the oldest frame change
 
         Parameters
         ----------
         has_changed : boolean
             True if there was a change with the current frame vs the past frame; else False
+        """
+        if self.prev_frame_changes[self.oldest_index]:
+            self.num_changed_frames -= 1
+
+        if has_changed:
+            self.num_changed_frames += 1
+
+        self.prev_frame_changes[self.oldest_index] = has_changed
+        self.oldest_index = (self.oldest_index + 1) % self.window_size
+
+    def add_unchanged_frames(self, num_frames):
+        """Adds many frames with no changes to the tracker
+
+        Parameters
+        ----------
+        num_frames : int
+            The number of frames with no changes
+        """
+        for _ in range(min(num_frames, self.window_size)):
+            self.add_frame_change(False)
+
+
+class FrameBufferPair:
+    """A class that holds the preallocated buffers that the frames of a video are read into and compared in,
+    so that no new images are allocated for each frame
+
+    The current frame and its analysis image are kept in one set of buffers while the previous frame and
+    its analysis image are kept in the other set, so a frame is only valid until the frame after the next frame
+    is read. The results of a comparison are only valid until the next comparison
+
+    Attributes
+    ----------
+    frames : np.array(x, y, 3)[]
+        The two buffers that the frames are read into
+    analysis_buffers : dict[]
+        The two maps of buffers that the analysis images are computed in (refer to VideoSegmentFinder.__get_analysis_image__())
+    comparison_buffers : dict
+        The map of buffers that two analysis images are compared in (refer to VideoSegmentFinder.__compare_frames__())
+    index : int
+        The index of the set of buffers that the current frame is read into
+    """
+
+    def __init__(self):
+        self.frames = [None, None]
+        self.analysis_buffers = [{}, {}]
+        self.comparison_buffers = {}
+        self.index = 0
+
+    def read(self, video_reader):
+        """Reads the next frame of the video into the buffer of the current frame
+
+        Parameters
+        ----------
+        video_reader : cv2.VideoCapture
+            The video reader
 
         Returns
         -------
-        is_stable : boolean
-            True if all past frames had no changes; else False
+        is_read : boolean
+            True if the frame was read; else False
+        frame : np.array(x, y, 3)
+            The frame, or None if it was not read
         """
-        self.prev_frame_changes.append(has_changed)
+        is_read, frame = video_reader.read(self.frames[self.index])
 
-        if len(self.prev_frame_changes) > 5:
-            self.prev_frame_changes.pop(0)
+        if is_read:
+            self.frames[self.index] = frame
+
+        return is_read, frame
+
+    def get_analysis_buffers(self):
+        """Returns the map of buffers that the analysis image of the current frame is computed in"""
+        return self.analysis_buffers[self.index]
+
+    def swap(self):
+        """Makes the current frame the previous frame, so that the next frame is read into the other buffers"""
+        self.index = 1 - self.index
 
 
 class VideoSegmentFinder:
@@ -48,22 +134,122 @@ class VideoSegmentFinder:
         Is the min. difference between the color of two images on one pixel location for it to be distinct
     min_change : int
         Is the min. number of pixel changes between two adjacent video frames for the two to be considered distinct
+    sample_rate : float
+        If set, only this many frames per second are compared with each other, and the frames in between two
+        sampled frames that differ are re-scanned to find the exact frame of the change. If None, every frame is compared
+    analysis_width : int
+        If set, frames are compared as grayscale thumbnails of this width instead of as full color frames.
+        The selected frames are still returned in full resolution
+    min_change_ratio : float
+        If set, it overrides min_change with the min. fraction of pixels in the compared frames that need to change
+        for two adjacent video frames to be considered distinct
+    spill_dir : str
+        If set, the selected frames are saved in this directory instead of being kept in memory
+    num_workers : int
+        If set, the video is split into this many chunks of time that are scanned in parallel by separate processes
+    cache_dir : str
+        If set, the statistics of each frame are saved in this folder, so that the frames of the same video
+        can be selected again (ex: with a different min_change) by only reading the selected frames
+    stability_window_ms : float
+        If set, it is the time in milliseconds before a change that needs to have no changes for the frame
+        before the change to be selected. It is converted to a number of frames with the video's frame rate.
+        If None, the 5 frames before a change need to have no changes
+    min_segment_duration_ms : float
+        Is the min. time in milliseconds between two selected frames. A frame that is selected too soon
+        after the previous selected frame is a glitch, and only the earliest of the two is selected
+    include_regions : (int, int, int, int)[]
+        If set, only the pixels in these rectangles (x, y, width, height) of the frames are compared
+    exclude_regions : (int, int, int, int)[]
+        If set, the pixels in these rectangles (x, y, width, height) of the frames are not compared,
+        for instance a webcam overlay or a clock
+    auto_exclude_regions : boolean
+        If True, the regions of the frames that change most of the time (refer to find_changing_regions())
+        are also excluded
+    frame_source : str
+        If set, the frames are compared as they are read by this frame source ("opencv" or "ffmpeg"),
+        which scales them down and converts them to grayscale while decoding them. Only the selected frames
+        are then read again in full resolution. With a sample_rate, the changes are only found at the
+        sampled frames instead of at the exact frames that changed
+    keyframe_prescan : boolean
+        If True, only the keyframes of the video are decoded and compared first, and only the frames in between
+        two keyframes that differ are compared one by one. A slide that is shown and then hidden again in between
+        two keyframes is missed. It is ignored if frame_source is set.
+        The keyframes are found with OpenCV if it has cv2.CAP_PROP_LRF_HAS_KEY_FRAME, or else with ffprobe
+    instrumentation : Instrumentation
+        It measures the time spent on decoding the frames, comparing them and selecting them.
+        If None, nothing is measured
     """
 
-    def __init__(self, threshold=20, min_change=10000):
+    def __init__(
+        self,
+        threshold=20,
+        min_change=10000,
+        sample_rate=None,
+        analysis_width=None,
+        min_change_ratio=None,
+        spill_dir=None,
+        num_workers=None,
+        cache_dir=None,
+        stability_window_ms=None,
+        min_segment_duration_ms=2000,
+        include_regions=None,
+        exclude_regions=None,
+        auto_exclude_regions=False,
+        frame_source=None,
+        keyframe_prescan=False,
+        instrumentation=None,
+    ):
+        if frame_source is not None and frame_source not in FRAME_SOURCES:
+            raise ValueError(
+                "Illegal argument! Expected frame source to be one of {}, instead {}".format(
+                    list(FRAME_SOURCES.keys()), frame_source
+                )
+            )
+
+        # Edge case: older versions of OpenCV (like 4.5.1) can not tell if a packet of the video is a keyframe,
+        # so the keyframes are found with ffprobe
+        if (
+            keyframe_prescan
+            and frame_source is None
+            and not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME")
+            and shutil.which("ffprobe") is None
+        ):
+            raise ValueError(
+                "Illegal argument! The keyframe pre-scan needs ffprobe or a version of OpenCV with CAP_PROP_LRF_HAS_KEY_FRAME, instead {}".format(
+                    cv2.__version__
+                )
+            )
+
         self.threshold = threshold
         self.min_change = min_change
+        self.sample_rate = sample_rate
+        self.analysis_width = analysis_width
+        self.min_change_ratio = min_change_ratio
+        self.spill_dir = spill_dir
+        self.num_workers = num_workers
+        self.cache_dir = cache_dir
+        self.stability_window_ms = stability_window_ms
+        self.min_segment_duration_ms = min_segment_duration_ms
+        self.include_regions = include_regions
+        self.exclude_regions = exclude_regions
+        self.auto_exclude_regions = auto_exclude_regions
+        self.frame_source = frame_source
+        self.keyframe_prescan = keyframe_prescan
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
 
-    def get_best_segment_frames(self, video_file):
-        ''' Finds a list of best possible video segments 
+        # The region of interest of the frames for each frame size (refer to __get_region_of_interest__())
+        self.regions_of_interest = {}
+
+    def get_best_segment_frames(self, video_file, save_debug_frames=False):
+        """Finds a list of best possible video segments
         It returns a map, where the key is the frame number, and the value is the frame data
 
-        The frame data is of this format:
+        The frame data is a SelectedFrame which can be accessed like this format:
         {
             "timestamp": <the timestamp of the current frame>,
             "frame": <the current frame>,
-            "next_frame": <the next frame>,
-            "mask": <difference between current and next frame>,
+            "next_frame": <the next frame, or None if save_debug_frames is False>,
+            "mask": <difference between current and next frame, or None if save_debug_frames is False>,
             "num_pixels_changed": <number of pixel changes>,
         }
 
@@ -72,19 +258,30 @@ class VideoSegmentFinder:
             t1 = f1.timestamp
             t2 = f2.timestamp
 
+        Parameters
+        ----------
+        video_file : str
+            The file path to the video
+        save_debug_frames : boolean
+            If True, it will also keep the next frame and the mask of each selected frame
+
         Returns
         -------
         selected_frames : { a -> b }
             A map of frame number a to the frame data b
-        '''
+        """
         selected_frames, _ = self.get_segment_frames_with_stats(
-            video_file, save_stats_for_all_frames=False
+            video_file,
+            save_stats_for_all_frames=False,
+            save_debug_frames=save_debug_frames,
         )
         return selected_frames
 
-    def get_segment_frames_with_stats(self, video_file, save_stats_for_all_frames=True):
-        ''' Returns a list of frames for the best possible video segments (refer to get_best_segment_frames())
-        
+    def get_segment_frames_with_stats(
+        self, video_file, save_stats_for_all_frames=True, save_debug_frames=True
+    ):
+        """Returns a list of frames for the best possible video segments (refer to get_best_segment_frames())
+
         It also outputs statistics on all frames, where the statistic on frame i is:
         {
             "timestamp": the timestamp of frame i
@@ -97,104 +294,1377 @@ class VideoSegmentFinder:
             A map of frame number to its frame data
         stats : { a -> c }
             A map of frame number to its statistic
-        '''
+        """
+        frame_num_to_stats = {}
+        selected_frames = {}
+
+        for selected_frame in self.iter_best_segment_frames(
+            video_file,
+            save_debug_frames=save_debug_frames,
+            frame_num_to_stats=(
+                frame_num_to_stats if save_stats_for_all_frames else None
+            ),
+        ):
+            selected_frames[selected_frame.frame_num] = selected_frame
+
+        return selected_frames, frame_num_to_stats
+
+    def iter_best_segment_frames(
+        self, video_file, save_debug_frames=False, frame_num_to_stats=None
+    ):
+        """Finds the best possible video segments while the video is being read (refer to get_best_segment_frames())
+        Each selected frame is yielded as soon as no later frame can remove it from the selection
+
+        Parameters
+        ----------
+        video_file : str
+            The file path to the video
+        save_debug_frames : boolean
+            If True, it will also keep the next frame and the mask of each selected frame
+        frame_num_to_stats : { a -> c }
+            If set, the statistic of each analyzed frame is added to it (refer to get_segment_frames_with_stats())
+
+        Yields
+        ------
+        selected_frame : SelectedFrame
+            The selected frames, ordered by their frame number
+        """
+        if self.auto_exclude_regions:
+            video_segment_finder = copy.copy(self)
+            video_segment_finder.auto_exclude_regions = False
+            video_segment_finder.exclude_regions = list(
+                self.exclude_regions or []
+            ) + self.find_changing_regions(video_file)
+            video_segment_finder.regions_of_interest = {}
+
+            yield from video_segment_finder.iter_best_segment_frames(
+                video_file, save_debug_frames, frame_num_to_stats
+            )
+            return
+
+        if (
+            self.cache_dir is not None
+            or self.frame_source is not None
+            or self.keyframe_prescan
+        ):
+            yield from self.__iter_best_segment_frames_from_stats__(
+                video_file, save_debug_frames, frame_num_to_stats
+            )
+        else:
+            candidate_frames = self.__iter_candidate_frames_from_video__(
+                video_file, save_debug_frames, frame_num_to_stats
+            )
+            yield from self.__iter_selected_frames__(candidate_frames)
+
+    def find_changing_regions(
+        self, video_file, sample_rate=1, min_change_fraction=0.5, heatmap_width=320
+    ):
+        """Finds the regions of the video that change most of the time, like a webcam overlay or a clock
+        A few frames per second are compared, and the pixels that changed in most of the comparisons are grouped
+        into rectangles. If cache_dir is set, the number of changes of each pixel is saved for the next run
+
+        Parameters
+        ----------
+        video_file : str
+            The file path to the video
+        sample_rate : float
+            The number of frames per second that are compared with each other
+        min_change_fraction : float
+            The min. fraction of the comparisons that a pixel needs to change in to be in a region
+        heatmap_width : int
+            The width of the grayscale thumbnails that the frames are compared as
+
+        Returns
+        -------
+        regions : (int, int, int, int)[]
+            The rectangles (x, y, width, height) of the regions in the frames
+        """
+        params = {
+            "threshold": self.threshold,
+            "sample_rate": sample_rate,
+            "heatmap_width": heatmap_width,
+        }
+
+        cache = None
+        heatmap = None
+
+        if self.cache_dir is not None:
+            cache = VideoStatsCache(self.cache_dir)
+            cache_key = cache.get_cache_key(video_file, params)
+            heatmap = cache.load_change_heatmap(cache_key)
+
+        if heatmap is None:
+            heatmap = self.__compute_change_heatmap__(
+                video_file, sample_rate, heatmap_width
+            )
+
+            if cache is not None:
+                cache.save_change_heatmap(cache_key, heatmap)
+
+        if heatmap["num_comparisons"] == 0:
+            return []
+
+        changing_pixels = (
+            heatmap["num_changes"] >= min_change_fraction * heatmap["num_comparisons"]
+        ).astype(np.uint8)
+
+        # Join the changing pixels that are close to each other, like the digits of a clock
+        changing_pixels = cv2.dilate(changing_pixels, np.ones((3, 3), np.uint8))
+        num_components, _, components, _ = cv2.connectedComponentsWithStats(
+            changing_pixels
+        )
+
+        scale = heatmap["frame_width"] / changing_pixels.shape[1]
+        regions = []
+
+        # The first component is the background
+        for x, y, width, height, _ in components[1:num_components]:
+            x0 = int(np.floor(x * scale))
+            y0 = int(np.floor(y * scale))
+            x1 = int(np.ceil((x + width) * scale))
+            y1 = int(np.ceil((y + height) * scale))
+            regions.append((x0, y0, x1 - x0, y1 - y0))
+
+        return regions
+
+    def __compute_change_heatmap__(self, video_file, sample_rate, heatmap_width):
+        """Counts the number of times that each pixel changed between two sampled frames of the video"""
+        video_reader = cv2.VideoCapture(video_file)
+
+        try:
+            fps = video_reader.get(cv2.CAP_PROP_FPS)
+            step = 1
+            if fps > 0:
+                step = max(1, int(round(fps / sample_rate)))
+
+            frame_width = int(video_reader.get(cv2.CAP_PROP_FRAME_WIDTH))
+            num_changes = None
+            num_comparisons = 0
+            prev_image = None
+
+            while True:
+                with self.instrumentation.measure("decode", count=0) as measurement:
+                    is_read, frame = video_reader.read()
+                    measurement["count"] = int(is_read)
+
+                if not is_read:
+                    break
+
+                with self.instrumentation.measure("diff"):
+                    image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    height, width = image.shape
+                    if heatmap_width < width:
+                        image = cv2.resize(
+                            image,
+                            (
+                                heatmap_width,
+                                max(1, int(round(height * heatmap_width / width))),
+                            ),
+                            interpolation=cv2.INTER_AREA,
+                        )
+
+                    if num_changes is None:
+                        num_changes = np.zeros(image.shape, np.int64)
+
+                    if prev_image is not None:
+                        num_changes += cv2.absdiff(prev_image, image) > self.threshold
+                        num_comparisons += 1
+
+                prev_image = image
+
+                # Skip over the frames in between two samples
+                with self.instrumentation.measure("decode", count=0) as measurement:
+                    for _ in range(step - 1):
+                        if not video_reader.grab():
+                            break
+                        measurement["count"] += 1
+
+        finally:
+            video_reader.release()
+
+        if num_changes is None:
+            num_changes = np.zeros((1, 1), np.int64)
+
+        return {
+            "num_changes": num_changes,
+            "num_comparisons": num_comparisons,
+            "frame_width": frame_width,
+        }
+
+    def __iter_selected_frames__(self, candidate_frames):
+        """Selects the candidate frames while they are being found
+        It is the same selection as select_segment_frames(), but each selected frame is yielded right away
+        """
+        # The timestamp of the last selected frame that a glitch can be found with
+        last_selected_timestamp = None
+
+        # Edge case: skip the first selected frame since it is just a blank screen
+        is_first_selected_frame = True
+
+        for candidate_frame in candidate_frames:
+            timestamp = candidate_frame["timestamp"]
+
+            # Rare case: if there are two selected frames s.t. they differ by less than min_segment_duration_ms,
+            # then there is a glitch
+            # and we pick the frame that is the earliest
+            with self.instrumentation.measure("selection"):
+                is_glitch = self.__is_glitch__(last_selected_timestamp, timestamp)
+
+            if is_glitch:
+                last_selected_timestamp = None
+                continue
+
+            last_selected_timestamp = timestamp
+
+            if is_first_selected_frame:
+                is_first_selected_frame = False
+                continue
+
+            yield self.__create_selected_frame__(candidate_frame)
+
+    def __create_selected_frame__(self, candidate_frame):
+        return SelectedFrame(
+            candidate_frame["frame_num"],
+            candidate_frame["timestamp"],
+            candidate_frame["frame"],
+            candidate_frame["num_pixels_changed"],
+            next_frame=candidate_frame["next_frame"],
+            mask=candidate_frame["mask"],
+            spill_dir=self.spill_dir,
+        )
+
+    def __iter_best_segment_frames_from_stats__(
+        self, video_file, save_debug_frames, frame_num_to_stats
+    ):
+        """Selects the frames from the statistics saved by a previous run on the same video,
+        or from the statistics read with the frame source or the keyframe pre-scan. Otherwise, it reads the video and
+        saves its statistics for the next run
+        """
+        cache = None
+        stats = None
+
+        if self.cache_dir is not None:
+            cache = VideoStatsCache(self.cache_dir)
+            cache_key = cache.get_cache_key(video_file, self.__get_stats_params__())
+            stats = cache.load(cache_key)
+
+        if stats is None and (self.frame_source is not None or self.keyframe_prescan):
+            if self.frame_source is not None:
+                stats = self.__read_stats_with_frame_source__(video_file)
+            else:
+                stats = self.__read_stats_with_keyframe_prescan__(video_file)
+
+            if cache is not None:
+                cache.save_stats(cache_key, stats)
+
+        if stats is not None:
+            if frame_num_to_stats is not None:
+                for frame_num, timestamp, num_pixels_changed in zip(
+                    stats["frame_nums"],
+                    stats["timestamps"],
+                    stats["num_pixels_changed"],
+                ):
+                    frame_num_to_stats[int(frame_num)] = {
+                        "timestamp": float(timestamp),
+                        "num_pixels_changed": int(num_pixels_changed),
+                    }
+
+            yield from self.__iter_selected_frames_from_stats__(
+                video_file, stats, save_debug_frames
+            )
+            return
+
+        if frame_num_to_stats is None:
+            frame_num_to_stats = {}
+
+        # The last candidate frame is numbered as the frame after the last frame of the video
+        last_candidate_frame_nums = [0]
+
+        def iter_candidate_frames():
+            for candidate_frame in self.__iter_candidate_frames_from_video__(
+                video_file, save_debug_frames, frame_num_to_stats
+            ):
+                last_candidate_frame_nums[0] = candidate_frame["frame_num"]
+                yield candidate_frame
+
+        yield from self.__iter_selected_frames__(iter_candidate_frames())
+
+        cache.save(cache_key, frame_num_to_stats, last_candidate_frame_nums[0])
+
+    def __read_stats_with_frame_source__(self, video_file):
+        """Reads the number of pixel changes of each frame with the frame source (refer to VideoStatsCache.load())"""
+        frame_source_class = FRAME_SOURCES[self.frame_source]
+        frame_nums, timestamps, num_pixels_changed = [], [], []
+
+        with frame_source_class(
+            video_file,
+            grayscale=self.analysis_width is not None,
+            sample_rate=self.sample_rate,
+        ) as frame_source:
+            frame_width, frame_height = frame_source.get_frame_size()
+            region_of_interest = self.__get_region_of_interest__(
+                (frame_height, frame_width)
+            )
+
+            x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+            if region_of_interest is not None:
+                x0, y0, x1, y1 = region_of_interest["bounds"]
+
+            # The frames are scaled s.t. the region of interest is as wide as the analysis images
+            if self.analysis_width is not None and self.analysis_width < x1 - x0:
+                frame_source.width = int(
+                    round(self.analysis_width * frame_width / (x1 - x0))
+                )
+
+            scale = frame_source.get_output_size()[0] / frame_width
+            x0, y0, x1, y1 = [int(round(value * scale)) for value in (x0, y0, x1, y1)]
+
+            # The frame before the first frame is a blank screen
+            prev_image = None
+            frame_buffers = FrameBufferPair()
+
+            frames = frame_source.iter_frames()
+
+            while True:
+                with self.instrumentation.measure("decode"):
+                    frame_data = next(frames, None)
+
+                if frame_data is None:
+                    break
+
+                frame_num, timestamp, frame = frame_data
+
+                with self.instrumentation.measure("diff"):
+                    image = frame[y0:y1, x0:x1]
+
+                    if region_of_interest is not None:
+                        mask = self.__get_region_of_interest_mask__(
+                            region_of_interest, image.shape[:2]
+                        )
+                        if mask is not None:
+                            analysis_buffers = frame_buffers.get_analysis_buffers()
+                            image = cv2.bitwise_and(
+                                image,
+                                image,
+                                dst=analysis_buffers.get("masked"),
+                                mask=mask,
+                            )
+                            analysis_buffers["masked"] = image
+
+                    if prev_image is None:
+                        prev_image = np.full_like(image, 255)
+                        if region_of_interest is not None and mask is not None:
+                            prev_image = cv2.bitwise_and(
+                                prev_image, prev_image, mask=mask
+                            )
+
+                    results = self.__compare_frames__(
+                        prev_image, image, frame_buffers.comparison_buffers
+                    )
+
+                frame_nums.append(frame_num)
+                timestamps.append(timestamp)
+                num_pixels_changed.append(results["num_pixels_changed"])
+
+                # The frame source reuses its buffers, but the previous frame is kept until the next frame is read
+                prev_image = image
+                frame_buffers.swap()
+
+            num_frames = frame_source.num_frames
+
+        return {
+            "frame_nums": np.array(frame_nums, dtype=np.int64),
+            "timestamps": np.array(timestamps, dtype=np.float64),
+            "num_pixels_changed": np.array(num_pixels_changed, dtype=np.int64),
+            "num_frames": num_frames,
+        }
+
+    def __read_stats_with_keyframe_prescan__(self, video_file):
+        """Reads the number of pixel changes of each frame (refer to VideoStatsCache.load()) by only comparing
+        the keyframes of the video first. The frames in between two keyframes that differ are compared one by one,
+        and the frames in between two keyframes that do not differ are assumed to have no changes.
+        The frames after the last keyframe are always compared one by one
+
+        The frames in between two keyframes are grabbed without being converted or compared, so that their
+        frame numbers are counted the same way as when every frame is read
+        """
+        keyframe_timestamps = self.__find_keyframe_timestamps__(video_file)
+        video_reader = cv2.VideoCapture(video_file)
+
+        try:
+            frame_width = int(video_reader.get(cv2.CAP_PROP_FRAME_WIDTH))
+            frame_height = int(video_reader.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            blank_frame = 255 * np.ones((frame_height, frame_width, 3), np.uint8)
+
+            min_change = self.__get_min_change__(blank_frame)
+            stats = {"frame_nums": [], "timestamps": [], "num_pixels_changed": []}
+
+            # The frame before the first frame is a blank screen
+            frame_num = -1
+            timestamp = None
+            image = self.__get_analysis_image__(blank_frame)
+
+            # The frame number and the timestamp of the last grabbed frame
+            cur_frame_num = -1
+            cur_timestamp = None
+
+            for keyframe_timestamp in keyframe_timestamps:
+                # The timestamps of the keyframes can be rounded, so they are off by up to 1ms
+                with self.instrumentation.measure("decode", count=0) as measurement:
+                    is_read = True
+                    while (
+                        cur_timestamp is None or cur_timestamp < keyframe_timestamp - 1
+                    ):
+                        is_read = video_reader.grab()
+                        if not is_read:
+                            break
+
+                        cur_frame_num += 1
+                        cur_timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+                        measurement["count"] += 1
+
+                if not is_read:
+                    break
+
+                # Edge case: the keyframe was already compared with the frames before it
+                if cur_frame_num <= frame_num:
+                    continue
+
+                with self.instrumentation.measure("decode", count=0):
+                    _, keyframe = video_reader.retrieve()
+
+                with self.instrumentation.measure("diff"):
+                    keyframe_image = self.__get_analysis_image__(keyframe)
+                    results = self.__compare_frames__(image, keyframe_image)
+
+                if results["num_pixels_changed"] > min_change:
+                    frame_num, timestamp, image = self.__compare_frames_after__(
+                        video_reader,
+                        frame_num,
+                        timestamp,
+                        image,
+                        cur_timestamp,
+                        stats,
+                    )
+                    cur_frame_num, cur_timestamp = frame_num, timestamp
+                    continue
+
+                frame_num = cur_frame_num
+                timestamp = cur_timestamp
+                image = keyframe_image
+
+                stats["frame_nums"].append(frame_num)
+                stats["timestamps"].append(timestamp)
+                stats["num_pixels_changed"].append(results["num_pixels_changed"])
+
+            frame_num, _, _ = self.__compare_frames_after__(
+                video_reader, frame_num, timestamp, image, None, stats
+            )
+
+        finally:
+            video_reader.release()
+
+        return {
+            "frame_nums": np.array(stats["frame_nums"], dtype=np.int64),
+            "timestamps": np.array(stats["timestamps"], dtype=np.float64),
+            "num_pixels_changed": np.array(stats["num_pixels_changed"], dtype=np.int64),
+            "num_frames": frame_num + 1,
+        }
+
+    def __compare_frames_after__(
+        self, video_reader, frame_num, timestamp, image, end_timestamp, stats
+    ):
+        """Compares each frame after the frame at the timestamp with the frame before it, up to the frame at
+        end_timestamp or up to the end of the video if end_timestamp is None, and adds their changes to the stats
+
+        Returns
+        -------
+        last_frame : (int, float, np.array(x, y, 3))
+            The frame number, the timestamp and the analysis image of the last compared frame
+        """
+        if timestamp is None:
+            video_reader.set(cv2.CAP_PROP_POS_MSEC, 0)
+        else:
+            self.__seek_to_timestamp__(video_reader, timestamp)
+
+        frame_buffers = FrameBufferPair()
+
+        while True:
+            is_read, cur_frame = self.__read_frame__(video_reader, frame_buffers)
+            if not is_read:
+                break
+
+            frame_num += 1
+            timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+            cur_image, results = self.__compare_frame__(image, cur_frame, frame_buffers)
+
+            stats["frame_nums"].append(frame_num)
+            stats["timestamps"].append(timestamp)
+            stats["num_pixels_changed"].append(results["num_pixels_changed"])
+
+            image = cur_image
+            frame_buffers.swap()
+
+            if end_timestamp is not None and timestamp >= end_timestamp:
+                break
+
+        return frame_num, timestamp, image
+
+    def __find_keyframe_timestamps__(self, video_file):
+        """Returns the sorted timestamps of the keyframes of a video, which are found by reading the packets
+        of the video without decoding them; or an empty list if the packets of the video can not be read
+        """
+        # Edge case: older versions of OpenCV can not read the packets of a video
+        if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+            return find_keyframe_timestamps(video_file)
+
+        packet_reader = cv2.VideoCapture(
+            video_file, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1]
+        )
+        keyframe_timestamps = []
+
+        try:
+            # Edge case: the backend decodes the frames if it can not read the packets
+            if (
+                not packet_reader.isOpened()
+                or packet_reader.get(cv2.CAP_PROP_FORMAT) != -1
+            ):
+                return keyframe_timestamps
+
+            while packet_reader.grab():
+                if packet_reader.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframe_timestamps.append(packet_reader.get(cv2.CAP_PROP_POS_MSEC))
+
+        finally:
+            packet_reader.release()
+
+        return sorted(keyframe_timestamps)
+
+    def __iter_selected_frames_from_stats__(self, video_file, stats, save_debug_frames):
+        """Selects the frames from the saved statistics of a video with select_segment_frames(),
+        and only reads the selected frames from the video
+        """
+        video_reader = cv2.VideoCapture(video_file)
+
+        try:
+            frame_width = int(video_reader.get(cv2.CAP_PROP_FRAME_WIDTH))
+            frame_height = int(video_reader.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            blank_frame = 255 * np.ones((frame_height, frame_width, 3), np.uint8)
+            fps = video_reader.get(cv2.CAP_PROP_FPS)
+
+            min_change = self.__get_min_change__(blank_frame)
+
+            # The timestamps from a frame source can be a little off from the timestamps of OpenCV
+            max_timestamp_error = 0
+            if self.frame_source is not None:
+                max_timestamp_error = FRAME_SOURCES[
+                    self.frame_source
+                ].max_timestamp_error
+
+            frame_nums = stats["frame_nums"]
+            timestamps = stats["timestamps"]
+
+            with self.instrumentation.measure("selection", count=len(timestamps)):
+                selected_indices = select_segment_frames(
+                    timestamps,
+                    stats["num_pixels_changed"],
+                    min_change,
+                    frame_nums=frame_nums,
+                    num_stable_frames=self.__get_stability_window_size__(fps),
+                    min_segment_duration=self.min_segment_duration_ms,
+                )
+
+            for i in selected_indices:
+                prev_timestamp = float(timestamps[i - 1]) if i > 0 else 0
+
+                # Add the last frame of the video
+                if i == len(frame_nums):
+                    last_frame = blank_frame
+                    if i > 0:
+                        with self.instrumentation.measure("decode"):
+                            last_frame = self.__read_frame_at_timestamp__(
+                                video_reader, prev_timestamp, max_timestamp_error
+                            )
+
+                    candidate_frame = self.__create_last_candidate_frame__(
+                        stats["num_frames"],
+                        prev_timestamp,
+                        last_frame,
+                        save_debug_frames,
+                    )
+                else:
+                    candidate_frame = self.__read_candidate_frame__(
+                        video_reader,
+                        int(frame_nums[i]),
+                        prev_timestamp,
+                        int(stats["num_pixels_changed"][i]),
+                        blank_frame,
+                        save_debug_frames,
+                        max_timestamp_error,
+                    )
+
+                yield self.__create_selected_frame__(candidate_frame)
+
+        finally:
+            video_reader.release()
+
+    def __read_candidate_frame__(
+        self,
+        video_reader,
+        frame_num,
+        timestamp,
+        num_pixels_changed,
+        blank_frame,
+        save_debug_frames,
+        max_timestamp_error=0,
+    ):
+        """Reads the frame before frame_num, which is at the timestamp, as a candidate frame"""
+        if frame_num == 0:
+            frame = blank_frame
+            video_reader.set(cv2.CAP_PROP_POS_MSEC, 0)
+        else:
+            with self.instrumentation.measure("decode"):
+                frame = self.__read_frame_at_timestamp__(
+                    video_reader, timestamp, max_timestamp_error
+                )
+
+        results = {"num_pixels_changed": num_pixels_changed, "mask": None}
+        next_frame = None
+
+        if save_debug_frames:
+            _, next_frame = video_reader.read()
+            results["mask"] = self.__compare_frames__(
+                self.__get_analysis_image__(frame),
+                self.__get_analysis_image__(next_frame),
+            )["mask"]
+
+        return self.__create_candidate_frame__(
+            frame_num, timestamp, frame, next_frame, results, save_debug_frames
+        )
+
+    def __get_stats_params__(self):
+        """Returns the parameters that the statistics of each frame depend on"""
+        params = {
+            "threshold": self.threshold,
+            "analysis_width": self.analysis_width,
+            "sample_rate": self.sample_rate,
+        }
+
+        if self.frame_source is not None:
+            params["frame_source"] = self.frame_source
+        elif self.keyframe_prescan:
+            params["keyframe_prescan"] = True
+
+        if self.include_regions or self.exclude_regions:
+            params["include_regions"] = self.include_regions
+            params["exclude_regions"] = self.exclude_regions
+
+        # The sampler and the keyframe pre-scan re-read the frames around a change, so the frames with statistics
+        # depend on the min. change
+        if self.sample_rate is not None or (
+            self.keyframe_prescan and self.frame_source is None
+        ):
+            params["min_change"] = self.min_change
+            params["min_change_ratio"] = self.min_change_ratio
+
+        return params
 
+    def __iter_candidate_frames_from_video__(
+        self, video_file, save_debug_frames, frame_num_to_stats
+    ):
+        if self.num_workers is None or self.num_workers <= 1:
+            return self.__iter_candidate_frames__(
+                video_file, save_debug_frames, frame_num_to_stats
+            )
+
+        return self.__iter_candidate_frames_in_parallel__(
+            video_file, save_debug_frames, frame_num_to_stats
+        )
+
+    def __iter_candidate_frames__(
+        self, video_file, save_debug_frames, frame_num_to_stats
+    ):
+        """Reads the video and yields the frames that come right before a change after a stable period of frames,
+        followed by the last frame of the video
+
+        Yields
+        ------
+        candidate_frame : dict
+            The frame data of the candidate (refer to get_best_segment_frames()), along with its "frame_num"
+        """
         video_reader = cv2.VideoCapture(video_file)
 
-        # Get the Default resolutions
+        try:
+            # Get the Default resolutions
+            frame_width = int(video_reader.get(cv2.CAP_PROP_FRAME_WIDTH))
+            frame_height = int(video_reader.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+            # Get the FPS
+            fps = video_reader.get(cv2.CAP_PROP_FPS)
+
+            frame_num = -1
+
+            prev_timestamp = 0
+            prev_frame = 255 * np.ones(
+                (frame_height, frame_width, 3), np.uint8
+            )  # A blank screen
+            prev_video_changes = PastFrameChangesTracker(
+                self.__get_stability_window_size__(fps)
+            )
+
+            min_change = self.__get_min_change__(prev_frame)
+
+            for (
+                frame_num,
+                timestamp,
+                cur_frame,
+                results,
+                num_unchanged_frames,
+            ) in self.__iter_frame_changes__(video_reader, fps, prev_frame, min_change):
+
+                # The frames skipped over by the sampler are treated as frames with no changes
+                prev_video_changes.add_unchanged_frames(num_unchanged_frames)
+
+                # Store the results
+                if frame_num_to_stats is not None:
+                    frame_num_to_stats[frame_num] = {
+                        "timestamp": timestamp,
+                        "num_pixels_changed": results["num_pixels_changed"],
+                    }
+
+                has_changed = results["num_pixels_changed"] > min_change
+
+                if prev_video_changes.are_previous_frames_stable() and has_changed:
+                    yield self.__create_candidate_frame__(
+                        frame_num,
+                        prev_timestamp,
+                        prev_frame,
+                        cur_frame,
+                        results,
+                        save_debug_frames,
+                    )
+
+                prev_video_changes.add_frame_change(has_changed)
+
+                prev_frame = cur_frame
+                prev_timestamp = timestamp
+
+            # Add the last frame of the video
+            yield self.__create_last_candidate_frame__(
+                frame_num + 1, prev_timestamp, prev_frame, save_debug_frames
+            )
+
+        finally:
+            video_reader.release()
+            cv2.destroyAllWindows()
+
+    def __iter_candidate_frames_in_parallel__(
+        self, video_file, save_debug_frames, frame_num_to_stats
+    ):
+        """Splits the video into chunks of time, finds the candidate frames of each chunk in a separate process,
+        and yields them in order (refer to __iter_candidate_frames__())
+
+        Every frame in a chunk is compared, even if sample_rate is set
+        """
+        video_reader = cv2.VideoCapture(video_file)
         frame_width = int(video_reader.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(video_reader.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = video_reader.get(cv2.CAP_PROP_FPS)
+        num_frames = video_reader.get(cv2.CAP_PROP_FRAME_COUNT)
+        video_reader.release()
 
-        # Get the FPS
-        fps = int(video_reader.get(cv2.CAP_PROP_FPS))
+        # The duration is only an estimate, so the last chunk reads until the end of the video
+        duration = num_frames / fps * 1000 if fps > 0 else 0
+        chunk_start_timestamps = [
+            duration * i / self.num_workers for i in range(self.num_workers)
+        ]
+        chunk_end_timestamps = chunk_start_timestamps[1:] + [None]
 
-        frame_num = 0
-        frame_num_to_stats = {}
-        selected_frames = {}
+        executor = ProcessPoolExecutor(max_workers=self.num_workers)
+
+        try:
+            chunk_futures = [
+                executor.submit(
+                    self.__find_candidate_frames_in_chunk__,
+                    video_file,
+                    start_timestamp,
+                    end_timestamp,
+                    save_debug_frames,
+                    frame_num_to_stats is not None,
+                )
+                for start_timestamp, end_timestamp in zip(
+                    chunk_start_timestamps, chunk_end_timestamps
+                )
+            ]
+
+            # The chunks are merged in order, where the frame numbers of a chunk start after the previous chunk
+            frame_num_offset = 0
+            last_timestamp = 0
+            last_frame = 255 * np.ones(
+                (frame_height, frame_width, 3), np.uint8
+            )  # A blank screen
+
+            for chunk_future in chunk_futures:
+                chunk = chunk_future.result()
+
+                for candidate_frame in chunk["candidate_frames"]:
+                    candidate_frame["frame_num"] += frame_num_offset
+                    yield candidate_frame
+
+                if frame_num_to_stats is not None:
+                    for i, stats in enumerate(chunk["stats"]):
+                        frame_num_to_stats[frame_num_offset + i] = stats
+
+                if chunk["num_frames"] > 0:
+                    last_timestamp = chunk["last_timestamp"]
+                    last_frame = chunk["last_frame"]
+
+                self.instrumentation.merge(chunk["stages"])
+
+                frame_num_offset += chunk["num_frames"]
+
+            # Add the last frame of the video
+            yield self.__create_last_candidate_frame__(
+                frame_num_offset, last_timestamp, last_frame, save_debug_frames
+            )
+
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __find_candidate_frames_in_chunk__(
+        self,
+        video_file,
+        start_timestamp,
+        end_timestamp,
+        save_debug_frames,
+        save_stats_for_all_frames,
+    ):
+        """Finds the candidate frames of the frames whose timestamps are in [start_timestamp, end_timestamp)
+
+        The frames right before the chunk are also read so that the changes of the first frames in the chunk
+        are compared with the frames right before them
+
+        Returns
+        -------
+        chunk : dict
+            The candidate frames (with frame numbers relative to the start of the chunk), the number of frames,
+            the statistics of each frame, the last frame in the chunk along with its timestamp, and the
+            measured stages of the chunk (refer to Instrumentation.stages)
+        """
+        # This is a copy of the video segment finder in a worker process, so the stages of the chunk
+        # are measured on their own and added to the measurements of the main process
+        self.instrumentation = Instrumentation(enabled=self.instrumentation.enabled)
+
+        video_reader = cv2.VideoCapture(video_file)
+
+        frame_width = int(video_reader.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(video_reader.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        blank_frame = 255 * np.ones((frame_height, frame_width, 3), np.uint8)
+        min_change = self.__get_min_change__(blank_frame)
+        stability_window_size = self.__get_stability_window_size__(
+            video_reader.get(cv2.CAP_PROP_FPS)
+        )
+
+        # The number of frames before the chunk that the stability of the first frame in the chunk depends on
+        num_overlap_frames = stability_window_size + 1
+
+        backoff_ms = 1000
+        while True:
+            chunk = {
+                "candidate_frames": [],
+                "num_frames": 0,
+                "stats": [],
+                "last_timestamp": None,
+                "last_frame": None,
+            }
+            prev_video_changes = PastFrameChangesTracker(stability_window_size)
+            num_frames_before_chunk = 0
+            has_enough_frames_before_chunk = True
+
+            seek_timestamp = max(0, start_timestamp - backoff_ms)
+
+            if seek_timestamp <= 0:
+                # The frame before the first frame is a blank screen
+                video_reader.set(cv2.CAP_PROP_POS_MSEC, 0)
+                prev_timestamp = 0
+                prev_frame = blank_frame
+            else:
+                video_reader.set(cv2.CAP_PROP_POS_MSEC, seek_timestamp)
+                is_read, prev_frame = video_reader.read()
+                prev_timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+                num_frames_before_chunk += 1
+
+                # Is when the chunk starts after the end of the video
+                if not is_read:
+                    break
+
+                # Seeking in OpenCV is not frame accurate, so it could land inside the chunk
+                if prev_timestamp >= start_timestamp:
+                    has_enough_frames_before_chunk = False
+
+            prev_image = self.__get_analysis_image__(prev_frame)
+            frame_buffers = FrameBufferPair()
+
+            while has_enough_frames_before_chunk and video_reader.isOpened():
+                is_read, cur_frame = self.__read_frame__(video_reader, frame_buffers)
+                timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+
+                if not is_read:
+                    break
+
+                if end_timestamp is not None and timestamp >= end_timestamp:
+                    break
+
+                if (
+                    timestamp >= start_timestamp
+                    and seek_timestamp > 0
+                    and num_frames_before_chunk < num_overlap_frames
+                ):
+                    has_enough_frames_before_chunk = False
+                    break
+
+                cur_image, results = self.__compare_frame__(
+                    prev_image, cur_frame, frame_buffers
+                )
+                has_changed = results["num_pixels_changed"] > min_change
+
+                if timestamp < start_timestamp:
+                    num_frames_before_chunk += 1
+
+                else:
+                    if prev_video_changes.are_previous_frames_stable() and has_changed:
+                        chunk["candidate_frames"].append(
+                            self.__create_candidate_frame__(
+                                chunk["num_frames"],
+                                prev_timestamp,
+                                prev_frame,
+                                cur_frame,
+                                results,
+                                save_debug_frames,
+                            )
+                        )
+
+                    if save_stats_for_all_frames:
+                        chunk["stats"].append(
+                            {
+                                "timestamp": timestamp,
+                                "num_pixels_changed": results["num_pixels_changed"],
+                            }
+                        )
+
+                    chunk["num_frames"] += 1
+                    chunk["last_timestamp"] = timestamp
+                    chunk["last_frame"] = cur_frame
+
+                prev_video_changes.add_frame_change(has_changed)
+
+                prev_frame = cur_frame
+                prev_image = cur_image
+                prev_timestamp = timestamp
+                frame_buffers.swap()
+
+            if has_enough_frames_before_chunk:
+                break
+
+            # Seek further back so that there are enough frames before the chunk
+            backoff_ms *= 2
+
+        video_reader.release()
+
+        chunk["stages"] = self.instrumentation.stages
+
+        return chunk
+
+    def __create_candidate_frame__(
+        self, frame_num, timestamp, frame, next_frame, results, save_debug_frames
+    ):
+        # The frames and the mask are copied since they can be in buffers that are reused by the next frames
+        return {
+            "frame_num": frame_num,
+            "timestamp": timestamp,
+            "frame": frame.copy(),
+            "next_frame": next_frame.copy() if save_debug_frames else None,
+            "mask": results["mask"].copy() if save_debug_frames else None,
+            "num_pixels_changed": results["num_pixels_changed"],
+        }
+
+    def __create_last_candidate_frame__(
+        self, frame_num, timestamp, frame, save_debug_frames
+    ):
+        next_frame, mask = None, None
+        if save_debug_frames:
+            next_frame = 255 * np.ones(frame.shape, np.uint8)  # A blank screen
+            mask = frame
+
+        return {
+            "frame_num": frame_num,
+            "timestamp": timestamp,
+            "frame": frame,
+            "next_frame": next_frame,
+            "mask": mask,
+            "num_pixels_changed": 0,
+        }
+
+    def __is_glitch__(self, last_selected_timestamp, timestamp):
+        """Checks if a frame at the timestamp is too close to the last selected frame to be selected"""
+        if last_selected_timestamp is None:
+            return False
+
+        return (timestamp - last_selected_timestamp) < self.min_segment_duration_ms
+
+    def __get_stability_window_size__(self, fps):
+        """Returns the number of frames before a change that need to have no changes for a video with the fps"""
+        if self.stability_window_ms is None or fps <= 0:
+            return 5
+
+        return max(1, int(round(self.stability_window_ms * fps / 1000)))
+
+    def __compare_frames__(self, prev_image, cur_image, buffers=None):
+        """Compares two images returned by __get_analysis_image__()
+
+        If buffers is set, it is a map of the buffers that the comparison is computed in, which are reused
+        by the next comparison with the same buffers
+        """
+        if buffers is None:
+            buffers = {}
+
+        diff = cv2.absdiff(prev_image, cur_image, dst=buffers.get("diff"))
+
+        if diff.ndim == 3:
+            mask = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY, dst=buffers.get("mask"))
+        else:
+            mask = diff
+
+        _, changed_pixels = cv2.threshold(
+            mask,
+            self.threshold,
+            255,
+            cv2.THRESH_BINARY,
+            dst=buffers.get("changed_pixels"),
+        )
+        num_pixels_changed = cv2.countNonZero(changed_pixels)
 
-        prev_timestamp = 0
-        prev_frame = 255 * np.ones(
-            (frame_height, frame_width, 3), np.uint8
-        )  # A blank screen
-        prev_video_changes = PastFrameChangesTracker()
+        buffers["diff"] = diff
+        buffers["mask"] = mask
+        buffers["changed_pixels"] = changed_pixels
+
+        return {"num_pixels_changed": num_pixels_changed, "mask": mask, "diff": diff}
+
+    def __get_analysis_image__(self, frame, buffers=None):
+        """Returns the image of a frame that is used to compare it with other frames
+
+        If analysis_width is set, it is a downscaled grayscale copy of the frame; else it is the frame itself.
+        If there are regions to include or exclude, the frame is cropped to the regions,
+        and the pixels that are not in the regions are blacked out.
+        If buffers is set, it is a map of the buffers that the image is computed in, which are reused
+        by the next image computed with the same buffers
+        """
+        if buffers is None:
+            buffers = {}
+
+        region_of_interest = self.__get_region_of_interest__(frame.shape[:2])
+
+        if region_of_interest is not None:
+            x0, y0, x1, y1 = region_of_interest["bounds"]
+            frame = frame[y0:y1, x0:x1]
+
+        if self.analysis_width is None:
+            image = frame
+        else:
+            image = frame
+            height, width = image.shape[:2]
+            analysis_height = max(1, int(round(height * self.analysis_width / width)))
+
+            # The frame is scaled down to half its size before it is converted to grayscale, so that fewer
+            # pixels are converted. OpenCV halves a frame much faster than it scales it down by other factors
+            if 2 * self.analysis_width <= width:
+                image = cv2.resize(
+                    image,
+                    (width // 2, height // 2),
+                    dst=buffers.get("halved"),
+                    interpolation=cv2.INTER_AREA,
+                )
+                buffers["halved"] = image
+
+            if image.ndim == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=buffers.get("gray"))
+                buffers["gray"] = image
+
+            if self.analysis_width < image.shape[1]:
+                image = cv2.resize(
+                    image,
+                    (self.analysis_width, analysis_height),
+                    dst=buffers.get("resized"),
+                    interpolation=cv2.INTER_AREA,
+                )
+                buffers["resized"] = image
+
+        if region_of_interest is not None:
+            mask = self.__get_region_of_interest_mask__(
+                region_of_interest, image.shape[:2]
+            )
+            if mask is not None:
+                # The pixels outside of the mask are only blacked out when the buffer is allocated,
+                # and they are never written to afterwards
+                image = cv2.bitwise_and(
+                    image, image, dst=buffers.get("masked"), mask=mask
+                )
+                buffers["masked"] = image
+
+        return image
+
+    def __get_region_of_interest__(self, frame_shape):
+        """Returns the bounds (x0, y0, x1, y1) of the pixels in the frames that are compared, and the mask
+        of these pixels within the bounds; or None if all pixels are compared
+        """
+        if not self.include_regions and not self.exclude_regions:
+            return None
+
+        if frame_shape in self.regions_of_interest:
+            return self.regions_of_interest[frame_shape]
+
+        frame_height, frame_width = frame_shape
+
+        if self.include_regions:
+            mask = np.zeros(frame_shape, np.uint8)
+            for x, y, width, height in self.include_regions:
+                mask[max(0, y) : y + height, max(0, x) : x + width] = 255
+        else:
+            mask = np.full(frame_shape, 255, np.uint8)
+
+        for x, y, width, height in self.exclude_regions or []:
+            mask[max(0, y) : y + height, max(0, x) : x + width] = 0
+
+        # Edge case: if no pixels are left, the whole frame is compared and nothing is ever changed
+        x, y, width, height = cv2.boundingRect(mask)
+        if width == 0 or height == 0:
+            x, y, width, height = 0, 0, frame_width, frame_height
+
+        region_of_interest = {
+            "bounds": (x, y, x + width, y + height),
+            "mask": mask[y : y + height, x : x + width],
+            "analysis_masks": {},
+        }
+        self.regions_of_interest[frame_shape] = region_of_interest
+
+        return region_of_interest
+
+    def __get_region_of_interest_mask__(self, region_of_interest, image_shape):
+        """Returns the mask of the region of interest scaled to the analysis image, or None if it is all pixels"""
+        analysis_masks = region_of_interest["analysis_masks"]
+
+        if image_shape not in analysis_masks:
+            mask = region_of_interest["mask"]
+
+            if mask.shape != image_shape:
+                mask = cv2.resize(
+                    mask,
+                    (image_shape[1], image_shape[0]),
+                    interpolation=cv2.INTER_NEAREST,
+                )
+
+            analysis_masks[image_shape] = None if np.all(mask > 0) else mask
+
+        return analysis_masks[image_shape]
+
+    def __get_min_change__(self, frame):
+        """Returns the min. number of pixel changes between the analysis images of two frames
+        of the same size as the frame for them to be distinct
+        """
+        if self.min_change_ratio is None:
+            return self.min_change
+
+        analysis_image = self.__get_analysis_image__(frame)
+        height, width = analysis_image.shape[:2]
+        num_pixels = height * width
+
+        # Only the pixels in the region of interest are compared
+        region_of_interest = self.__get_region_of_interest__(frame.shape[:2])
+        if region_of_interest is not None:
+            mask = self.__get_region_of_interest_mask__(
+                region_of_interest, (height, width)
+            )
+            if mask is not None:
+                num_pixels = cv2.countNonZero(mask)
+
+        return self.min_change_ratio * num_pixels
+
+    def __iter_frame_changes__(self, video_reader, fps, blank_frame, min_change):
+        """Reads the video and yields the changes of each analyzed frame from its previous analyzed frame
+
+        If sample_rate is set, frames in between two samples are grabbed without being decoded into images.
+        If two adjacent samples differ, the frames in between them are re-read so that the exact frame of the change is found
+
+        The frames are read into preallocated buffers (refer to FrameBufferPair), so a frame needs to be copied
+        to be kept for longer than the next frame
+
+        Yields
+        ------
+        frame_changes : (int, float, np.array(x, y, 3), dict, int)
+            The frame number, its timestamp, the frame, its comparison with the previous analyzed frame,
+            and the number of frames before it that were skipped over and are assumed to have no changes
+        """
+        step = 1
+        if self.sample_rate is not None and fps > 0:
+            step = max(1, int(round(fps / self.sample_rate)))
+
+        # The frame before the first frame is a blank screen
+        prev_frame_num = -1
+        prev_timestamp = None
+        prev_image = self.__get_analysis_image__(blank_frame)
+        frame_buffers = FrameBufferPair()
 
         while video_reader.isOpened():
-            is_read, cur_frame = video_reader.read()
+            # Skip over the frames in between two samples
+            num_grabbed = 0
+            if prev_frame_num >= 0 and step > 1:
+                with self.instrumentation.measure("decode", count=0) as measurement:
+                    while num_grabbed < step - 1 and video_reader.grab():
+                        num_grabbed += 1
+                    measurement["count"] = num_grabbed
+
+            is_read, cur_frame = self.__read_frame__(video_reader, frame_buffers)
             timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+            cur_frame_num = prev_frame_num + num_grabbed + 1
+
+            # Is when the stream is ending; the last grabbed frame still needs to be analyzed
+            if not is_read and num_grabbed > 0:
+                cur_frame_num -= 1
+                num_grabbed -= 1
+                with self.instrumentation.measure("decode"):
+                    is_read, cur_frame, timestamp = self.__read_frame_before_end__(
+                        video_reader, prev_timestamp, num_grabbed + 1
+                    )
 
-            # Is when the stream is ending
             if not is_read:
                 break
 
-            results = self.__compare_frames__(prev_frame, cur_frame)
+            cur_image, results = self.__compare_frame__(
+                prev_image, cur_frame, frame_buffers
+            )
+
+            if num_grabbed == 0 or results["num_pixels_changed"] <= min_change:
+                yield cur_frame_num, timestamp, cur_frame, results, num_grabbed
+                frame_buffers.swap()
+
+            else:
+                # Re-read the frames in between the two samples to find the exact frame that changed.
+                # The sampled frame is read again, so its buffers are reused. A copy of it is kept in case
+                # the frames can not be read again
+                sampled_frame = cur_frame.copy()
+                sampled_timestamp = timestamp
+
+                with self.instrumentation.measure("decode", count=0):
+                    self.__seek_to_timestamp__(video_reader, prev_timestamp)
 
-            # Store the results
-            if save_stats_for_all_frames:
-                frame_num_to_stats[frame_num] = {
-                    "timestamp": timestamp,
-                    "num_pixels_changed": results["num_pixels_changed"],
-                }
+                for frame_num in range(prev_frame_num + 1, cur_frame_num + 1):
+                    is_read, cur_frame = self.__read_frame__(
+                        video_reader, frame_buffers
+                    )
 
-            has_changed = results["num_pixels_changed"] > self.min_change
-            save_frame = False
+                    # Edge case: the frame is not read again, so the frames up to the sampled frame are skipped over
+                    if not is_read:
+                        cur_image = self.__get_analysis_image__(sampled_frame)
+                        results = self.__compare_frames__(prev_image, cur_image)
+                        timestamp = sampled_timestamp
+                        num_skipped = cur_frame_num - frame_num
 
-            if prev_video_changes.are_previous_frames_stable() and has_changed:
-                save_frame = True
+                        yield cur_frame_num, timestamp, sampled_frame, results, num_skipped
 
-            if save_frame:
-                selected_frames[frame_num] = {
-                    "timestamp": prev_timestamp,
-                    "frame": prev_frame,
-                    "next_frame": cur_frame,
-                    "mask": results["mask"],
-                    "num_pixels_changed": results["num_pixels_changed"],
-                }
+                        with self.instrumentation.measure("decode", count=0):
+                            self.__seek_to_timestamp__(video_reader, timestamp)
+                        break
 
-            prev_video_changes.add_frame_change(has_changed)
+                    timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+                    cur_image, results = self.__compare_frame__(
+                        prev_image, cur_frame, frame_buffers
+                    )
 
-            prev_frame = cur_frame
+                    yield frame_num, timestamp, cur_frame, results, 0
+
+                    prev_image = cur_image
+                    frame_buffers.swap()
+
+            prev_frame_num = cur_frame_num
             prev_timestamp = timestamp
+            prev_image = cur_image
 
-            frame_num += 1
+    def __read_frame__(self, video_reader, frame_buffers):
+        """Reads the next frame of the video into the frame buffers (refer to FrameBufferPair.read())"""
+        with self.instrumentation.measure("decode", count=0) as measurement:
+            is_read, frame = frame_buffers.read(video_reader)
+            measurement["count"] = int(is_read)
 
-        # Add the last frame of the video
-        selected_frames[frame_num] = {
-            "timestamp": prev_timestamp,
-            "frame": prev_frame,
-            "next_frame": 255
-            * np.ones((frame_height, frame_width, 3), np.uint8),  # A blank screen,
-            "mask": prev_frame,
-            "num_pixels_changed": 0,
-        }
+        return is_read, frame
 
-        # Rare case: if there are two selected frames s.t. they differ by 1 second, then there is a glitch
-        # and we pick the frame that is the earliest
-        selected_frame_nums = sorted(selected_frames.keys())
-        i = 0
-        while i < len(selected_frame_nums) - 1:
-            cur_frame = selected_frames[selected_frame_nums[i]]
-            next_frame = selected_frames[selected_frame_nums[i + 1]]
+    def __compare_frame__(self, prev_image, cur_frame, frame_buffers):
+        """Compares the analysis image of the previous frame with the current frame in the frame buffers
 
-            if (next_frame["timestamp"] - cur_frame["timestamp"]) < 2000:
-                del selected_frames[selected_frame_nums[i + 1]]
-                i += 1
+        Returns
+        -------
+        cur_image : np.array(x, y, 3) or np.array(x, y)
+            The analysis image of the current frame (refer to __get_analysis_image__())
+        results : dict
+            The comparison of the two images (refer to __compare_frames__())
+        """
+        with self.instrumentation.measure("diff"):
+            cur_image = self.__get_analysis_image__(
+                cur_frame, frame_buffers.get_analysis_buffers()
+            )
+            results = self.__compare_frames__(
+                prev_image, cur_image, frame_buffers.comparison_buffers
+            )
 
-            i += 1
+        return cur_image, results
 
-        # Edge case: delete the first selected frame since it is just a blank screen
-        del selected_frames[selected_frame_nums[0]]
+    def __read_frame_before_end__(self, video_reader, prev_timestamp, num_frames):
+        """Reads the frame that is num_frames after the frame at prev_timestamp, which is the last frame of the video"""
+        self.__seek_to_timestamp__(video_reader, prev_timestamp)
 
-        video_reader.release()
-        cv2.destroyAllWindows()
+        is_read, frame, timestamp = False, None, None
+        for _ in range(num_frames):
+            is_read, frame = video_reader.read()
+            timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
 
-        return selected_frames, frame_num_to_stats
+        return is_read, frame, timestamp
 
-    def __compare_frames__(self, prev_frame, cur_frame):
-        diff = cv2.absdiff(prev_frame, cur_frame)
-        mask = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-        num_pixels_changed = np.sum(mask > self.threshold)
+    def __seek_to_timestamp__(self, video_reader, timestamp):
+        """Moves the video reader such that the next read frame is the frame right after the frame at the timestamp
 
-        return {"num_pixels_changed": num_pixels_changed, "mask": mask, "diff": diff}
+        Seeking in OpenCV is not frame accurate, so it seeks to a point before the timestamp
+        and reads the frames up to the timestamp
+        """
+        backoff_ms = 0
+
+        while True:
+            video_reader.set(cv2.CAP_PROP_POS_MSEC, max(0, timestamp - backoff_ms))
+            is_read, _ = video_reader.read()
+            cur_timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+
+            if is_read and cur_timestamp <= timestamp:
+                break
+
+            if timestamp - backoff_ms <= 0:
+                raise Exception(f"Unable to seek to timestamp {timestamp}")
+
+            backoff_ms = max(1000, backoff_ms * 2)
+
+        while is_read and cur_timestamp < timestamp:
+            is_read = video_reader.grab()
+            cur_timestamp = video_reader.get(cv2.CAP_PROP_POS_MSEC)
+
+    def __read_frame_at_timestamp__(
+        self, video_reader, timestamp, max_timestamp_error=0
+    ):
+        """Reads the frame at the timestamp, where the next read frame is the frame right after it
+        If the timestamp can be off by up to max_timestamp_error milliseconds, the first frame after the
+        timestamp minus max_timestamp_error is read
+        """
+        timestamp = max(0, timestamp - max_timestamp_error)
+        self.__seek_to_timestamp__(video_reader, timestamp)
+        _, frame = video_reader.retrieve()
+
+        return frame
 
 
 if __name__ == "__main__":
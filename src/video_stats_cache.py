@@ -0,0 +1,223 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# The number of evenly spaced blocks of a video, from its start to its end, that are hashed in its cache key
+NUM_HASHED_BLOCKS = 16
+
+# The number of bytes in each hashed block of a video
+HASHED_BLOCK_SIZE = 1 << 20
+
+
+class VideoStatsCache:
+    """A class that saves the statistics of the frames in a video onto the disk,
+    so that the frames of a video can be selected again without reading the entire video again
+
+    The statistics are saved in a .npz file whose name is a hash of the video's size, a few evenly spaced
+    blocks of its content, and the parameters that the statistics were computed with.
+    The entire video is not hashed, so that the key is found without reading the entire video.
+    The key does not depend on the video's path or modified time, so a copied or moved video is found too
+
+    Attributes
+    ----------
+    cache_dir : str
+        The folder where the statistics are saved
+    content_hashes : { (a, b, c) -> d }
+        A map of the path a, size b and modified time c of each video whose content was hashed to the hash d,
+        so that the content of a video is only read once by a process
+    """
+
+    content_hashes = {}
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def get_cache_key(self, video_file, params):
+        """Returns the key of the statistics of a video
+
+        Parameters
+        ----------
+        video_file : str
+            The file path to the video
+        params : dict
+            The parameters that the statistics are computed with
+
+        Returns
+        -------
+        cache_key : str
+            A hash of the video's content and the parameters
+        """
+        cache_hash = hashlib.blake2b(digest_size=16)
+        cache_hash.update(self.get_content_hash(video_file).encode("utf-8"))
+        cache_hash.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+
+        return cache_hash.hexdigest()
+
+    def get_content_hash(self, video_file):
+        """Returns a hash of the size of a video and NUM_HASHED_BLOCKS evenly spaced blocks of its content
+        (or its entire content if it is small)
+
+        Parameters
+        ----------
+        video_file : str
+            The file path to the video
+
+        Returns
+        -------
+        content_hash : str
+            The hash of the video's content
+        """
+        video_stat = os.stat(video_file)
+        video_size = video_stat.st_size
+
+        # The path and the modified time are only used to not read the same video again
+        lookup_key = (os.path.abspath(video_file), video_size, video_stat.st_mtime_ns)
+        if lookup_key in VideoStatsCache.content_hashes:
+            return VideoStatsCache.content_hashes[lookup_key]
+
+        video_hash = hashlib.blake2b(digest_size=16)
+        video_hash.update(json.dumps(video_size).encode("utf-8"))
+
+        with open(video_file, "rb") as f:
+            if video_size <= NUM_HASHED_BLOCKS * HASHED_BLOCK_SIZE:
+                video_hash.update(f.read())
+            else:
+                block_offsets = np.linspace(
+                    0, video_size - HASHED_BLOCK_SIZE, NUM_HASHED_BLOCKS
+                ).astype(np.int64)
+
+                for block_offset in block_offsets:
+                    f.seek(int(block_offset))
+                    video_hash.update(f.read(HASHED_BLOCK_SIZE))
+
+        content_hash = video_hash.hexdigest()
+        VideoStatsCache.content_hashes[lookup_key] = content_hash
+
+        return content_hash
+
+    def load(self, cache_key):
+        """Loads the statistics of a video
+
+        Parameters
+        ----------
+        cache_key : str
+            The key of the statistics (refer to get_cache_key())
+
+        Returns
+        -------
+        stats : dict
+            A map with the "frame_nums", "timestamps" and "num_pixels_changed" of each analyzed frame as arrays,
+            and the total "num_frames" in the video; or None if the statistics were not saved
+        """
+        cache_filepath = self.__get_cache_filepath__(cache_key)
+
+        if not os.path.exists(cache_filepath):
+            return None
+
+        with np.load(cache_filepath) as data:
+            return {
+                "frame_nums": data["frame_nums"],
+                "timestamps": data["timestamps"],
+                "num_pixels_changed": data["num_pixels_changed"],
+                "num_frames": int(data["num_frames"]),
+            }
+
+    def save(self, cache_key, frame_num_to_stats, num_frames):
+        """Saves the statistics of a video
+
+        Parameters
+        ----------
+        cache_key : str
+            The key of the statistics (refer to get_cache_key())
+        frame_num_to_stats : { a -> c }
+            A map of frame number to its statistic (refer to VideoSegmentFinder.get_segment_frames_with_stats())
+        num_frames : int
+            The total number of frames in the video
+        """
+        frame_nums = sorted(frame_num_to_stats.keys())
+
+        self.save_stats(
+            cache_key,
+            {
+                "frame_nums": frame_nums,
+                "timestamps": [frame_num_to_stats[i]["timestamp"] for i in frame_nums],
+                "num_pixels_changed": [
+                    frame_num_to_stats[i]["num_pixels_changed"] for i in frame_nums
+                ],
+                "num_frames": num_frames,
+            },
+        )
+
+    def save_stats(self, cache_key, stats):
+        """Saves the statistics of a video
+
+        Parameters
+        ----------
+        cache_key : str
+            The key of the statistics (refer to get_cache_key())
+        stats : dict
+            The statistics (refer to load())
+        """
+        self.__save__(
+            cache_key,
+            frame_nums=np.array(stats["frame_nums"], dtype=np.int64),
+            timestamps=np.array(stats["timestamps"], dtype=np.float64),
+            num_pixels_changed=np.array(stats["num_pixels_changed"], dtype=np.int64),
+            num_frames=np.array(stats["num_frames"], dtype=np.int64),
+        )
+
+    def load_change_heatmap(self, cache_key):
+        """Loads the number of changes of each pixel in a video
+
+        Parameters
+        ----------
+        cache_key : str
+            The key of the heatmap (refer to get_cache_key())
+
+        Returns
+        -------
+        heatmap : dict
+            A map with the "num_changes" of each pixel as an array, the "num_comparisons" of frames,
+            and the "frame_width" of the video; or None if the heatmap was not saved
+        """
+        cache_filepath = self.__get_cache_filepath__(cache_key)
+
+        if not os.path.exists(cache_filepath):
+            return None
+
+        with np.load(cache_filepath) as data:
+            return {
+                "num_changes": data["num_changes"],
+                "num_comparisons": int(data["num_comparisons"]),
+                "frame_width": int(data["frame_width"]),
+            }
+
+    def save_change_heatmap(self, cache_key, heatmap):
+        """Saves the number of changes of each pixel in a video
+
+        Parameters
+        ----------
+        cache_key : str
+            The key of the heatmap (refer to get_cache_key())
+        heatmap : dict
+            The heatmap (refer to load_change_heatmap())
+        """
+        self.__save__(
+            cache_key,
+            num_changes=heatmap["num_changes"],
+            num_comparisons=np.array(heatmap["num_comparisons"], dtype=np.int64),
+            frame_width=np.array(heatmap["frame_width"], dtype=np.int64),
+        )
+
+    def __save__(self, cache_key, **arrays):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_filepath = self.__get_cache_filepath__(cache_key)
+
+        # Write to a temporary file first so that a partially written file is never loaded
+        temp_filepath = cache_filepath + ".tmp.npz"
+        np.savez(temp_filepath, **arrays)
+        os.replace(temp_filepath, cache_filepath)
+
+    def __get_cache_filepath__(self, cache_key):
+        return os.path.join(self.cache_dir, cache_key + ".npz")
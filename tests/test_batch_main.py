@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from src.batch_main import BatchCommandLineArgRunner
+
+
+class BatchCommandLineArgRunnerTests(unittest.TestCase):
+    def test_get_jobs_given_folder_should_return_videos_with_their_subtitles(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            for filename in ["b.mp4", "a.mp4", "a.vtt", "notes.txt"]:
+                open(os.path.join(input_dir, filename), "w").close()
+
+            jobs = BatchCommandLineArgRunner().get_jobs(input_dir, "pdfs")
+
+            self.assertEqual(len(jobs), 2)
+            self.assertEqual(jobs[0].video, os.path.join(input_dir, "a.mp4"))
+            self.assertEqual(jobs[0].subtitle, os.path.join(input_dir, "a.vtt"))
+            self.assertEqual(jobs[0].output, os.path.join("pdfs", "a.pdf"))
+            self.assertEqual(jobs[1].video, os.path.join(input_dir, "b.mp4"))
+            self.assertIsNone(jobs[1].subtitle)
+            self.assertEqual(jobs[1].output, os.path.join("pdfs", "b.pdf"))
+
+    def test_get_jobs_given_manifest_should_return_each_row(self):
+        with tempfile.NamedTemporaryFile(mode="w+", suffix=".csv") as manifest:
+            manifest.writelines(
+                [
+                    "video,subtitle,output\n",
+                    "lecture_1.mp4,lecture_1.srt,lecture_1.pdf\n",
+                    "lecture_2.mp4,,lecture_2.pdf\n",
+                ]
+            )
+            manifest.flush()
+
+            jobs = BatchCommandLineArgRunner().get_jobs(manifest.name)
+            manifest_dir = os.path.dirname(manifest.name)
+
+            self.assertEqual(len(jobs), 2)
+            self.assertEqual(
+                jobs[0].get_args(),
+                [
+                    os.path.join(manifest_dir, "lecture_1.mp4"),
+                    "-s",
+                    os.path.join(manifest_dir, "lecture_1.srt"),
+                    "-o",
+                    os.path.join(manifest_dir, "lecture_1.pdf"),
+                ],
+            )
+            self.assertEqual(
+                jobs[1].get_args(),
+                [
+                    os.path.join(manifest_dir, "lecture_2.mp4"),
+                    "-S",
+                    "-o",
+                    os.path.join(manifest_dir, "lecture_2.pdf"),
+                ],
+            )
+
+    def test_get_jobs_given_manifest_with_absolute_paths_should_keep_them(self):
+        with tempfile.NamedTemporaryFile(mode="w+", suffix=".csv") as manifest:
+            manifest.writelines(
+                [
+                    "video,subtitle,output\n",
+                    "/videos/lecture_1.mp4,,/pdfs/lecture_1.pdf\n",
+                ]
+            )
+            manifest.flush()
+
+            jobs = BatchCommandLineArgRunner().get_jobs(manifest.name)
+
+            self.assertEqual(jobs[0].video, "/videos/lecture_1.mp4")
+            self.assertEqual(jobs[0].output, "/pdfs/lecture_1.pdf")
+
+    def test_run_given_up_to_date_pdf_should_skip_video(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            video_filepath = os.path.join(input_dir, "a.mp4")
+            output_filepath = os.path.join(input_dir, "a.pdf")
+            open(video_filepath, "w").close()
+            open(output_filepath, "w").close()
+            os.utime(video_filepath, (0, 0))
+
+            results = BatchCommandLineArgRunner().run([input_dir, "-n", "1"])
+
+            self.assertEqual(len(results), 1)
+            self.assertEqual(results[0]["status"], "skipped")
+
+    def test_run_given_num_workers_and_many_jobs_should_fail(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            with self.assertRaises(AssertionError):
+                BatchCommandLineArgRunner().run([input_dir, "-n", "2", "-j", "2"])
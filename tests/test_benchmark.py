@@ -0,0 +1,76 @@
+import os
+import json
+import tempfile
+import unittest
+from src.benchmark import (
+    BenchmarkCommandLineArgRunner,
+    benchmark_subtitle_segment_finder,
+    benchmark_video_segment_finder,
+    create_slide_video,
+    create_subtitle_file,
+)
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_benchmark_video_segment_finder_given_slide_video_should_find_each_change(
+        self,
+    ):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_filepath = os.path.join(temp_dir, "video.avi")
+            create_slide_video(video_filepath, duration_s=24, slide_duration_s=12)
+
+            result = benchmark_video_segment_finder(video_filepath)
+
+        # Each slide is shown with 1, 2, 3 and then 4 lines of text
+        self.assertEqual(result["num_frames"], 240)
+        self.assertEqual(result["num_selected_frames"], 8)
+        self.assertGreater(result["frames_per_second"], 0)
+
+    def test_benchmark_subtitle_segment_finder_should_find_each_segment(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            subtitle_filepath = os.path.join(temp_dir, "subtitles.srt")
+            create_subtitle_file(subtitle_filepath, duration_s=100, cue_duration_s=2.5)
+
+            result = benchmark_subtitle_segment_finder(
+                subtitle_filepath, segment_duration_s=30
+            )
+
+        self.assertEqual(result["num_parts"], 40)
+        self.assertEqual(result["num_segments"], 4)
+        self.assertGreater(result["segments_per_second"], 0)
+
+    def test_run_should_save_results_as_json(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_filepath = os.path.join(temp_dir, "results.json")
+
+            BenchmarkCommandLineArgRunner().run(
+                [
+                    "-v",
+                    "tests/videos/input_4.mp4",
+                    "-d",
+                    "0",
+                    "-t",
+                    "60",
+                    "-p",
+                    "2",
+                    "-o",
+                    output_filepath,
+                ]
+            )
+
+            with open(output_filepath, mode="r") as f:
+                report = json.load(f)
+
+        self.assertEqual(
+            [result["name"] for result in report["results"]],
+            [
+                "video_segment_finder/input_4.mp4/default",
+                "video_segment_finder/input_4.mp4/analysis_width",
+                "video_segment_finder/input_4.mp4/sample_rate",
+                "subtitle_segment_finder/synthetic_subtitles.srt",
+                "pdf_builder/2_pages",
+            ],
+        )
+        self.assertEqual(report["results"][0]["num_frames"], 154)
+        self.assertEqual(report["results"][4]["num_pages"], 2)
+        self.assertGreater(report["results"][4]["peak_rss_mb"], 0)
@@ -0,0 +1,154 @@
+import os
+import re
+import tempfile
+import unittest
+import numpy as np
+from fpdf import FPDF
+from src.content_segment_exporter import (
+    ContentSegment,
+    ContentSegmentPdfBuilder,
+    IMAGE_WIDTH_MM,
+)
+from src.video_segment_finder import VideoSegmentFinder
+
+
+class ContentSegmentPdfBuilderTest(unittest.TestCase):
+    def test_generate_pdf_with_many_threads_should_keep_pages_in_order(self):
+        pages = [
+            ContentSegment(np.full((90, 160, 3), i * 20, np.uint8), f"Page {i}")
+            for i in range(10)
+        ]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            expected_filepath = os.path.join(temp_dir, "expected.pdf")
+            output_filepath = os.path.join(temp_dir, "output.pdf")
+
+            expected_num_pages = ContentSegmentPdfBuilder(num_threads=1).generate_pdf(
+                pages, expected_filepath
+            )
+            num_pages = ContentSegmentPdfBuilder(num_threads=3).generate_pdf(
+                iter(pages), output_filepath
+            )
+
+            self.assertEqual(num_pages, 10)
+            self.assertEqual(num_pages, expected_num_pages)
+            self.assertEqual(
+                self.__read_pdf_without_creation_date__(output_filepath),
+                self.__read_pdf_without_creation_date__(expected_filepath),
+            )
+
+    def test_generate_pdf_with_dpi_and_grayscale_should_make_smaller_pdf(self):
+        image = np.zeros((1080, 1920, 3), np.uint8)
+        image[200:400, 300:1600] = (40, 120, 200)
+        image[600:900, 300:900] = (200, 60, 10)
+        pages = [ContentSegment(image, None)]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            expected_filepath = os.path.join(temp_dir, "expected.pdf")
+            output_filepath = os.path.join(temp_dir, "output.pdf")
+
+            ContentSegmentPdfBuilder().generate_pdf(pages, expected_filepath)
+            ContentSegmentPdfBuilder(
+                dpi=100, grayscale=True, image_format="auto"
+            ).generate_pdf(pages, output_filepath)
+
+            self.assertLess(
+                os.path.getsize(output_filepath), os.path.getsize(expected_filepath)
+            )
+
+    def test_pdf_image_should_use_image_info_of_image_parsed_in_worker_thread(self):
+        # The pdf builder adds the images that it parsed to the images of the pdf like FPDF.image() does,
+        # so this fails if fpdf changes how FPDF.image() keeps its images
+        pdf_builder = ContentSegmentPdfBuilder()
+        image_buffer, image_info = pdf_builder.__encode_image__(
+            np.full((90, 160, 3), 50, np.uint8)
+        )
+        pdf = FPDF()
+
+        pdf_builder.__add_image_info__(pdf, image_buffer, image_info)
+        pdf_builder.__add_image_info__(pdf, image_buffer, image_info)
+        pdf.add_page()
+        first_image_info = pdf.image(image_buffer, w=IMAGE_WIDTH_MM)
+        pdf.add_page()
+        second_image_info = pdf.image(image_buffer, w=IMAGE_WIDTH_MM)
+
+        self.assertIs(first_image_info, image_info)
+        self.assertIs(second_image_info, image_info)
+        self.assertEqual(image_info["i"], 1)
+        self.assertEqual(len(pdf.images), 1)
+
+    def test_pdf_builder_with_unknown_image_format_should_throw_error(self):
+        with self.assertRaises(ValueError):
+            ContentSegmentPdfBuilder(image_format="gif")
+
+    def test_generate_pdf_with_deduplicate_images_should_store_repeated_image_once(
+        self,
+    ):
+        pages = [
+            ContentSegment(np.full((90, 160, 3), 50, np.uint8), "First"),
+            ContentSegment(np.full((90, 160, 3), 200, np.uint8), "Second"),
+            ContentSegment(np.full((90, 160, 3), 50, np.uint8), "Third"),
+        ]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_filepath = os.path.join(temp_dir, "output.pdf")
+
+            num_pages = ContentSegmentPdfBuilder(deduplicate_images=True).generate_pdf(
+                pages, output_filepath
+            )
+
+            self.assertEqual(num_pages, 3)
+            self.assertEqual(self.__count_images__(output_filepath), 2)
+
+    def test_generate_pdf_with_merge_duplicate_pages_should_merge_repeated_pages(
+        self,
+    ):
+        pages = [
+            ContentSegment(np.full((90, 160, 3), 50, np.uint8), "First"),
+            ContentSegment(np.full((90, 160, 3), 200, np.uint8), "Second"),
+            ContentSegment(np.full((90, 160, 3), 50, np.uint8), "Third"),
+        ]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_filepath = os.path.join(temp_dir, "output.pdf")
+
+            num_pages = ContentSegmentPdfBuilder(
+                merge_duplicate_pages=True
+            ).generate_pdf(pages, output_filepath)
+
+            self.assertEqual(num_pages, 2)
+            self.assertEqual(self.__count_images__(output_filepath), 2)
+
+    def test_generate_pdf_with_merge_duplicate_pages_of_videos_should_have_page_per_slide(
+        self,
+    ):
+        for video_filepath in [
+            "tests/videos/input_4.mp4",
+            "tests/videos/input_5.mp4",
+            "tests/videos/input_6.mp4",
+        ]:
+            with self.subTest(video_filepath=video_filepath):
+                data = VideoSegmentFinder().get_best_segment_frames(video_filepath)
+                frame_nums = sorted(data.keys())
+
+                # The first slide is shown again at the end
+                pages = [ContentSegment(data[i]["frame"], None) for i in frame_nums]
+                pages.append(ContentSegment(data[frame_nums[0]]["frame"].copy(), None))
+
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    output_filepath = os.path.join(temp_dir, "output.pdf")
+
+                    num_pages = ContentSegmentPdfBuilder(
+                        merge_duplicate_pages=True
+                    ).generate_pdf(pages, output_filepath)
+
+                    self.assertEqual(num_pages, len(frame_nums))
+
+    def __count_images__(self, filepath):
+        with open(filepath, "rb") as f:
+            # Each color image also has an alpha mask image
+            return f.read().count(b"/ColorSpace /DeviceRGB")
+
+    def __read_pdf_without_creation_date__(self, filepath):
+        with open(filepath, "rb") as f:
+            return re.sub(rb"/CreationDate \(D:\d+\)", b"", f.read())
@@ -0,0 +1,228 @@
+import sys
+import shutil
+import unittest
+from fractions import Fraction
+import cv2
+import numpy as np
+from src.frame_source import OpenCVFrameSource, FFmpegFrameSource, FFmpegLogReader
+from src.frame_source import find_keyframe_timestamps, parse_keyframe_timestamps
+from src.video_segment_finder import VideoSegmentFinder
+
+
+class OpenCVFrameSourceTest(unittest.TestCase):
+    def test_iter_frames_should_return_scaled_grayscale_frames(self):
+        video_reader = cv2.VideoCapture("tests/videos/input_4.mp4")
+        expected_frames = []
+        while True:
+            is_read, frame = video_reader.read()
+            if not is_read:
+                break
+            expected_frames.append(frame)
+        video_reader.release()
+
+        with OpenCVFrameSource(
+            "tests/videos/input_4.mp4", width=160, grayscale=True
+        ) as frame_source:
+            num_frames = 0
+            for frame_num, _, frame in frame_source.iter_frames():
+                expected_frame = cv2.cvtColor(
+                    expected_frames[frame_num], cv2.COLOR_BGR2GRAY
+                )
+                expected_frame = cv2.resize(
+                    expected_frame, frame.shape[::-1], interpolation=cv2.INTER_AREA
+                )
+
+                self.assertEqual(frame.shape[1], 160)
+                self.assertTrue(np.array_equal(frame, expected_frame))
+                num_frames += 1
+
+        self.assertEqual(num_frames, len(expected_frames))
+        self.assertEqual(frame_source.num_frames, len(expected_frames))
+
+    def test_get_frames_with_opencv_frame_source_should_return_same_breaks(self):
+        expected = VideoSegmentFinder(analysis_width=160).get_best_segment_frames(
+            "tests/videos/input_6.mp4"
+        )
+        data = VideoSegmentFinder(
+            analysis_width=160, frame_source="opencv"
+        ).get_best_segment_frames("tests/videos/input_6.mp4")
+
+        self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+
+        for frame_num in expected:
+            self.assertEqual(
+                data[frame_num]["timestamp"], expected[frame_num]["timestamp"]
+            )
+            self.assertTrue(
+                np.array_equal(data[frame_num]["frame"], expected[frame_num]["frame"])
+            )
+
+
+# A script that logs and pipes out frames like ffmpeg, with the presentation times of a variable frame rate
+FAKE_FFMPEG_SCRIPT = """
+import sys
+sys.stderr.write("[Parsed_showinfo_1 @ 0x1] config in time_base: 1/15360, frame_rate: 30/1\\n")
+for n, pts in enumerate((1024, 1536, 3072)):
+    sys.stderr.write("[Parsed_showinfo_1 @ 0x1] n:{:4d} pts:{:7d} pts_time:0 duration: 512\\n".format(n, pts))
+    sys.stderr.flush()
+    sys.stdout.buffer.write(bytes([n]) * 8)
+    sys.stdout.flush()
+sys.stderr.write("[out#0/rawvideo @ 0x2] video:0kB audio:0kB\\n")
+sys.stderr.write("Error while decoding stream #0:0: Invalid data found when processing input\\n")
+sys.exit(int(sys.argv[1]))
+"""
+
+
+class FakeFFmpegFrameSource(FFmpegFrameSource):
+    """Runs a script that behaves like ffmpeg on a 4x2 video instead of ffmpeg"""
+
+    def __init__(self, exit_code, **kwargs):
+        self.exit_code = exit_code
+        super().__init__("video.mp4", **kwargs)
+
+    def __probe_video__(self):
+        return {
+            "width": 4,
+            "height": 2,
+            "fps": 30,
+            "num_frames": 3,
+            "time_base": Fraction(1, 1000),
+            "start_time": 1024 / 15360,
+        }
+
+    def __get_command__(self):
+        return [sys.executable, "-c", FAKE_FFMPEG_SCRIPT, str(self.exit_code)]
+
+
+class FFmpegLogReaderTest(unittest.TestCase):
+    def test_parse_line_should_return_timestamp_in_time_base_of_showinfo(self):
+        log_reader = FFmpegLogReader(None, Fraction(1, 1000), 0.5)
+
+        self.assertIsNone(
+            log_reader.parse_line(
+                "[Parsed_showinfo_2 @ 0x5] config in time_base: 1/15360, frame_rate: 30/1"
+            )
+        )
+        timestamp = log_reader.parse_line(
+            "[Parsed_showinfo_2 @ 0x5] n:  12 pts:  15360 pts_time:1 duration:512"
+        )
+
+        self.assertAlmostEqual(timestamp, 500)
+
+    def test_parse_line_should_ignore_other_lines(self):
+        log_reader = FFmpegLogReader(None, Fraction(1, 1000), 0)
+
+        self.assertIsNone(log_reader.parse_line("Stream #0:0: Video: h264, 30 fps"))
+        self.assertIsNone(
+            log_reader.parse_line("[Parsed_showinfo_2 @ 0x5] n:   0 pts:NOPTS")
+        )
+
+
+class KeyframeTimestampsTest(unittest.TestCase):
+    def test_parse_keyframe_timestamps_should_return_sorted_keyframes_after_start_time(
+        self,
+    ):
+        probe = {
+            "streams": [{"start_time": "0.500000"}],
+            "packets": [
+                {"pts_time": "0.500000", "flags": "K__"},
+                {"pts_time": "0.600000", "flags": "___"},
+                {"pts_time": "10.500000", "flags": "K__"},
+                {"pts_time": "5.500000", "flags": "K_D"},
+                {"pts_time": "N/A", "flags": "K__"},
+            ],
+        }
+
+        timestamps = parse_keyframe_timestamps(probe)
+
+        self.assertEqual(len(timestamps), 3)
+        for timestamp, expected_timestamp in zip(timestamps, (0, 5000, 10000)):
+            self.assertAlmostEqual(timestamp, expected_timestamp)
+
+
+class FakeFFmpegFrameSourceTest(unittest.TestCase):
+    def test_iter_frames_should_return_timestamps_of_variable_frame_rate(self):
+        with FakeFFmpegFrameSource(0, grayscale=True) as frame_source:
+            frames = [
+                (frame_num, timestamp, frame.copy())
+                for frame_num, timestamp, frame in frame_source.iter_frames()
+            ]
+
+        self.assertEqual([frame[0] for frame in frames], [0, 1, 2])
+        for (_, timestamp, _), expected_timestamp in zip(frames, (0, 100 / 3, 400 / 3)):
+            self.assertAlmostEqual(timestamp, expected_timestamp)
+        for n, (_, _, frame) in enumerate(frames):
+            self.assertTrue(np.array_equal(frame, np.full((2, 4), n, np.uint8)))
+
+    def test_iter_frames_should_number_sampled_frames_by_decoded_frames(self):
+        with FakeFFmpegFrameSource(0, grayscale=True, sample_rate=10) as frame_source:
+            frame_nums = [frame_num for frame_num, _, _ in frame_source.iter_frames()]
+
+        self.assertEqual(frame_nums, [0, 3, 6])
+
+    def test_iter_frames_should_throw_error_when_ffmpeg_fails(self):
+        with FakeFFmpegFrameSource(1, grayscale=True) as frame_source:
+            with self.assertRaises(Exception) as context:
+                for _ in frame_source.iter_frames():
+                    pass
+
+        self.assertIn("exit code 1", str(context.exception))
+        self.assertIn("Invalid data found", str(context.exception))
+
+
+@unittest.skipIf(shutil.which("ffmpeg") is None, "ffmpeg is not installed")
+class FFmpegFrameSourceTest(unittest.TestCase):
+    def test_iter_frames_should_return_same_number_of_frames_as_opencv(self):
+        with OpenCVFrameSource("tests/videos/input_4.mp4") as frame_source:
+            expected_num_frames = len(list(frame_source.iter_frames()))
+
+        with FFmpegFrameSource(
+            "tests/videos/input_4.mp4", width=160, grayscale=True
+        ) as frame_source:
+            num_frames = 0
+            for _, _, frame in frame_source.iter_frames():
+                self.assertEqual(frame.ndim, 2)
+                self.assertEqual(frame.shape[1], 160)
+                num_frames += 1
+
+        self.assertEqual(num_frames, expected_num_frames)
+
+    def test_iter_frames_should_return_same_timestamps_and_frames_as_opencv(self):
+        with OpenCVFrameSource(
+            "tests/videos/input_4.mp4", width=320, grayscale=True, sample_rate=5
+        ) as frame_source:
+            expected_frames = [
+                (frame_num, timestamp, frame.copy())
+                for frame_num, timestamp, frame in frame_source.iter_frames()
+            ]
+
+        with FFmpegFrameSource(
+            "tests/videos/input_4.mp4", width=320, grayscale=True, sample_rate=5
+        ) as frame_source:
+            frames = [
+                (frame_num, timestamp, frame.copy())
+                for frame_num, timestamp, frame in frame_source.iter_frames()
+            ]
+
+        self.assertEqual(len(frames), len(expected_frames))
+
+        for (frame_num, timestamp, frame), expected_frame in zip(
+            frames, expected_frames
+        ):
+            expected_frame_num, expected_timestamp, expected_image = expected_frame
+
+            self.assertEqual(frame_num, expected_frame_num)
+            self.assertLessEqual(
+                abs(timestamp - expected_timestamp),
+                FFmpegFrameSource.max_timestamp_error,
+            )
+
+            # The frames are decoded, scaled down and converted to grayscale a bit differently by ffmpeg
+            self.assertEqual(frame.shape, expected_image.shape)
+            self.assertLess(np.mean(cv2.absdiff(frame, expected_image)), 4)
+
+    def test_find_keyframe_timestamps_should_find_keyframe_every_ten_seconds(self):
+        timestamps = find_keyframe_timestamps("tests/videos/input_6.mp4")
+
+        for timestamp, expected_timestamp in zip(timestamps, (0, 10000, 20000)):
+            self.assertAlmostEqual(timestamp, expected_timestamp, places=1)
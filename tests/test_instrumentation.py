@@ -0,0 +1,64 @@
+import pickle
+import unittest
+from src.instrumentation import Instrumentation
+
+
+class InstrumentationTests(unittest.TestCase):
+    def test_measure_should_add_up_calls_of_stage(self):
+        instrumentation = Instrumentation()
+
+        with instrumentation.measure("decode"):
+            pass
+        with instrumentation.measure("decode", count=0) as measurement:
+            measurement["count"] = 5
+
+        stages = instrumentation.get_report()["stages"]
+
+        self.assertEqual(list(stages.keys()), ["decode"])
+        self.assertEqual(stages["decode"]["count"], 6)
+        self.assertEqual(stages["decode"]["calls"], 2)
+        self.assertGreaterEqual(stages["decode"]["wall_time"], 0)
+
+    def test_measure_given_disabled_instrumentation_should_not_add_stage(self):
+        instrumentation = Instrumentation(enabled=False)
+
+        with instrumentation.measure("decode") as measurement:
+            measurement["count"] = 5
+
+        self.assertEqual(instrumentation.get_report()["stages"], {})
+
+    def test_add_hook_should_call_hook_with_each_measurement(self):
+        instrumentation = Instrumentation()
+        measurements = []
+        instrumentation.add_hook(
+            lambda stage, measurement: measurements.append((stage, measurement))
+        )
+
+        instrumentation.add("diff", 2.0, 1.5, count=3)
+
+        self.assertEqual(len(measurements), 1)
+        self.assertEqual(measurements[0][0], "diff")
+        self.assertEqual(measurements[0][1]["wall_time"], 2.0)
+        self.assertEqual(measurements[0][1]["cpu_time"], 1.5)
+        self.assertEqual(measurements[0][1]["count"], 3)
+
+    def test_merge_should_add_stages_of_instrumentation_in_other_process(self):
+        instrumentation = Instrumentation()
+        instrumentation.add_hook(lambda stage, measurement: None)
+        instrumentation.add("decode", 1.0, 1.0, count=10)
+
+        # The hooks are not sent to the other process
+        other_instrumentation = pickle.loads(pickle.dumps(instrumentation))
+        other_instrumentation.stages = {}
+        other_instrumentation.add("decode", 2.0, 1.0, count=20)
+        other_instrumentation.add("diff", 1.0, 1.0, count=20)
+        self.assertEqual(other_instrumentation.hooks, [])
+
+        instrumentation.merge(other_instrumentation.stages)
+        stages = instrumentation.get_report()["stages"]
+
+        self.assertEqual(list(stages.keys()), ["decode", "diff"])
+        self.assertEqual(stages["decode"]["wall_time"], 3.0)
+        self.assertEqual(stages["decode"]["count"], 30)
+        self.assertEqual(stages["decode"]["calls"], 2)
+        self.assertEqual(stages["diff"]["count"], 20)
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+from src.segment_selection import select_segment_frames
+from src.video_segment_finder import VideoSegmentFinder
+
+
+class SegmentSelectionTest(unittest.TestCase):
+    def test_select_segment_frames_should_select_frames_before_stable_changes(self):
+        timestamps = np.arange(40) * 1000
+        num_pixels_changed = np.zeros(40)
+        num_pixels_changed[[0, 10, 12, 30]] = 20000
+
+        selected_indices = select_segment_frames(timestamps, num_pixels_changed, 10000)
+
+        # Frame 12 is too close to frame 10, and the candidate at frame 0 is a blank screen
+        self.assertEqual(list(selected_indices), [10, 30, 40])
+
+    def test_select_segment_frames_should_keep_earliest_frame_of_glitch(self):
+        timestamps = np.arange(40) * 200
+        num_pixels_changed = np.zeros(40)
+        num_pixels_changed[[0, 20, 26, 32, 39]] = 20000
+
+        selected_indices = select_segment_frames(timestamps, num_pixels_changed, 10000)
+
+        # Frame 26 is a glitch of frame 20 and frame 39 is a glitch of frame 32, so the frames after them are kept
+        self.assertEqual(list(selected_indices), [20, 32, 40])
+
+    def test_select_segment_frames_should_treat_skipped_frames_as_unchanged(self):
+        frame_nums = np.array([0, 20, 21, 40, 60])
+        timestamps = frame_nums * 1000
+        num_pixels_changed = np.array([0, 20000, 20000, 20000, 0])
+
+        selected_indices = select_segment_frames(
+            timestamps, num_pixels_changed, 10000, frame_nums=frame_nums
+        )
+
+        # Frame 21 changed right after frame 20, but the frames between frame 21 and frame 40 were skipped
+        self.assertEqual(list(selected_indices), [3, 5])
+
+    def test_select_segment_frames_should_return_same_breaks_as_video_segment_finder(
+        self,
+    ):
+        _, stats = VideoSegmentFinder().get_segment_frames_with_stats(
+            "tests/videos/input_4.mp4", save_debug_frames=False
+        )
+        frame_nums = np.array(sorted(stats.keys()))
+        timestamps = np.array([stats[i]["timestamp"] for i in frame_nums])
+        num_pixels_changed = np.array(
+            [stats[i]["num_pixels_changed"] for i in frame_nums]
+        )
+
+        for min_change in (5000, 10000, 50000):
+            expected = VideoSegmentFinder(
+                min_change=min_change
+            ).get_best_segment_frames("tests/videos/input_4.mp4")
+            selected_indices = select_segment_frames(
+                timestamps, num_pixels_changed, min_change
+            )
+
+            self.assertEqual(list(selected_indices), sorted(expected.keys()))
+            self.assertEqual(
+                [timestamps[i - 1] for i in selected_indices],
+                [expected[i]["timestamp"] for i in sorted(expected.keys())],
+            )
@@ -0,0 +1,95 @@
+import unittest
+import cv2
+import numpy as np
+from src.slide_index import SlideIndex, compute_dhash, find_duplicate_frames
+
+
+def create_slide(title, lines):
+    image = np.full((720, 1280, 3), 255, np.uint8)
+    cv2.rectangle(image, (0, 0), (1280, 120), (120, 60, 20), -1)
+    cv2.putText(image, title, (40, 85), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 4)
+
+    for i, line in enumerate(lines):
+        cv2.putText(
+            image, line, (60, 220 + 80 * i), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3
+        )
+
+    return image
+
+
+class SlideIndexTest(unittest.TestCase):
+    def test_compute_dhash_of_resized_image_should_be_close_to_original(self):
+        image = create_slide("Sorting", ["Merge sort", "Quick sort"])
+        resized_image = cv2.resize(image, (640, 360), interpolation=cv2.INTER_AREA)
+
+        distance = bin(compute_dhash(image) ^ compute_dhash(resized_image)).count("1")
+
+        self.assertLessEqual(distance, 10)
+
+    def test_find_or_add_should_find_repeated_slide(self):
+        slide_index = SlideIndex()
+        slide_1 = create_slide("Sorting", ["Merge sort", "Quick sort"])
+        slide_2 = create_slide("Graphs", ["Depth first search"])
+
+        self.assertEqual(slide_index.find_or_add(slide_1), (0, True))
+        self.assertEqual(slide_index.find_or_add(slide_2), (1, True))
+        self.assertEqual(slide_index.find_or_add(slide_1.copy()), (0, False))
+
+    def test_hash_chunks_of_hashes_with_max_hash_distance_should_have_same_chunk(self):
+        slide_index = SlideIndex(max_hash_distance=10)
+        random = np.random.default_rng(0)
+
+        for _ in range(100):
+            dhash = int.from_bytes(random.bytes(32), "big")
+            other_dhash = dhash
+            for bit in random.choice(256, 10, replace=False):
+                other_dhash ^= 1 << int(bit)
+
+            hash_chunks = slide_index.__get_hash_chunks__(dhash)
+            other_hash_chunks = slide_index.__get_hash_chunks__(other_dhash)
+
+            self.assertEqual(len(hash_chunks), 11)
+            self.assertTrue(any(a == b for a, b in zip(hash_chunks, other_hash_chunks)))
+
+    def test_find_or_add_should_not_find_slide_with_same_layout_and_different_text(
+        self,
+    ):
+        slide_index = SlideIndex()
+        slide_index.find_or_add(create_slide("Sorting", ["Merge sort", "Quick sort"]))
+
+        _, is_new = slide_index.find_or_add(
+            create_slide("Sorting", ["Merge sort", "Heap sort"])
+        )
+
+        self.assertTrue(is_new)
+
+    def test_find_or_add_should_not_find_slide_with_small_annotation(self):
+        slide_index = SlideIndex()
+        slide = create_slide("Variables", ["Assign a value to x"])
+        annotated_slide = slide.copy()
+        cv2.putText(
+            annotated_slide,
+            "x = 5",
+            (900, 600),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            (0, 0, 255),
+            2,
+        )
+        slide_index.find_or_add(slide)
+
+        _, is_new = slide_index.find_or_add(annotated_slide)
+
+        self.assertTrue(is_new)
+
+    def test_find_duplicate_frames_should_map_repeated_frames_to_first_frame(self):
+        slide_1 = create_slide("Sorting", ["Merge sort", "Quick sort"])
+        slide_2 = create_slide("Graphs", ["Depth first search"])
+        selected_frames = {
+            10: {"frame": slide_1},
+            30: {"frame": slide_2},
+            50: {"frame": slide_1},
+            70: {"frame": slide_2},
+        }
+
+        self.assertEqual(find_duplicate_frames(selected_frames), {50: 10, 70: 30})
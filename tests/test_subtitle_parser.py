@@ -0,0 +1,114 @@
+import os
+import glob
+import tempfile
+import unittest
+import numpy as np
+from src.time_utils import convert_clock_time_to_timestamp_ms as get_timestamp
+from src.subtitle_parser import SubtitleParser
+from src.subtitle_srt_parser import SubtitleSRTParser
+from src.subtitle_webvtt_parser import SubtitleWebVTTParser
+
+
+class SubtitleParserTests(unittest.TestCase):
+    def test_get_subtitle_parts_should_return_same_parts_as_srt_and_webvtt_parsers(
+        self,
+    ):
+        for filepath in sorted(glob.glob("tests/subtitles/*")):
+            with self.subTest(filepath=filepath):
+                if filepath.endswith(".srt"):
+                    expected = SubtitleSRTParser(filepath).get_subtitle_parts()
+                else:
+                    expected = SubtitleWebVTTParser(filepath).get_subtitle_parts()
+
+                parts = SubtitleParser(filepath).get_subtitle_parts()
+
+                self.assertEqual(len(parts), len(expected))
+                self.assertTrue(np.array_equal(parts.start_times, expected.start_times))
+                self.assertTrue(np.array_equal(parts.end_times, expected.end_times))
+                self.assertEqual(parts.text, expected.text)
+
+    def test_iter_subtitle_parts_should_yield_same_parts_as_get_subtitle_parts(self):
+        for filepath in sorted(glob.glob("tests/subtitles/*")):
+            with self.subTest(filepath=filepath):
+                expected = SubtitleParser(filepath).get_subtitle_parts()
+
+                parts = list(SubtitleParser(filepath).iter_subtitle_parts())
+
+                self.assertEqual(len(parts), len(expected))
+                for part, expected_part in zip(parts, expected):
+                    self.assertEqual(part.start_time, expected_part.start_time)
+                    self.assertEqual(part.end_time, expected_part.end_time)
+                    self.assertEqual(part.text, expected_part.text)
+
+    def test_get_subtitle_parts_given_webvtt_content_should_find_format_from_content(
+        self,
+    ):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, "subtitles.txt")
+            with open(filepath, mode="w", encoding="utf-8") as f:
+                f.writelines(
+                    [
+                        "WEBVTT\n",
+                        "\n",
+                        "NOTE a comment --> with an arrow\n",
+                        "\n",
+                        "00:04.134 --> 00:08.425 align:start\n",
+                        "security means, we can <i>actually</i> argue\n",
+                        "\n",
+                        "00:00:10.000 --> 00:00:12.000\n",
+                        "<c>that</c> a stream cipher\n",
+                    ]
+                )
+
+            parser = SubtitleParser(filepath)
+            parts = parser.get_subtitle_parts()
+
+            self.assertEqual(len(parts), 2)
+            self.assertEqual(parts[0].start_time, get_timestamp("00:00:04.134"))
+            self.assertEqual(parts[0].end_time, get_timestamp("00:00:10"))
+            self.assertEqual(parts[0].text, "security means, we can actually argue")
+            self.assertEqual(parts[1].text, "that a stream cipher")
+
+    def test_get_subtitle_parts_given_srt_content_should_keep_tags_and_skip_empty_parts(
+        self,
+    ):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, "subtitles.vtt")
+            with open(filepath, mode="w", encoding="utf-8") as f:
+                f.writelines(
+                    [
+                        "1\r\n",
+                        "00:00:00,000 --> 00:00:04,134\r\n",
+                        "So now that we understand\r\n",
+                        "what a <i>secure</i> PRG is\r\n",
+                        "\r\n",
+                        "2\r\n",
+                        "00:00:04,134 --> 00:00:06,000\r\n",
+                        "\r\n",
+                        "3\r\n",
+                        "00:00:06,000 --> 00:00:08,425\r\n",
+                        "and what semantic security means\r\n",
+                    ]
+                )
+
+            parts = SubtitleParser(filepath).get_subtitle_parts()
+
+            self.assertEqual(len(parts), 2)
+            self.assertEqual(parts[0].end_time, get_timestamp("00:00:06"))
+            self.assertEqual(
+                parts[0].text, "So now that we understand what a <i>secure</i> PRG is"
+            )
+            self.assertEqual(parts[1].start_time, get_timestamp("00:00:06"))
+            self.assertEqual(parts[1].end_time, get_timestamp("00:00:08.425"))
+
+    def test_get_subtitle_parts_given_file_without_subtitles_should_raise_error(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, "subtitles.srt")
+            with open(filepath, mode="w", encoding="utf-8") as f:
+                f.write("These are not subtitles\n")
+
+            with self.assertRaises(ValueError):
+                SubtitleParser(filepath).get_subtitle_parts()
+
+            with self.assertRaises(ValueError):
+                list(SubtitleParser(filepath).iter_subtitle_parts())
@@ -1,10 +1,14 @@
 import unittest
 import snapshottest
 from src.time_utils import convert_clock_time_to_timestamp_ms as get_timestamp
-from src.subtitle_segment_finder import SubtitleSegmentFinder
+from src.subtitle_segment_finder import (
+    SubtitleSegmentFinder,
+    ALL_SENTENCE_TERMINATORS,
+)
 from src.subtitle_part import SubtitlePart
 from src.subtitle_webvtt_parser import SubtitleWebVTTParser
 from src.subtitle_srt_parser import SubtitleSRTParser
+from src.subtitle_parser import SubtitleParser
 
 
 class SubtitleSplitterTests(snapshottest.TestCase):
@@ -116,6 +120,120 @@ class SubtitleSplitterTests(snapshottest.TestCase):
             transcript_pages[1], "My name is Bob and his name is Alice. Today, we are"
         )
 
+    def test_get_pages_given_page_spanning_many_subtitle_segments_should_join_them_with_spaces(
+        self,
+    ):
+        segments = [
+            SubtitlePart(
+                get_timestamp("00:00:00"),
+                get_timestamp("00:00:10"),
+                "Hi. My name is Bob",
+            ),
+            SubtitlePart(
+                get_timestamp("00:00:10"),
+                get_timestamp("00:00:20"),
+                "and this is Alice",
+            ),
+            SubtitlePart(
+                get_timestamp("00:00:20"),
+                get_timestamp("00:00:30"),
+                "and Eve. Today, we are",
+            ),
+        ]
+        pager = SubtitleSegmentFinder(segments)
+        time_breaks = [get_timestamp("00:00:02"), get_timestamp("00:00:25")]
+        transcript_pages = pager.get_subtitle_segments(time_breaks)
+
+        self.assertEqual(transcript_pages[0], "Hi.")
+        self.assertEqual(
+            transcript_pages[1], "My name is Bob and this is Alice and Eve."
+        )
+
+    def test_get_pages_given_question_and_exclamation_marks_should_break_at_them(
+        self,
+    ):
+        segments = [
+            SubtitlePart(
+                get_timestamp("00:00:00"),
+                get_timestamp("00:00:10"),
+                "Is it Bob? Yes",
+            ),
+            SubtitlePart(
+                get_timestamp("00:00:10"),
+                get_timestamp("00:00:20"),
+                "it is Bob! Today, we are",
+            ),
+        ]
+        pager = SubtitleSegmentFinder(
+            segments, sentence_terminators=ALL_SENTENCE_TERMINATORS
+        )
+        time_breaks = [get_timestamp("00:00:05"), get_timestamp("00:00:15")]
+        transcript_pages = pager.get_subtitle_segments(time_breaks)
+
+        self.assertEqual(transcript_pages[0], "Is it Bob?")
+        self.assertEqual(transcript_pages[1], "Yes it is Bob!")
+
+    def test_get_pages_given_question_and_exclamation_marks_by_default_should_only_break_at_periods(
+        self,
+    ):
+        segments = [
+            SubtitlePart(
+                get_timestamp("00:00:00"),
+                get_timestamp("00:00:10"),
+                "Is it Bob? Yes",
+            ),
+            SubtitlePart(
+                get_timestamp("00:00:10"),
+                get_timestamp("00:00:20"),
+                "it is Bob. Today, we are",
+            ),
+        ]
+        pager = SubtitleSegmentFinder(segments)
+        time_breaks = [get_timestamp("00:00:15"), get_timestamp("00:00:20")]
+        transcript_pages = pager.get_subtitle_segments(time_breaks)
+
+        self.assertEqual(transcript_pages[0], "Is it Bob? Yes it is Bob.")
+        self.assertEqual(transcript_pages[1], "Today, we are")
+
+    def test_get_pages_given_two_breaks_nearest_to_same_period_should_not_return_empty_page(
+        self,
+    ):
+        segments = [
+            SubtitlePart(
+                get_timestamp("00:00:00"),
+                get_timestamp("00:00:10"),
+                "one two three four five.",
+            ),
+            SubtitlePart(
+                get_timestamp("00:00:10"),
+                get_timestamp("00:00:20"),
+                "six seven eight nine ten",
+            ),
+        ]
+        pager = SubtitleSegmentFinder(segments)
+        time_breaks = [get_timestamp("00:00:09"), get_timestamp("00:00:11")]
+        transcript_pages = pager.get_subtitle_segments(time_breaks)
+
+        self.assertEqual(transcript_pages[0], "one two three four five.")
+        self.assertEqual(transcript_pages[1], "six")
+
+    def test_get_pages_given_break_in_middle_of_two_periods_should_break_at_left_period(
+        self,
+    ):
+        segments = [
+            SubtitlePart(
+                get_timestamp("00:00:00"),
+                get_timestamp("00:00:10"),
+                "Ab. Cd. Ef",
+            )
+        ]
+        pager = SubtitleSegmentFinder(segments)
+        time_breaks = [get_timestamp("00:00:04"), get_timestamp("00:00:10")]
+        transcript_pages = pager.get_subtitle_segments(time_breaks)
+
+        self.assertEqual(transcript_pages[0], "Ab.")
+        self.assertEqual(transcript_pages[1], "Cd. Ef")
+
     def test_get_pages_given_subtitle_1_should_return_correct_pages(self):
         segments = SubtitleWebVTTParser(
             "tests/subtitles/subtitles_1.vtt"
@@ -196,3 +314,53 @@ class SubtitleSplitterTests(snapshottest.TestCase):
         self.assertEqual(len(transcript_pages), 2)
         self.assertEqual(transcript_pages[0], "Hi my name is")
         self.assertEqual(transcript_pages[1], "Bob and his name is Alice Today, we are")
+
+    def test_iter_subtitle_segments_given_generator_of_breaks_should_return_same_pages(
+        self,
+    ):
+        segments = SubtitleSRTParser(
+            "tests/subtitles/subtitles_8.srt"
+        ).get_subtitle_parts()
+        pager = SubtitleSegmentFinder(segments)
+
+        breaks = [
+            get_timestamp("00:00:04"),
+            get_timestamp("00:00:31"),
+            get_timestamp("00:01:47"),
+            get_timestamp("00:05:58"),
+            get_timestamp("00:10:00"),
+        ]
+        expected_pages = pager.get_subtitle_segments(breaks)
+        transcript_pages = list(
+            pager.iter_subtitle_segments(time_break for time_break in breaks)
+        )
+
+        self.assertEqual(len(transcript_pages), 5)
+        self.assertEqual(transcript_pages, expected_pages)
+
+    def test_iter_subtitle_segments_given_generator_of_parts_should_return_same_pages(
+        self,
+    ):
+        segments = SubtitleParser(
+            "tests/subtitles/subtitles_8.srt"
+        ).get_subtitle_parts()
+        breaks = [
+            get_timestamp("00:00:04"),
+            get_timestamp("00:00:31"),
+            get_timestamp("00:01:47"),
+            get_timestamp("00:05:58"),
+            get_timestamp("00:10:00"),
+        ]
+        expected_pages = SubtitleSegmentFinder(segments).get_subtitle_segments(breaks)
+
+        pager = SubtitleSegmentFinder(
+            SubtitleParser("tests/subtitles/subtitles_8.srt").iter_subtitle_parts()
+        )
+        transcript_pages = []
+        for page in pager.iter_subtitle_segments(breaks):
+            transcript_pages.append(page)
+
+            # Only the parts around the last time break are kept
+            self.assertLess(len(pager.parts), len(segments))
+
+        self.assertEqual(transcript_pages, expected_pages)
@@ -0,0 +1,72 @@
+import unittest
+from src.subtitle_part import SubtitlePart
+from src.subtitle_track import SubtitleTrack
+
+
+class SubtitleTrackTests(unittest.TestCase):
+    def test_get_item_should_return_part_with_its_times_and_text(self):
+        track = SubtitleTrack(
+            [0, 1000, 3000], [1000, 2000, 4000], ["Hi.", "My", "name"]
+        )
+
+        self.assertEqual(len(track), 3)
+        self.assertEqual(track.text, "Hi. My name")
+        self.assertEqual(track[1].start_time, 1000)
+        self.assertEqual(track[1].end_time, 2000)
+        self.assertEqual(track[1].text, "My")
+        self.assertEqual(track[-1].text, "name")
+        self.assertEqual([part.text for part in track], ["Hi.", "My", "name"])
+
+        with self.assertRaises(IndexError):
+            track[3]
+
+    def test_fill_gaps_should_extend_parts_to_start_of_next_part(self):
+        track = SubtitleTrack([0, 1000, 3000], [500, 2500, 4000], ["Hi.", "My", "name"])
+
+        track.fill_gaps()
+
+        self.assertEqual(list(track.end_times), [1000, 3000, 4000])
+
+    def test_from_parts_given_empty_parts_should_return_empty_track(self):
+        track = SubtitleTrack.from_parts([])
+
+        self.assertEqual(len(track), 0)
+        self.assertEqual(list(track), [])
+
+    def test_from_parts_should_keep_times_and_text_of_parts(self):
+        parts = [SubtitlePart(0, 1000, "Hi there."), SubtitlePart(1000, 2000, "")]
+
+        track = SubtitleTrack.from_parts(parts)
+
+        self.assertEqual(track[0].text, "Hi there.")
+        self.assertEqual(track[1].text, "")
+        self.assertEqual(track[1].start_time, 1000)
+
+    def test_drop_and_extend_should_be_same_as_track_of_remaining_parts(self):
+        parts = [
+            SubtitlePart(0, 1000, "Hi."),
+            SubtitlePart(1000, 2000, "My"),
+            SubtitlePart(2000, 3000, "name"),
+            SubtitlePart(3000, 4000, "is"),
+            SubtitlePart(4000, 5000, "Bob."),
+        ]
+        track = SubtitleTrack.from_parts(parts[:3])
+
+        track.drop(2)
+        track.extend(parts[3:])
+        expected_track = SubtitleTrack.from_parts(parts[2:])
+
+        self.assertEqual(track.text, "name is Bob.")
+        self.assertEqual(list(track.start_times), list(expected_track.start_times))
+        self.assertEqual(list(track.end_times), list(expected_track.end_times))
+        self.assertEqual(list(track.text_offsets), list(expected_track.text_offsets))
+
+    def test_extend_given_empty_track_should_return_track_of_parts(self):
+        parts = [SubtitlePart(0, 1000, "Hi."), SubtitlePart(1000, 2000, "Bye.")]
+        track = SubtitleTrack.from_parts(parts[:1])
+
+        track.drop(1)
+        track.extend(parts)
+
+        self.assertEqual(track.text, "Hi. Bye.")
+        self.assertEqual(list(track.text_offsets), [0, 4, 9])
@@ -1,8 +1,62 @@
+import os
+import tempfile
 import unittest
+import cv2
+import numpy as np
 from src.video_segment_finder import VideoSegmentFinder  # get_frames
+from src.video_segment_finder import PastFrameChangesTracker
+from src.instrumentation import Instrumentation
 from src.time_utils import convert_timestamp_ms_to_clock_time as get_clock
 
 
+def create_video_with_webcam(filepath):
+    """Creates a 15 second video of 5 slides with a webcam in its bottom right corner that changes every frame"""
+    video_writer = cv2.VideoWriter(
+        filepath, cv2.VideoWriter_fourcc(*"MJPG"), 10, (320, 240)
+    )
+    random = np.random.default_rng(0)
+
+    for i in range(150):
+        frame = np.full((240, 320, 3), 255, np.uint8)
+        slide_num = i // 30
+        cv2.rectangle(
+            frame, (20 + 30 * slide_num, 20), (80 + 30 * slide_num, 140), (0, 0, 0), -1
+        )
+        frame[160:230, 230:310] = random.integers(0, 255, (70, 80, 3), dtype=np.uint8)
+        video_writer.write(frame)
+
+    video_writer.release()
+
+
+class VideoReaderWithFailedReread:
+    """Reads a video with OpenCV, except that the first frame after the first seek is not read"""
+
+    def __init__(self, video_file):
+        self.video_reader = cv2.VideoCapture(video_file)
+        self.num_reads_after_seek = None
+        self.is_failed = False
+
+    def set(self, prop_id, value):
+        if not self.is_failed:
+            self.num_reads_after_seek = 0
+
+        return self.video_reader.set(prop_id, value)
+
+    def read(self, *args):
+        if self.num_reads_after_seek is not None and not self.is_failed:
+            self.num_reads_after_seek += 1
+
+            # The first read after seeking is the frame that the video is seeked to
+            if self.num_reads_after_seek == 2:
+                self.is_failed = True
+                return False, None
+
+        return self.video_reader.read(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.video_reader, name)
+
+
 class VideoBreaksTest(unittest.TestCase):
     def test_get_frames_of_video_with_human_should_return_correct_breaks(self):
         data = VideoSegmentFinder().get_best_segment_frames("tests/videos/input_1.mp4")
@@ -153,3 +207,283 @@ class VideoBreaksTest(unittest.TestCase):
             get_clock(data[frame_nums[1]]["timestamp"]), "00:01:34.850000000000016"
         )
         self.assertEqual(get_clock(data[frame_nums[2]]["timestamp"]), "00:01:41.5")
+
+    def test_get_frames_with_sample_rate_should_return_same_breaks_as_every_frame(
+        self,
+    ):
+        expected = VideoSegmentFinder().get_best_segment_frames(
+            "tests/videos/input_6.mp4"
+        )
+        data = VideoSegmentFinder(sample_rate=1).get_best_segment_frames(
+            "tests/videos/input_6.mp4"
+        )
+
+        self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+
+        for frame_num in expected:
+            self.assertEqual(
+                data[frame_num]["timestamp"], expected[frame_num]["timestamp"]
+            )
+            self.assertTrue(
+                np.array_equal(data[frame_num]["frame"], expected[frame_num]["frame"])
+            )
+
+    def test_get_frames_with_analysis_width_should_return_correct_breaks(self):
+        data = VideoSegmentFinder(
+            analysis_width=320, min_change_ratio=0.01
+        ).get_best_segment_frames("tests/videos/input_6.mp4")
+        frame_nums = sorted(data.keys())
+
+        self.assertEqual(len(frame_nums), 3)
+
+        # Check if the timestamps (in ms) matches the ones when comparing full frames
+        self.assertEqual(get_clock(data[frame_nums[0]]["timestamp"]), "00:01:31.15")
+        self.assertEqual(
+            get_clock(data[frame_nums[1]]["timestamp"]), "00:01:34.850000000000016"
+        )
+        self.assertEqual(get_clock(data[frame_nums[2]]["timestamp"]), "00:01:41.5")
+
+        # Check that the selected frames are still in full resolution
+        self.assertEqual(data[frame_nums[0]]["frame"].shape, (720, 1280, 3))
+
+    def test_get_frames_with_spill_dir_should_save_selected_frames_on_disk(self):
+        expected = VideoSegmentFinder().get_best_segment_frames(
+            "tests/videos/input_4.mp4"
+        )
+
+        with tempfile.TemporaryDirectory() as spill_dir:
+            data = VideoSegmentFinder(spill_dir=spill_dir).get_best_segment_frames(
+                "tests/videos/input_4.mp4"
+            )
+
+            self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+            self.assertEqual(len(os.listdir(spill_dir)), len(expected))
+
+            for frame_num in expected:
+                self.assertIsNone(data[frame_num]["mask"])
+                self.assertTrue(
+                    np.array_equal(
+                        data[frame_num]["frame"], expected[frame_num]["frame"]
+                    )
+                )
+
+    def test_iter_best_segment_frames_should_yield_same_frames_in_order(self):
+        expected = VideoSegmentFinder().get_best_segment_frames(
+            "tests/videos/input_6.mp4"
+        )
+        selected_frames = list(
+            VideoSegmentFinder().iter_best_segment_frames("tests/videos/input_6.mp4")
+        )
+
+        self.assertEqual(
+            [selected_frame.frame_num for selected_frame in selected_frames],
+            sorted(expected.keys()),
+        )
+        self.assertEqual(
+            [selected_frame.timestamp for selected_frame in selected_frames],
+            [expected[frame_num].timestamp for frame_num in sorted(expected.keys())],
+        )
+
+    def test_get_frames_with_num_workers_should_return_same_breaks_as_one_worker(
+        self,
+    ):
+        expected, expected_stats = VideoSegmentFinder().get_segment_frames_with_stats(
+            "tests/videos/input_5.mp4"
+        )
+        data, stats = VideoSegmentFinder(num_workers=3).get_segment_frames_with_stats(
+            "tests/videos/input_5.mp4"
+        )
+
+        self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+        self.assertEqual(stats, expected_stats)
+
+        for frame_num in expected:
+            self.assertEqual(
+                data[frame_num]["timestamp"], expected[frame_num]["timestamp"]
+            )
+            self.assertTrue(
+                np.array_equal(data[frame_num]["frame"], expected[frame_num]["frame"])
+            )
+
+    def test_get_frames_with_cache_dir_should_return_same_breaks_from_cache(self):
+        expected = VideoSegmentFinder().get_best_segment_frames(
+            "tests/videos/input_4.mp4"
+        )
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            video_segment_finder = VideoSegmentFinder(cache_dir=cache_dir)
+            data_1 = video_segment_finder.get_best_segment_frames(
+                "tests/videos/input_4.mp4"
+            )
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            data_2 = video_segment_finder.get_best_segment_frames(
+                "tests/videos/input_4.mp4"
+            )
+
+        for data in (data_1, data_2):
+            self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+
+            for frame_num in expected:
+                self.assertEqual(
+                    data[frame_num]["timestamp"], expected[frame_num]["timestamp"]
+                )
+                self.assertTrue(
+                    np.array_equal(
+                        data[frame_num]["frame"], expected[frame_num]["frame"]
+                    )
+                )
+
+    def test_get_frames_with_stability_window_of_five_frames_should_return_same_breaks(
+        self,
+    ):
+        expected = VideoSegmentFinder().get_best_segment_frames(
+            "tests/videos/input_5.mp4"
+        )
+
+        # The video is 29.97 fps, so 5 frames are 166.8 ms
+        data = VideoSegmentFinder(stability_window_ms=166.8).get_best_segment_frames(
+            "tests/videos/input_5.mp4"
+        )
+
+        self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+
+    def test_get_frames_with_stability_window_should_return_same_breaks_in_parallel(
+        self,
+    ):
+        video_segment_finder = VideoSegmentFinder(
+            stability_window_ms=1000, min_segment_duration_ms=1000
+        )
+        expected = video_segment_finder.get_best_segment_frames(
+            "tests/videos/input_6.mp4"
+        )
+
+        video_segment_finder.num_workers = 3
+        data = video_segment_finder.get_best_segment_frames("tests/videos/input_6.mp4")
+
+        self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+        self.assertEqual(len(data), 4)
+
+    def test_get_frames_with_keyframe_prescan_should_return_same_breaks_as_every_frame(
+        self,
+    ):
+        expected = VideoSegmentFinder().get_best_segment_frames(
+            "tests/videos/input_6.mp4"
+        )
+        data = VideoSegmentFinder(keyframe_prescan=True).get_best_segment_frames(
+            "tests/videos/input_6.mp4"
+        )
+
+        # The frames that were skipped over are still counted, so the frame numbers are the same
+        self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+
+        for frame_num in expected:
+            self.assertEqual(
+                data[frame_num]["timestamp"], expected[frame_num]["timestamp"]
+            )
+            self.assertTrue(
+                np.array_equal(data[frame_num]["frame"], expected[frame_num]["frame"])
+            )
+
+    def test_iter_frame_changes_with_failed_reread_should_use_sampled_frame(self):
+        video_segment_finder = VideoSegmentFinder(sample_rate=1)
+        video_reader = cv2.VideoCapture("tests/videos/input_6.mp4")
+        failing_video_reader = VideoReaderWithFailedReread("tests/videos/input_6.mp4")
+        fps = video_reader.get(cv2.CAP_PROP_FPS)
+        blank_frame = 255 * np.ones(
+            (
+                int(video_reader.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                int(video_reader.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                3,
+            ),
+            np.uint8,
+        )
+
+        expected_frame_nums = [
+            frame_num
+            for frame_num, _, _, _, _ in video_segment_finder.__iter_frame_changes__(
+                video_reader, fps, blank_frame, video_segment_finder.min_change
+            )
+        ]
+        frame_nums = [
+            frame_num
+            for frame_num, _, _, _, _ in video_segment_finder.__iter_frame_changes__(
+                failing_video_reader, fps, blank_frame, video_segment_finder.min_change
+            )
+        ]
+
+        self.assertTrue(failing_video_reader.is_failed)
+        self.assertEqual(frame_nums, sorted(set(frame_nums)))
+        self.assertLess(len(frame_nums), len(expected_frame_nums))
+        self.assertEqual(frame_nums[-1], expected_frame_nums[-1])
+
+    def test_get_frames_with_instrumentation_should_measure_decoded_frames(self):
+        instrumentation = Instrumentation()
+        data = VideoSegmentFinder(
+            instrumentation=instrumentation
+        ).get_best_segment_frames("tests/videos/input_4.mp4")
+
+        stages = instrumentation.get_report()["stages"]
+
+        self.assertEqual(stages["decode"]["count"], 154)
+        self.assertEqual(stages["diff"]["count"], 154)
+        # Some of the candidate frames are dropped as glitches
+        self.assertGreaterEqual(stages["selection"]["count"], len(data))
+
+    def test_get_frames_with_exclude_regions_should_ignore_changes_in_regions(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_filepath = os.path.join(temp_dir, "video.avi")
+            create_video_with_webcam(video_filepath)
+
+            data_without_regions = VideoSegmentFinder(
+                min_change=500
+            ).get_best_segment_frames(video_filepath)
+            data = VideoSegmentFinder(
+                min_change=500, exclude_regions=[(230, 160, 80, 70)]
+            ).get_best_segment_frames(video_filepath)
+
+        # The webcam changes in every frame, so no frame is stable unless it is excluded
+        self.assertEqual(sorted(data_without_regions.keys()), [150])
+        self.assertEqual(sorted(data.keys()), [30, 60, 90, 120, 150])
+
+    def test_get_frames_with_auto_exclude_regions_should_find_webcam(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_filepath = os.path.join(temp_dir, "video.avi")
+            create_video_with_webcam(video_filepath)
+
+            video_segment_finder = VideoSegmentFinder(
+                min_change=500, auto_exclude_regions=True
+            )
+            regions = video_segment_finder.find_changing_regions(video_filepath)
+            data = video_segment_finder.get_best_segment_frames(video_filepath)
+
+        self.assertEqual(len(regions), 1)
+        x, y, width, height = regions[0]
+        self.assertTrue(
+            x <= 230 and y <= 160 and x + width >= 310 and y + height >= 230
+        )
+        self.assertEqual(sorted(data.keys()), [30, 60, 90, 120, 150])
+
+
+class PastFrameChangesTrackerTest(unittest.TestCase):
+    def test_tracker_should_be_stable_after_window_size_unchanged_frames(self):
+        tracker = PastFrameChangesTracker(window_size=3)
+        tracker.add_frame_change(True)
+        tracker.add_frame_change(True)
+
+        for _ in range(2):
+            tracker.add_frame_change(False)
+            self.assertFalse(tracker.are_previous_frames_stable())
+
+        tracker.add_frame_change(False)
+        self.assertTrue(tracker.are_previous_frames_stable())
+
+    def test_tracker_should_be_stable_after_adding_many_unchanged_frames(self):
+        tracker = PastFrameChangesTracker()
+        tracker.add_frame_change(True)
+
+        tracker.add_unchanged_frames(4)
+        self.assertFalse(tracker.are_previous_frames_stable())
+
+        tracker.add_unchanged_frames(100)
+        self.assertTrue(tracker.are_previous_frames_stable())
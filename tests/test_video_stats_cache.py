@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.video_stats_cache import VideoStatsCache
+
+
+class VideoStatsCacheTests(unittest.TestCase):
+    def test_get_cache_key_given_same_video_should_return_same_key(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_filepath = os.path.join(temp_dir, "a.mp4")
+            with open(video_filepath, "wb") as f:
+                f.write(os.urandom(1 << 10))
+
+            cache = VideoStatsCache(temp_dir)
+
+            self.assertEqual(
+                cache.get_cache_key(video_filepath, {"threshold": 20}),
+                cache.get_cache_key(video_filepath, {"threshold": 20}),
+            )
+            self.assertNotEqual(
+                cache.get_cache_key(video_filepath, {"threshold": 20}),
+                cache.get_cache_key(video_filepath, {"threshold": 30}),
+            )
+
+    def test_get_cache_key_given_modified_video_should_return_new_key(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_filepath = os.path.join(temp_dir, "a.mp4")
+            with open(video_filepath, "wb") as f:
+                f.write(bytes(10 << 20))
+
+            cache = VideoStatsCache(temp_dir)
+            cache_key = cache.get_cache_key(video_filepath, {})
+
+            with open(video_filepath, "r+b") as f:
+                f.seek(5 << 20)
+                f.write(b"\x01")
+            os.utime(video_filepath, ns=(0, 0))
+
+            self.assertNotEqual(cache.get_cache_key(video_filepath, {}), cache_key)
+
+    def test_get_cache_key_given_modified_block_of_large_video_should_return_new_key(
+        self,
+    ):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_filepath = os.path.join(temp_dir, "a.mp4")
+            with open(video_filepath, "wb") as f:
+                f.write(bytes(76 << 20))
+
+            cache = VideoStatsCache(temp_dir)
+            cache_key = cache.get_cache_key(video_filepath, {})
+
+            # The middle of the video is in one of the hashed blocks
+            with open(video_filepath, "r+b") as f:
+                f.seek(30 << 20)
+                f.write(b"\x01")
+            os.utime(video_filepath, ns=(0, 0))
+
+            self.assertNotEqual(cache.get_cache_key(video_filepath, {}), cache_key)
+
+    def test_load_given_copied_video_should_return_saved_stats(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_filepath = os.path.join(temp_dir, "a.mp4")
+            with open(video_filepath, "wb") as f:
+                f.write(os.urandom(1 << 20))
+
+            cache = VideoStatsCache(os.path.join(temp_dir, "cache"))
+            cache.save_stats(
+                cache.get_cache_key(video_filepath, {}),
+                {
+                    "frame_nums": [0, 1],
+                    "timestamps": [0, 40],
+                    "num_pixels_changed": [0, 5],
+                    "num_frames": 2,
+                },
+            )
+
+            # The copy has a different path and modified time
+            copied_video_filepath = os.path.join(temp_dir, "b.mp4")
+            shutil.copy(video_filepath, copied_video_filepath)
+            os.utime(copied_video_filepath, ns=(0, 0))
+
+            stats = cache.load(cache.get_cache_key(copied_video_filepath, {}))
+
+            self.assertIsNotNone(stats)
+            self.assertEqual(list(stats["num_pixels_changed"]), [0, 5])
+            self.assertEqual(stats["num_frames"], 2)